@@ -0,0 +1,400 @@
+"""
+Streaming analytics over exported workflows.
+Consumes VisualWorkflow sequences one at a time and keeps bounded-memory
+summaries for teachers:
+- block-type n-grams (which command sequences kids use most)
+- parameter value distributions
+- common mistakes, such as a turn immediately undone by the opposite turn
+- edit patterns between successive snapshots of the same workflow
+
+Counts are kept in a count-min sketch plus a SpaceSaving top-k summary per
+family, so memory does not grow with the number of workflows. Every summary
+is mergeable: run one WorkflowAnalytics per process and combine the partial
+results with merge().
+"""
+
+from typing import Dict, List, Any, Iterable, Mapping, Optional, Sequence, Tuple
+from array import array
+from collections import Counter
+import hashlib
+
+
+class CountMinSketch:
+    """Count-min sketch with blake2b row hashes. Estimates never undercount."""
+
+    def __init__(self, width: int = 2048, depth: int = 4, seed: bytes = b""):
+        """
+        Args:
+            width: Counters per row (error is about total / width)
+            depth: Number of rows (failure probability about e^-depth)
+            seed: Hash key; sketches only merge with the same width, depth and seed
+        """
+        if width < 1 or not 1 <= depth <= 8:
+            raise ValueError("width must be positive and depth between 1 and 8")
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        self.total = 0
+        self.counts = array("q", bytes(8 * width * depth))
+
+    def _cells(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8 * self.depth, key=self.seed).digest()
+        return [row * self.width + int.from_bytes(digest[8 * row:8 * row + 8], "little") % self.width
+                for row in range(self.depth)]
+
+    def add(self, key: str, count: int = 1) -> None:
+        """Count `count` occurrences of a key."""
+        counts = self.counts
+        for cell in self._cells(key):
+            counts[cell] += count
+        self.total += count
+
+    def estimate(self, key: str) -> int:
+        """Estimated number of occurrences of a key."""
+        counts = self.counts
+        return min(counts[cell] for cell in self._cells(key))
+
+    def merge(self, other: "CountMinSketch") -> None:
+        """Add another sketch's counts into this one."""
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError("can only merge sketches with the same width, depth and seed")
+        counts = self.counts
+        for index, value in enumerate(other.counts):
+            if value:
+                counts[index] += value
+        self.total += other.total
+
+
+class SpaceSaving:
+    """
+    SpaceSaving heavy-hitters summary: tracks at most `capacity` keys. A key's
+    count may be overestimated by at most its recorded error.
+    """
+
+    def __init__(self, capacity: int = 100):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, key: str, count: int = 1) -> None:
+        """Count `count` occurrences of a key."""
+        counts = self.counts
+        if key in counts:
+            counts[key] += count
+            return
+        if len(counts) < self.capacity:
+            counts[key] = count
+            self.errors[key] = 0
+            return
+        # Replace the smallest key; the newcomer inherits its count as error
+        smallest = min(counts, key=counts.__getitem__)
+        floor = counts.pop(smallest)
+        del self.errors[smallest]
+        counts[key] = floor + count
+        self.errors[key] = floor
+
+    def top(self, k: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Get the k most frequent keys with their (upper bound) counts."""
+        ranked = sorted(self.counts.items(), key=lambda pair: (-pair[1], pair[0]))
+        return ranked[:k] if k is not None else ranked
+
+    def merge(self, other: "SpaceSaving") -> None:
+        """Combine another summary into this one, keeping the `capacity` largest keys."""
+        # Keys missing from a full summary may have occurred up to its minimum count
+        own_floor = min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+        other_floor = min(other.counts.values()) if len(other.counts) >= other.capacity else 0
+        counts: Dict[str, int] = {}
+        errors: Dict[str, int] = {}
+        for key in set(self.counts) | set(other.counts):
+            counts[key] = self.counts.get(key, own_floor) + other.counts.get(key, other_floor)
+            errors[key] = self.errors.get(key, own_floor) + other.errors.get(key, other_floor)
+        kept = sorted(counts, key=lambda key: (-counts[key], key))[:self.capacity]
+        self.counts = {key: counts[key] for key in kept}
+        self.errors = {key: errors[key] for key in kept}
+
+
+class FrequencySummary:
+    """A count-min sketch for point queries plus a SpaceSaving summary for top-k."""
+
+    def __init__(self, width: int = 2048, depth: int = 4, top_k: int = 100, seed: bytes = b""):
+        self.sketch = CountMinSketch(width, depth, seed)
+        self.heavy = SpaceSaving(top_k)
+
+    def add(self, key: str, count: int = 1) -> None:
+        self.sketch.add(key, count)
+        self.heavy.add(key, count)
+
+    def estimate(self, key: str) -> int:
+        return self.sketch.estimate(key)
+
+    def top(self, k: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Top keys, with counts tightened by the sketch estimate."""
+        return [(key, min(count, self.sketch.estimate(key))) for key, count in self.heavy.top(k)]
+
+    def merge(self, other: "FrequencySummary") -> None:
+        self.sketch.merge(other.sketch)
+        self.heavy.merge(other.heavy)
+
+
+# Block types whose parameters cancel each other when used back to back
+_OPPOSITES = {
+    "turn_left": ("turn_right", "degrees", 90),
+    "turn_right": ("turn_left", "degrees", 90),
+    "move_forward": ("move_backward", "distance", 1),
+    "move_backward": ("move_forward", "distance", 1),
+}
+
+_CHILD_LISTS = ("body", "if_body", "else_body")
+
+
+def _block_key(block: Mapping[str, Any]) -> str:
+    return str(block.get("type", "unknown"))
+
+
+def _validate_blocks(blocks: Any) -> None:
+    """Check the shape of a workflow without recursing, so ingestion cannot fail halfway."""
+    pending = [blocks]
+    while pending:
+        sequence = pending.pop()
+        if isinstance(sequence, (str, bytes)) or not isinstance(sequence, Sequence):
+            raise ValueError(f"expected a list of blocks, got {type(sequence).__name__}")
+        for block in sequence:
+            if not isinstance(block, Mapping):
+                raise ValueError(f"expected a block dictionary, got {type(block).__name__}")
+            params = block.get("params", {})
+            if not isinstance(params, Mapping):
+                raise ValueError(f"block params must be a dictionary, got {type(params).__name__}")
+            for key in _CHILD_LISTS:
+                children = params.get(key)
+                if children:
+                    pending.append(children)
+
+
+class WorkflowAnalytics:
+    """Bounded-memory, mergeable analytics over a stream of workflows."""
+
+    def __init__(self, max_n: int = 3, width: int = 2048, depth: int = 4, top_k: int = 100,
+                 seed: bytes = b""):
+        """
+        Args:
+            max_n: Longest block-type n-gram to count
+            width: Count-min sketch width
+            depth: Count-min sketch depth
+            top_k: Heavy hitters tracked per summary
+            seed: Hash key (all merged instances must use the same one)
+        """
+        self.max_n = max_n
+        self.settings = (width, depth, top_k, seed)
+        self.workflows = 0
+        self.blocks = 0
+        self.ngrams = {n: FrequencySummary(width, depth, top_k, seed) for n in range(1, max_n + 1)}
+        self.param_values = FrequencySummary(width, depth, top_k, seed)
+        self.edits = FrequencySummary(width, depth, top_k, seed)
+        # One entry per (block type, parameter) pair: count, sum, min, max
+        self.numeric_params: Dict[str, List[float]] = {}
+        # Mistake kinds are a small fixed vocabulary, so exact counts are bounded
+        self.mistakes: Counter = Counter()
+
+    # Ingestion
+
+    def add_workflow(self, blocks: Sequence[Mapping[str, Any]]) -> None:
+        """
+        Add one exported workflow (e.g. VisualWorkflow.get_sequence()).
+
+        Raises:
+            ValueError: If the workflow is not a list of block dictionaries
+                (nothing is recorded in that case)
+        """
+        _validate_blocks(blocks)
+        self.workflows += 1
+        self._add_sequence(blocks)
+
+    def add_workflows(self, workflows: Iterable[Sequence[Mapping[str, Any]]]) -> "WorkflowAnalytics":
+        """Add every workflow from an iterable; returns self for chaining."""
+        for blocks in workflows:
+            self.add_workflow(blocks)
+        return self
+
+    def _add_sequence(self, blocks: Sequence[Mapping[str, Any]]) -> None:
+        # Every block list (top level or a loop/conditional/function body) is its own
+        # sequence. Nested lists are visited in place, in the same order as a recursive
+        # walk, from an explicit stack of (list, next position, previous block)
+        stack: List[Tuple[Sequence[Mapping[str, Any]], int, Any]] = [(blocks, 0, None)]
+        while stack:
+            sequence, position, previous = stack.pop()
+            if position == 0:
+                self._add_ngrams(sequence)
+            while position < len(sequence):
+                block = sequence[position]
+                position += 1
+                self.blocks += 1
+                block_type = _block_key(block)
+                params = block.get("params", {})
+                self._add_params(block_type, params)
+                self._check_block(block_type, params)
+                if previous is not None:
+                    self._check_pair(previous, block)
+                previous = block
+                children = [params[key] for key in _CHILD_LISTS if params.get(key)]
+                if children:
+                    stack.append((sequence, position, previous))
+                    stack.extend((child, 0, None) for child in reversed(children))
+                    break
+            else:
+                self._check_repeated_turns(sequence)
+
+    def _add_ngrams(self, blocks: Sequence[Mapping[str, Any]]) -> None:
+        types = [_block_key(block) for block in blocks]
+        for n, summary in self.ngrams.items():
+            for start in range(len(types) - n + 1):
+                summary.add(" > ".join(types[start:start + n]))
+
+    def _add_params(self, block_type: str, params: Mapping[str, Any]) -> None:
+        for key, value in params.items():
+            if key in _CHILD_LISTS:
+                continue
+            name = f"{block_type}.{key}"
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                stats = self.numeric_params.get(name)
+                if stats is None:
+                    self.numeric_params[name] = [1, value, value, value]
+                else:
+                    stats[0] += 1
+                    stats[1] += value
+                    stats[2] = min(stats[2], value)
+                    stats[3] = max(stats[3], value)
+            if isinstance(value, (str, int, float, bool)):
+                self.param_values.add(f"{name}={value}")
+
+    def _check_block(self, block_type: str, params: Mapping[str, Any]) -> None:
+        if block_type == "loop":
+            iterations = params.get("iterations", 3)
+            if not params.get("body"):
+                self.mistakes["empty_loop"] += 1
+            elif iterations in (0, 1):
+                self.mistakes[f"loop_{iterations}_iterations"] += 1
+        elif block_type == "conditional":
+            if not params.get("if_body") and not params.get("else_body"):
+                self.mistakes["empty_conditional"] += 1
+            if str(params.get("condition", "True")).strip() in ("True", "False"):
+                self.mistakes["constant_condition"] += 1
+        elif block_type in ("turn_left", "turn_right"):
+            # Degrees may be a function parameter name
+            degrees = params.get("degrees", 90)
+            if isinstance(degrees, (int, float)) and degrees % 360 == 0:
+                self.mistakes["full_turn"] += 1
+
+    def _check_pair(self, first: Mapping[str, Any], second: Mapping[str, Any]) -> None:
+        opposite = _OPPOSITES.get(_block_key(first))
+        if opposite is None or _block_key(second) != opposite[0]:
+            return
+        param, default = opposite[1], opposite[2]
+        if first.get("params", {}).get(param, default) == second.get("params", {}).get(param, default):
+            kind = "turn" if param == "degrees" else "move"
+            self.mistakes[f"cancelled_{kind}"] += 1
+
+    def _check_repeated_turns(self, blocks: Sequence[Mapping[str, Any]]) -> None:
+        # Three same-direction 90° turns in a row are one turn the other way
+        run_type, run = None, 0
+        for block in blocks:
+            block_type = _block_key(block)
+            if block_type in ("turn_left", "turn_right") and block.get("params", {}).get("degrees", 90) == 90:
+                run = run + 1 if block_type == run_type else 1
+                run_type = block_type
+                if run == 3:
+                    self.mistakes["three_turns_instead_of_one"] += 1
+            else:
+                run_type, run = None, 0
+
+    def add_edit(self, before: Sequence[Mapping[str, Any]], after: Sequence[Mapping[str, Any]]) -> None:
+        """
+        Record the edit between two successive snapshots of the same workflow.
+        The common prefix and suffix are skipped; the changed middle is
+        classified as an add, remove, parameter change, move or replace.
+        """
+        start = 0
+        while start < len(before) and start < len(after) and before[start] == after[start]:
+            start += 1
+        end_before, end_after = len(before), len(after)
+        while end_before > start and end_after > start and before[end_before - 1] == after[end_after - 1]:
+            end_before -= 1
+            end_after -= 1
+        removed = before[start:end_before]
+        added = after[start:end_after]
+
+        if not removed and not added:
+            return
+        if not removed:
+            for block in added:
+                self.edits.add(f"add:{_block_key(block)}")
+        elif not added:
+            for block in removed:
+                self.edits.add(f"remove:{_block_key(block)}")
+        elif len(removed) == len(added) == 1 and _block_key(removed[0]) == _block_key(added[0]):
+            old_params = removed[0].get("params", {})
+            new_params = added[0].get("params", {})
+            for key in sorted(set(old_params) | set(new_params)):
+                if old_params.get(key) != new_params.get(key):
+                    self.edits.add(f"change:{_block_key(added[0])}.{key}")
+        elif sorted(map(repr, removed)) == sorted(map(repr, added)):
+            self.edits.add(f"move:{_block_key(removed[0])}")
+        else:
+            self.edits.add(f"replace:{_block_key(removed[0])}->{_block_key(added[0])}")
+
+    def add_session_history(self, snapshots: Iterable[Sequence[Mapping[str, Any]]]) -> None:
+        """Record edits between each pair of successive workflow snapshots."""
+        previous: Sequence[Mapping[str, Any]] = []
+        for snapshot in snapshots:
+            self.add_edit(previous, snapshot)
+            previous = snapshot
+
+    # Queries and merging
+
+    def top_ngrams(self, n: int, k: int = 10) -> List[Tuple[str, int]]:
+        """Most frequent block-type n-grams of length n."""
+        return self.ngrams[n].top(k)
+
+    def merge(self, other: "WorkflowAnalytics") -> "WorkflowAnalytics":
+        """Combine another instance's results into this one; returns self."""
+        if (self.max_n, self.settings) != (other.max_n, other.settings):
+            raise ValueError("can only merge analytics created with the same settings")
+        self.workflows += other.workflows
+        self.blocks += other.blocks
+        for n, summary in self.ngrams.items():
+            summary.merge(other.ngrams[n])
+        self.param_values.merge(other.param_values)
+        self.edits.merge(other.edits)
+        for name, stats in other.numeric_params.items():
+            own = self.numeric_params.get(name)
+            if own is None:
+                self.numeric_params[name] = list(stats)
+            else:
+                self.numeric_params[name] = [own[0] + stats[0], own[1] + stats[1],
+                                             min(own[2], stats[2]), max(own[3], stats[3])]
+        self.mistakes.update(other.mistakes)
+        return self
+
+    def report(self, k: int = 10) -> Dict[str, Any]:
+        """
+        Summarize the results.
+
+        Args:
+            k: Entries per top-k list
+
+        Returns:
+            JSON-friendly dictionary for dashboards
+        """
+        return {
+            "workflows": self.workflows,
+            "blocks": self.blocks,
+            "ngrams": {n: self.top_ngrams(n, k) for n in self.ngrams},
+            "parameter_values": self.param_values.top(k),
+            "numeric_parameters": {
+                name: {"count": stats[0], "mean": stats[1] / stats[0], "min": stats[2], "max": stats[3]}
+                for name, stats in sorted(self.numeric_params.items())
+            },
+            "mistakes": dict(self.mistakes.most_common()),
+            "edits": self.edits.top(k)
+        }
@@ -0,0 +1,213 @@
+"""
+Resource budgets for workflow compilation.
+Nested loops multiply: a few `loop` blocks with large `iterations` make
+CodeGenerator allocate an exponential number of plan items. Budgeted
+compilation bounds every cost of a submitted workflow:
+
+1. A preflight walk (no plan allocation) measures nesting depth, block count
+   and the expanded plan length, an upper bound on the plan steps once loops
+   are unrolled (nested conditional and function steps included).
+2. While generating, a BudgetGuard listener checks the wall-clock deadline
+   before each block and the size of the emitted code.
+
+Going over any limit raises BudgetExceededError, which describes the limit,
+the measured value and the offending block.
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+import time
+
+from code_generator import BlockType, CodeGenerator, GenerationListener
+
+
+class BudgetExceededError(Exception):
+    """Raised when a workflow goes over a compilation budget."""
+
+    def __init__(self, limit: str, value: Any, maximum: Any, path: Optional[str] = None):
+        location = f" at block {path}" if path is not None else ""
+        super().__init__(f"{limit} {value} exceeds the budget of {maximum}{location}")
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+        self.path = path
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the error to a JSON-friendly dictionary."""
+        return {
+            "error": "budget_exceeded",
+            "limit": self.limit,
+            "value": self.value,
+            "maximum": self.maximum,
+            "path": self.path,
+            "message": str(self)
+        }
+
+
+class CompilationBudget:
+    """Limits for compiling one workflow. A limit of None is not enforced."""
+
+    def __init__(self, max_depth: Optional[int] = 20, max_blocks: Optional[int] = 5000,
+                 max_plan_steps: Optional[int] = 100000, max_code_size: Optional[int] = 1000000,
+                 max_seconds: Optional[float] = 2.0):
+        """
+        Args:
+            max_depth: Deepest allowed nesting of loop/conditional/function bodies
+            max_blocks: Most blocks in the workflow, counting nested ones
+            max_plan_steps: Most plan steps after unrolling loops
+            max_code_size: Most characters of generated code
+            max_seconds: Wall-clock time allowed for generation
+        """
+        self.max_depth = max_depth
+        self.max_blocks = max_blocks
+        self.max_plan_steps = max_plan_steps
+        self.max_code_size = max_code_size
+        self.max_seconds = max_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the budget to a JSON-friendly dictionary."""
+        return {
+            "max_depth": self.max_depth,
+            "max_blocks": self.max_blocks,
+            "max_plan_steps": self.max_plan_steps,
+            "max_code_size": self.max_code_size,
+            "max_seconds": self.max_seconds
+        }
+
+
+# No limits at all; estimate_workflow() then only measures
+UNLIMITED = CompilationBudget(None, None, None, None, None)
+
+_CHILD_LISTS = {
+    BlockType.LOOP.value: (("body", "_"),),
+    BlockType.CONDITIONAL.value: (("if_body", "_if_"), ("else_body", "_else_")),
+    BlockType.FUNCTION.value: (("body", "_func_"),),
+}
+
+
+def _iterations(params: Dict[str, Any]) -> int:
+    iterations = params.get("iterations", 3)
+    if isinstance(iterations, bool) or not isinstance(iterations, int):
+        # The generator rejects these itself; they add no steps here
+        return 0
+    return max(0, iterations)
+
+
+def estimate_workflow(blocks: List[Dict[str, Any]],
+                      budget: Optional[CompilationBudget] = None) -> Dict[str, int]:
+    """
+    Measure a workflow without generating it.
+    The walk is iterative and stops at the first exceeded limit, so it is
+    cheap even for hostile input.
+
+    Args:
+        blocks: List of block dictionaries
+        budget: Limits to check while measuring (none by default)
+
+    Returns:
+        Dictionary with "depth", "blocks" and "plan_steps"
+
+    Raises:
+        BudgetExceededError: If the workflow goes over max_depth, max_blocks or max_plan_steps
+    """
+    budget = budget if budget is not None else UNLIMITED
+    max_depth, max_blocks, max_steps = budget.max_depth, budget.max_blocks, budget.max_plan_steps
+    deepest = 0
+    block_count = 0
+    plan_steps = 0
+
+    # (blocks, index prefix, nesting depth, product of enclosing loop iterations)
+    stack: List[Tuple[List[Dict[str, Any]], str, int, int]] = [(blocks, "", 0, 1)]
+    while stack:
+        children, prefix, depth, multiplier = stack.pop()
+        if depth > deepest:
+            deepest = depth
+            if max_depth is not None and depth > max_depth:
+                raise BudgetExceededError("depth", depth, max_depth, prefix.rstrip("_") or None)
+        for position, block in enumerate(children):
+            path = f"{prefix}{position}"
+            block_count += 1
+            if max_blocks is not None and block_count > max_blocks:
+                raise BudgetExceededError("blocks", block_count, max_blocks, path)
+
+            block_type = block.get("type", "")
+            params = block.get("params", {})
+            if block_type == BlockType.LOOP.value:
+                # A loop adds no step of its own; its body is repeated
+                stack.append((params.get("body", []), path + "_", depth + 1,
+                              multiplier * _iterations(params)))
+                continue
+            plan_steps += multiplier
+            if max_steps is not None and plan_steps > max_steps:
+                raise BudgetExceededError("plan_steps", plan_steps, max_steps, path)
+            for key, separator in _CHILD_LISTS.get(block_type, ()):
+                stack.append((params.get(key, []), path + separator, depth + 1, multiplier))
+
+    return {"depth": deepest, "blocks": block_count, "plan_steps": plan_steps}
+
+
+class BudgetGuard(GenerationListener):
+    """
+    Enforces the wall-clock deadline and code size while CodeGenerator runs.
+    Add it to generator.listeners after the preflight estimate has passed.
+    """
+
+    def __init__(self, budget: CompilationBudget):
+        self.budget = budget
+        self.started = time.perf_counter()
+        self.deadline = self.started + budget.max_seconds if budget.max_seconds is not None else None
+        self.code_size = 0
+        self._open_blocks = 0
+
+    def enter_block(self, block_type: str, params: Dict[str, Any], idx: Any, depth: int) -> None:
+        self._open_blocks += 1
+        if self.deadline is not None:
+            now = time.perf_counter()
+            if now > self.deadline:
+                raise BudgetExceededError("seconds", round(now - self.started, 3),
+                                          self.budget.max_seconds, str(idx))
+
+    def exit_block(self, block_type: str, params: Dict[str, Any], idx: Any,
+                   code: str, plan: List[Dict[str, Any]]) -> None:
+        self._open_blocks -= 1
+        if self._open_blocks == 0:
+            # Top-level code already contains the code of nested blocks
+            self.code_size += len(code) + 1
+            maximum = self.budget.max_code_size
+            if maximum is not None and self.code_size > maximum:
+                raise BudgetExceededError("code_size", self.code_size, maximum, str(idx))
+
+
+def compile_with_budget(blocks: List[Dict[str, Any]], budget: Optional[CompilationBudget] = None,
+                        generator: Optional[CodeGenerator] = None, include_implementations: bool = False,
+                        virtual_time: bool = False) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Generate code and an execution plan within a budget.
+
+    Args:
+        blocks: List of block dictionaries
+        budget: Limits to enforce (CompilationBudget defaults by default)
+        generator: Code generator to use (a new one by default)
+        include_implementations: If True, includes runtime implementations in the code
+        virtual_time: If True (with include_implementations), wait blocks use a virtual clock
+
+    Returns:
+        Tuple of (generated_code, execution_plan); see serialize_plan() for JSON
+
+    Raises:
+        BudgetExceededError: As soon as any limit is exceeded
+    """
+    budget = budget if budget is not None else CompilationBudget()
+    estimate_workflow(blocks, budget)
+
+    generator = generator if generator is not None else CodeGenerator()
+    guard = BudgetGuard(budget)
+    generator.listeners.append(guard)
+    try:
+        body_lines, plan = generator.generate_body(blocks)
+    finally:
+        generator.listeners.remove(guard)
+
+    code = generator.assemble_program(body_lines, include_implementations, virtual_time)
+    if budget.max_code_size is not None and len(code) > budget.max_code_size:
+        raise BudgetExceededError("code_size", len(code), budget.max_code_size)
+    return code, plan
@@ -0,0 +1,182 @@
+"""
+Compiled bytecode cache for generated programs.
+Code objects are keyed by a hash of the generated source, the filename they
+are compiled under and the interpreter's bytecode magic number. They are kept
+in an in-memory LRU and optionally persisted to disk with marshal, so running
+a workflow that has been seen before skips parsing and compilation.
+
+Unmarshalled code runs unchecked, so every disk entry is signed with an
+HMAC-SHA256 of its contents under the cache's secret. Entries written
+without that secret (by another process, or by anything else able to write
+to the directory) are ignored and recompiled.
+"""
+
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+from types import CodeType
+import hashlib
+import hmac
+import importlib.util
+import marshal
+import os
+import tempfile
+import threading
+
+from profiling import GenerationMetrics
+
+
+# Length of the HMAC-SHA256 signature that starts every disk entry
+SIGNATURE_SIZE = 32
+
+
+class BytecodeCache:
+    """
+    Two-level (memory, disk) cache of compiled code objects.
+    Disk entries are only valid for the interpreter version that wrote them,
+    since the bytecode magic number is part of every key, and for caches
+    holding the secret that signed them.
+    """
+
+    def __init__(self, max_entries: int = 1024, cache_dir: Optional[str] = None,
+                 metrics: Optional[GenerationMetrics] = None, secret: Optional[bytes] = None):
+        """
+        Args:
+            max_entries: Maximum code objects kept in memory
+            cache_dir: Directory for marshal files, or None for memory only
+            metrics: Optional metrics object that receives "bytecode" cache hits
+            secret: Key that signs disk entries. Defaults to a random key, so
+                only this cache trusts its files; share a secret kept out of
+                reach of the code being run to reuse entries across processes
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.metrics = metrics
+        self._secret = secret if secret is not None else os.urandom(32)
+        self._entries: "OrderedDict[str, CodeType]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(source: str, filename: str = "<generated>") -> str:
+        """Get the cache key for a source string."""
+        digest = hashlib.sha256(importlib.util.MAGIC_NUMBER)
+        digest.update(filename.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(source.encode("utf-8"))
+        return digest.hexdigest()
+
+    def compile(self, source: str, filename: str = "<generated>") -> CodeType:
+        """
+        Get the code object for a source string, compiling it on a miss.
+
+        Args:
+            source: Generated Python source
+            filename: Filename recorded in the code object (shown in tracebacks)
+
+        Returns:
+            Compiled module code object
+
+        Raises:
+            SyntaxError: If the source does not compile (nothing is cached)
+        """
+        key = self.key(source, filename)
+
+        with self._lock:
+            code = self._entries.get(key)
+            if code is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if code is not None:
+            self._record(True)
+            return code
+
+        code = self._load(key)
+        disk_hit = code is not None
+        if not disk_hit:
+            code = compile(source, filename, "exec")
+            self._store(key, code)
+        self._record(disk_hit)
+
+        with self._lock:
+            if disk_hit:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            self._entries[key] = code
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return code
+
+    def _record(self, hit: bool) -> None:
+        if self.metrics is not None:
+            self.metrics.record_cache("bytecode", hit)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".marshal")
+
+    def _sign(self, key: str, data: bytes) -> bytes:
+        # The key is signed too, so a valid entry cannot be copied under another key
+        return hmac.new(self._secret, key.encode("ascii") + data, hashlib.sha256).digest()
+
+    def _load(self, key: str) -> Optional[CodeType]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                signature = f.read(SIGNATURE_SIZE)
+                data = f.read()
+        except OSError:
+            return None
+        if not hmac.compare_digest(signature, self._sign(key, data)):
+            return None
+        try:
+            code = marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            return None
+        return code if isinstance(code, CodeType) else None
+
+    def _store(self, key: str, code: CodeType) -> None:
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        except OSError:
+            # Persisting is best effort; the memory cache still has the entry
+            return
+        try:
+            data = marshal.dumps(code)
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._sign(key, data))
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (disk files are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit and miss counters."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+        }
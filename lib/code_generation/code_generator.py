@@ -9,9 +9,15 @@ Core Gameplay Features:
 4. Toggle between template-based deterministic code and AI-generated code
 """
 
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Mapping, Tuple, Optional
 from enum import Enum
+from types import MappingProxyType
 import json
+import time
+
+from events import EventSink, NullEventSink, ConsoleEventSink, SessionEvent, SessionEventType
+from profiling import GenerationMetrics
+from simulation import compute_subroutine_effect
 
 
 class BlockType(Enum):
@@ -26,6 +32,7 @@ class BlockType(Enum):
     PRINT = "print"
     VARIABLE = "variable"
     FUNCTION = "function"
+    CALL = "call"
     WAIT = "wait"
     PICK_OBJECT = "pick_object"  # New command for picking objects
 
@@ -43,120 +50,275 @@ class CodeDisplayMode(Enum):
     AI_GENERATED = "ai_generated"      # AI-generated code
 
 
+# Palette command definitions. "aliases" are extra quick-add names and
+# "primary_param" is the parameter a quick-add argument sets.
+_COMMAND_DEFINITIONS: Dict[str, Dict[str, Any]] = {
+    "move": {
+        "type": BlockType.MOVE_FORWARD.value,
+        "label": "Move Forward",
+        "icon": "→",
+        "category": "movement",
+        "default_params": {"distance": 1},
+        "description": "Move the character forward by specified distance",
+        "primary_param": "distance",
+        "aliases": ("move_forward",)
+    },
+    "move_back": {
+        "type": BlockType.MOVE_BACKWARD.value,
+        "label": "Move Backward",
+        "icon": "←",
+        "category": "movement",
+        "default_params": {"distance": 1},
+        "description": "Move the character backward by specified distance",
+        "primary_param": "distance",
+        "aliases": ("move_backward",)
+    },
+    "turn_left": {
+        "type": BlockType.TURN_LEFT.value,
+        "label": "Turn Left",
+        "icon": "↰",
+        "category": "movement",
+        "default_params": {"degrees": 90},
+        "description": "Turn the character left by specified degrees",
+        "primary_param": "degrees",
+        "aliases": ("left",)
+    },
+    "turn_right": {
+        "type": BlockType.TURN_RIGHT.value,
+        "label": "Turn Right",
+        "icon": "↱",
+        "category": "movement",
+        "default_params": {"degrees": 90},
+        "description": "Turn the character right by specified degrees",
+        "primary_param": "degrees",
+        "aliases": ("right",)
+    },
+    "jump": {
+        "type": BlockType.JUMP.value,
+        "label": "Jump",
+        "icon": "⤴",
+        "category": "movement",
+        "default_params": {"height": 1},
+        "description": "Make the character jump to specified height",
+        "primary_param": "height",
+        "aliases": ()
+    },
+    "pick_object": {
+        "type": BlockType.PICK_OBJECT.value,
+        "label": "Pick Object",
+        "icon": "✋",
+        "category": "action",
+        "default_params": {"object_name": "item"},
+        "description": "Pick up an object in the environment",
+        "primary_param": "object_name",
+        "aliases": ("pick",)
+    },
+    "loop": {
+        "type": BlockType.LOOP.value,
+        "label": "Loop",
+        "icon": "⟳",
+        "category": "control",
+        "default_params": {"iterations": 3, "body": []},
+        "description": "Repeat a sequence of commands multiple times"
+    },
+    "conditional": {
+        "type": BlockType.CONDITIONAL.value,
+        "label": "If/Else",
+        "icon": "?",
+        "category": "control",
+        "default_params": {"condition": "True", "if_body": [], "else_body": []},
+        "description": "Execute commands based on a condition"
+    },
+    "call": {
+        "type": BlockType.CALL.value,
+        "label": "Call Function",
+        "icon": "↪",
+        "category": "control",
+        "default_params": {"name": "my_function", "arguments": []},
+        "description": "Run the commands of a defined function"
+    },
+    "print": {
+        "type": BlockType.PRINT.value,
+        "label": "Print",
+        "icon": "💬",
+        "category": "utility",
+        "default_params": {"message": "Hello"},
+        "description": "Print a message to the console",
+        "primary_param": "message",
+        "aliases": ()
+    },
+    "wait": {
+        "type": BlockType.WAIT.value,
+        "label": "Wait",
+        "icon": "⏱",
+        "category": "utility",
+        "default_params": {"seconds": 1},
+        "description": "Pause execution for specified seconds",
+        "primary_param": "seconds",
+        "aliases": ()
+    }
+}
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively convert dicts to read-only mappings and lists to tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Recursively convert frozen values back into fresh dicts and lists."""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class _TrieNode:
+    __slots__ = ("children", "command_ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.command_ids: Tuple[str, ...] = ()
+
+
 class CommandPalette:
     """
     Command palette for selecting available commands.
     Provides a structured interface for users to select commands.
+    
+    Command data is frozen and every index (by category, by block type, by
+    alias, and a prefix trie for autocomplete) is built once in the
+    constructor. Use the shared module-level PALETTE instead of building a
+    palette per session.
     """
     
-    def __init__(self):
-        self.commands = self._initialize_commands()
+    def __init__(self, definitions: Optional[Dict[str, Dict[str, Any]]] = None):
+        definitions = definitions if definitions is not None else _COMMAND_DEFINITIONS
+        self.commands: Mapping[str, Mapping[str, Any]] = _freeze(definitions)
+        
+        entries = {cmd_id: _freeze({"id": cmd_id, **cmd_data}) for cmd_id, cmd_data in definitions.items()}
+        self._all_commands = tuple(entries.values())
+        
+        categories: Dict[str, List[Mapping[str, Any]]] = {}
+        self._by_type: Dict[str, Mapping[str, Any]] = {}
+        for entry in self._all_commands:
+            categories.setdefault(entry["category"], []).append(entry)
+            self._by_type.setdefault(entry["type"], entry)
+        self._by_category = MappingProxyType({name: tuple(cmds) for name, cmds in categories.items()})
+        
+        # Quick-add names: command IDs and aliases -> (command ID, parameter name)
+        aliases: Dict[str, Tuple[str, str]] = {}
+        for cmd_id, cmd_data in self.commands.items():
+            param_name = cmd_data.get("primary_param")
+            if param_name is None:
+                continue
+            for alias in (cmd_id,) + cmd_data.get("aliases", ()):
+                aliases[alias.lower()] = (cmd_id, param_name)
+        self.aliases: Mapping[str, Tuple[str, str]] = MappingProxyType(aliases)
+        
+        # Exact lookups by ID, alias or label
+        names: Dict[str, str] = {}
+        for cmd_id, cmd_data in self.commands.items():
+            names.setdefault(cmd_id.lower(), cmd_id)
+            names.setdefault(cmd_data["label"].lower(), cmd_id)
+        for alias, (cmd_id, _) in aliases.items():
+            names.setdefault(alias, cmd_id)
+        self._names = names
+        
+        # Every trie node keeps the IDs of all commands below it. Commands are
+        # inserted in palette order, so each node's IDs are already ordered.
+        self._trie = _TrieNode()
+        self._trie.command_ids = tuple(self.commands)
+        for cmd_id, cmd_data in self.commands.items():
+            keys = {cmd_id.lower(), cmd_data["label"].lower()}
+            keys.update(cmd_data["label"].lower().split())
+            keys.update(alias.lower() for alias in cmd_data.get("aliases", ()))
+            for key in keys:
+                node = self._trie
+                for char in key:
+                    node = node.children.setdefault(char, _TrieNode())
+                    if cmd_id not in node.command_ids:
+                        node.command_ids += (cmd_id,)
     
-    def _initialize_commands(self) -> Dict[str, Dict[str, Any]]:
-        """Initialize available commands with their metadata."""
-        return {
-            "move": {
-                "type": BlockType.MOVE_FORWARD.value,
-                "label": "Move Forward",
-                "icon": "→",
-                "category": "movement",
-                "default_params": {"distance": 1},
-                "description": "Move the character forward by specified distance"
-            },
-            "move_back": {
-                "type": BlockType.MOVE_BACKWARD.value,
-                "label": "Move Backward",
-                "icon": "←",
-                "category": "movement",
-                "default_params": {"distance": 1},
-                "description": "Move the character backward by specified distance"
-            },
-            "turn_left": {
-                "type": BlockType.TURN_LEFT.value,
-                "label": "Turn Left",
-                "icon": "↰",
-                "category": "movement",
-                "default_params": {"degrees": 90},
-                "description": "Turn the character left by specified degrees"
-            },
-            "turn_right": {
-                "type": BlockType.TURN_RIGHT.value,
-                "label": "Turn Right",
-                "icon": "↱",
-                "category": "movement",
-                "default_params": {"degrees": 90},
-                "description": "Turn the character right by specified degrees"
-            },
-            "jump": {
-                "type": BlockType.JUMP.value,
-                "label": "Jump",
-                "icon": "⤴",
-                "category": "movement",
-                "default_params": {"height": 1},
-                "description": "Make the character jump to specified height"
-            },
-            "pick_object": {
-                "type": BlockType.PICK_OBJECT.value,
-                "label": "Pick Object",
-                "icon": "✋",
-                "category": "action",
-                "default_params": {"object_name": "item"},
-                "description": "Pick up an object in the environment"
-            },
-            "loop": {
-                "type": BlockType.LOOP.value,
-                "label": "Loop",
-                "icon": "⟳",
-                "category": "control",
-                "default_params": {"iterations": 3, "body": []},
-                "description": "Repeat a sequence of commands multiple times"
-            },
-            "conditional": {
-                "type": BlockType.CONDITIONAL.value,
-                "label": "If/Else",
-                "icon": "?",
-                "category": "control",
-                "default_params": {"condition": "True", "if_body": [], "else_body": []},
-                "description": "Execute commands based on a condition"
-            },
-            "print": {
-                "type": BlockType.PRINT.value,
-                "label": "Print",
-                "icon": "💬",
-                "category": "utility",
-                "default_params": {"message": "Hello"},
-                "description": "Print a message to the console"
-            },
-            "wait": {
-                "type": BlockType.WAIT.value,
-                "label": "Wait",
-                "icon": "⏱",
-                "category": "utility",
-                "default_params": {"seconds": 1},
-                "description": "Pause execution for specified seconds"
-            }
-        }
+    def get_commands_by_category(self) -> Mapping[str, Tuple[Mapping[str, Any], ...]]:
+        """Get commands organized by category (precomputed, read-only)."""
+        return self._by_category
     
-    def get_commands_by_category(self) -> Dict[str, List[Dict[str, Any]]]:
-        """Get commands organized by category."""
-        categories = {}
-        for cmd_id, cmd_data in self.commands.items():
-            category = cmd_data["category"]
-            if category not in categories:
-                categories[category] = []
-            categories[category].append({
-                "id": cmd_id,
-                **cmd_data
-            })
-        return categories
-    
-    def get_command(self, command_id: str) -> Optional[Dict[str, Any]]:
+    def get_command(self, command_id: str) -> Optional[Mapping[str, Any]]:
         """Get a specific command by ID."""
         return self.commands.get(command_id)
     
-    def get_all_commands(self) -> List[Dict[str, Any]]:
-        """Get all available commands."""
-        return [{"id": cmd_id, **cmd_data} for cmd_id, cmd_data in self.commands.items()]
+    def get_command_by_type(self, block_type: str) -> Optional[Mapping[str, Any]]:
+        """Get the first command that creates blocks of a type (includes its "id")."""
+        return self._by_type.get(block_type)
+    
+    def get_all_commands(self) -> Tuple[Mapping[str, Any], ...]:
+        """Get all available commands (precomputed, read-only)."""
+        return self._all_commands
+    
+    def default_params(self, command_id: str) -> Dict[str, Any]:
+        """Get a fresh, mutable copy of a command's default parameters."""
+        return _thaw(self.commands[command_id]["default_params"])
+    
+    def resolve_alias(self, name: str) -> Optional[Tuple[str, str]]:
+        """Get (command ID, parameter name) for a quick-add command name."""
+        return self.aliases.get(name.lower())
+    
+    def complete(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Autocomplete a command ID, alias or label word.
+        Finding the matches costs O(len(prefix)).
+        
+        Args:
+            prefix: Text typed so far (case-insensitive)
+            limit: Maximum number of command IDs to return
+            
+        Returns:
+            Matching command IDs, in palette order
+        """
+        node = self._trie
+        for char in prefix.lower():
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return list(node.command_ids[:limit])
+    
+    def resolve(self, text: str) -> Optional[str]:
+        """
+        Resolve user input to a command ID.
+        Tries an exact ID, alias or label first, then a prefix with a single match.
+        """
+        text = text.strip().lower()
+        if not text:
+            return None
+        cmd_id = self._names.get(text)
+        if cmd_id is not None:
+            return cmd_id
+        matches = self.complete(text, 2)
+        return matches[0] if len(matches) == 1 else None
+
+
+# Shared, immutable palette used by sessions, generators and the DSL
+PALETTE = CommandPalette()
+
+
+class WorkflowListener:
+    """
+    Receives a callback after every change to a VisualWorkflow.
+    Operations are "add", "insert", "remove", "move", "update" and "clear";
+    `index` is the position actually changed (the source for "move", 0 for
+    "clear"), `target` is the destination of a move and `command` is the new
+    command for add, insert and update.
+    """
+    
+    def workflow_changed(self, operation: str, index: int, command: Optional[Dict[str, Any]] = None,
+                         target: Optional[int] = None) -> None:
+        """Called after the workflow has changed."""
 
 
 class VisualWorkflow:
@@ -168,6 +330,12 @@ class VisualWorkflow:
     def __init__(self):
         self.sequence: List[Dict[str, Any]] = []
         self.current_index: int = -1
+        self.listeners: List[WorkflowListener] = []
+    
+    def _notify(self, operation: str, index: int, command: Optional[Dict[str, Any]] = None,
+                target: Optional[int] = None) -> None:
+        for listener in self.listeners:
+            listener.workflow_changed(operation, index, command, target)
     
     def add_command(self, command: Dict[str, Any]) -> int:
         """
@@ -180,32 +348,49 @@ class VisualWorkflow:
             Index of the added command
         """
         self.sequence.append(command)
-        return len(self.sequence) - 1
+        index = len(self.sequence) - 1
+        if self.listeners:
+            self._notify("add", index, command)
+        return index
     
     def insert_command(self, index: int, command: Dict[str, Any]) -> None:
         """Insert a command at a specific position."""
+        # Clamp like list.insert so listeners see the position actually used
+        if index < 0:
+            index = max(0, len(self.sequence) + index)
+        index = min(index, len(self.sequence))
         self.sequence.insert(index, command)
+        if self.listeners:
+            self._notify("insert", index, command)
     
     def remove_command(self, index: int) -> None:
         """Remove a command from the sequence."""
         if 0 <= index < len(self.sequence):
             self.sequence.pop(index)
+            if self.listeners:
+                self._notify("remove", index)
     
     def move_command(self, from_index: int, to_index: int) -> None:
         """Move a command from one position to another."""
         if 0 <= from_index < len(self.sequence) and 0 <= to_index < len(self.sequence):
             command = self.sequence.pop(from_index)
             self.sequence.insert(to_index, command)
+            if self.listeners:
+                self._notify("move", from_index, target=to_index)
     
     def update_command(self, index: int, command: Dict[str, Any]) -> None:
         """Update a command at a specific position."""
         if 0 <= index < len(self.sequence):
             self.sequence[index] = command
+            if self.listeners:
+                self._notify("update", index, command)
     
     def clear(self) -> None:
         """Clear all commands from the sequence."""
         self.sequence.clear()
         self.current_index = -1
+        if self.listeners:
+            self._notify("clear", 0)
     
     def get_sequence(self) -> List[Dict[str, Any]]:
         """Get the full command sequence."""
@@ -231,24 +416,51 @@ class VisualWorkflow:
         return visual
 
 
+class GenerationListener:
+    """
+    Receives callbacks while CodeGenerator walks a block tree.
+    Override only the callbacks you need; the defaults do nothing.
+    """
+    
+    def enter_block(self, block_type: str, params: Dict[str, Any], idx: Any, depth: int) -> None:
+        """Called before a block's handler runs."""
+    
+    def enter_branch(self, branch: str) -> None:
+        """Called before the child blocks of a branch ("body", "if" or "else") are processed."""
+    
+    def exit_block(self, block_type: str, params: Dict[str, Any], idx: Any,
+                   code: str, plan: List[Dict[str, Any]]) -> None:
+        """Called after a block's handler returns its code and plan."""
+
+
 class CodeGenerator:
     """
     Deterministic code generator that converts blocks to Python code.
     Supports live code display and toggling between template-based and AI-generated code.
+    
+    Pass a GenerationMetrics instance to collect per-handler profiling data;
+    without one, no timing or counting is performed. GenerationListener
+    objects added to `listeners` follow the same walk (see emitters.py).
     """
     
-    def __init__(self):
+    def __init__(self, metrics: Optional[GenerationMetrics] = None):
+        self.metrics = metrics
         self.indent_level = 0
         self.indent_size = 4
         self.variables = {}
+        # Subroutine records by function name, shared by every call site
+        self.functions: Dict[str, Dict[str, Any]] = {}
         self.display_mode = CodeDisplayMode.TEMPLATE_BASED
         self.workflow = VisualWorkflow()
-        self.palette = CommandPalette()
+        self.palette = PALETTE
+        # GenerationListener objects notified while blocks are processed
+        self.listeners: List["GenerationListener"] = []
         
     def reset(self):
         """Reset generator state."""
         self.indent_level = 0
         self.variables = {}
+        self.functions = {}
     
     def set_display_mode(self, mode: CodeDisplayMode) -> None:
         """
@@ -337,41 +549,112 @@ class CodeGenerator:
 # The AI would generate more natural, optimized code here
 """
     
-    def generate_from_blocks(self, blocks: List[Dict[str, Any]], include_implementations: bool = False) -> Tuple[str, List[Dict[str, Any]]]:
+    def generate_from_blocks(self, blocks: List[Dict[str, Any]], include_implementations: bool = False,
+                             virtual_time: bool = False, optimize: bool = False) -> Tuple[str, List[Dict[str, Any]]]:
         """
         Generate Python code and execution plan from block definitions.
         
         Args:
             blocks: List of block dictionaries with type and parameters
             include_implementations: If True, includes actual function implementations for executable code
+            virtual_time: If True (with include_implementations), wait blocks advance a
+                virtual clock instead of sleeping, so programs finish instantly
+            optimize: If True, constant-folds conditions, unwraps trivial loops and
+                drops unused functions before generating (see optimizer.py)
+            
+        Returns:
+            Tuple of (generated_code, execution_plan). Plan call items share
+            subroutine records; use serialize_plan() for JSON
+        """
+        if optimize:
+            from optimizer import optimize_blocks
+            blocks = optimize_blocks(blocks)
+        
+        started = time.perf_counter() if self.metrics is not None else 0.0
+        body_lines, execution_plan = self.generate_body(blocks)
+        code = self.assemble_program(body_lines, include_implementations, virtual_time)
+        if self.metrics is not None:
+            self.metrics.record_generation(
+                code.count("\n") + 1,
+                len(execution_plan),
+                time.perf_counter() - started
+            )
+        
+        return code, execution_plan
+    
+    def generate_body(self, blocks: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Walk the block tree once, producing the main program code and the plan.
+        Registered listeners are notified during the same walk.
+        Top-level function definitions are hoisted above the other blocks, so
+        the program can call a function before its definition, as the plan does.
+        
+        Args:
+            blocks: List of block dictionaries with type and parameters
             
         Returns:
-            Tuple of (generated_code, execution_plan)
+            Tuple of (code for each top-level block, execution_plan). Plan call
+            items share subroutine records; use serialize_plan() for JSON
         """
         self.reset()
-        code_lines = []
+        definition_lines = []
+        body_lines = []
         execution_plan = []
         
+        for idx, block in enumerate(blocks):
+            block_code, block_plan = self._process_block(block, idx)
+            if block_code:
+                if block.get("type") == BlockType.FUNCTION.value:
+                    definition_lines.append(block_code)
+                else:
+                    body_lines.append(block_code)
+            if block_plan:
+                execution_plan.extend(block_plan)
+        
+        return definition_lines + body_lines, execution_plan
+    
+    def compile_block(self, block: Dict[str, Any], idx: int) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Compile one top-level block as part of the program being built.
+        Unlike generate_body(), this does not reset the generator: functions
+        defined or called by earlier compile_block() calls stay registered, so
+        blocks that define or call functions must be compiled in program order
+        after a reset().
+        
+        Args:
+            block: Block dictionary
+            idx: Index of the block in the program (used as the plan step)
+            
+        Returns:
+            Tuple of (code_string, execution_plan_items); see serialize_plan() for JSON
+        """
+        return self._process_block(block, idx)
+    
+    def assemble_program(self, body_lines: List[str], include_implementations: bool = False,
+                         virtual_time: bool = False) -> str:
+        """
+        Wrap main program code from generate_body() into a complete program.
+        
+        Args:
+            body_lines: Code for each top-level block
+            include_implementations: If True, includes actual function implementations for executable code
+            virtual_time: If True (with include_implementations), wait blocks advance a virtual clock
+            
+        Returns:
+            Generated Python code string
+        """
         # Add imports and setup
-        code_lines.append("# Generated code from visual blocks")
-        code_lines.append("import time")
+        code_lines = ["# Generated code from visual blocks", "import time"]
         
         # Add function implementations if requested
         if include_implementations:
             code_lines.append("")
-            code_lines.extend(self._get_function_implementations())
+            code_lines.extend(self._get_function_implementations(virtual_time))
         
         code_lines.append("")
         code_lines.append("# Main program")
         code_lines.append("")
-        
-        # Process each block
-        for idx, block in enumerate(blocks):
-            block_code, block_plan = self._process_block(block, idx)
-            if block_code:
-                code_lines.append(block_code)
-            if block_plan:
-                execution_plan.extend(block_plan)
+        code_lines.extend(body_lines)
         
         # Add final position display if implementations are included
         if include_implementations:
@@ -379,14 +662,17 @@ class CodeGenerator:
             code_lines.append("# Show results")
             code_lines.append("show_final_position()")
         
-        return "\n".join(code_lines), execution_plan
+        return "\n".join(code_lines)
     
-    def _get_function_implementations(self) -> List[str]:
+    def _get_function_implementations(self, virtual_time: bool = False) -> List[str]:
         """
         Get actual Python function implementations for movement commands.
         This makes the generated code executable.
+        
+        Args:
+            virtual_time: If True, replaces the time module with a VirtualClock
         """
-        return [
+        implementations = [
             "# Character state",
             "class Character:",
             "    def __init__(self):",
@@ -434,6 +720,37 @@ class CodeGenerator:
             "    character.inventory.append(object_name)",
             "    character.log_action(f'Picked up {object_name} (inventory: {len(character.inventory)} items)')",
             "",
+            "# Conditions, matching evaluator.LevelState (an empty, unbounded level by default)",
+            "level_goal = None",
+            "level_walls = set()",
+            "",
+            "class Condition:",
+            "    \"\"\"A condition usable bare (if at_goal:) or called (if at_goal():).\"\"\"",
+            "    def __init__(self, check):",
+            "        self.check = check",
+            "    def __call__(self):",
+            "        return self.check()",
+            "    def __bool__(self):",
+            "        return bool(self.check())",
+            "",
+            "def cell_of(x, y):",
+            "    return (int(round(x)), int(round(y)))",
+            "",
+            "def has_item(object_name):",
+            "    \"\"\"Check whether an object has been picked up.\"\"\"",
+            "    return object_name in character.inventory",
+            "",
+            "def _at_goal():",
+            "    return level_goal is not None and cell_of(character.x, character.y) == tuple(level_goal)",
+            "",
+            "def _facing_wall():",
+            "    import math",
+            "    radians = math.radians(character.angle)",
+            "    return cell_of(character.x + math.cos(radians), character.y + math.sin(radians)) in level_walls",
+            "",
+            "at_goal = Condition(_at_goal)",
+            "facing_wall = Condition(_facing_wall)",
+            "",
             "def show_final_position():",
             "    \"\"\"Display the final character position.\"\"\"",
             "    print(f'\\n📍 Final Position: ({character.x:.2f}, {character.y:.2f})')",
@@ -442,6 +759,38 @@ class CodeGenerator:
             "    print(f'🎒 Inventory: {character.inventory}')",
             ""
         ]
+        
+        if virtual_time:
+            implementations[-1:-1] = [
+                "    print(f'⏱ Virtual Time: {time.now:.1f}s')"
+            ]
+            implementations.extend(self._get_virtual_clock_implementation())
+        
+        return implementations
+    
+    def _get_virtual_clock_implementation(self) -> List[str]:
+        """
+        Get a VirtualClock that stands in for the time module.
+        Wait blocks keep emitting time.sleep(...); only the runtime changes.
+        """
+        return [
+            "# Virtual clock: wait blocks advance logical time instead of sleeping",
+            "class VirtualClock:",
+            "    def __init__(self):",
+            "        self.now = 0.0",
+            "        ",
+            "    def sleep(self, seconds):",
+            "        self.now += seconds",
+            "        ",
+            "    def time(self):",
+            "        return self.now",
+            "        ",
+            "    def monotonic(self):",
+            "        return self.now",
+            "",
+            "time = VirtualClock()",
+            ""
+        ]
     
     def _process_block(self, block: Dict[str, Any], idx: int) -> Tuple[str, List[Dict[str, Any]]]:
         """
@@ -469,15 +818,35 @@ class CodeGenerator:
             BlockType.PRINT.value: self._handle_print,
             BlockType.VARIABLE.value: self._handle_variable,
             BlockType.FUNCTION.value: self._handle_function,
+            BlockType.CALL.value: self._handle_call,
             BlockType.WAIT.value: self._handle_wait,
             BlockType.PICK_OBJECT.value: self._handle_pick_object,
         }
         
         handler = handlers.get(block_type)
+        if self.metrics is None and not self.listeners:
+            if handler:
+                return handler(params, idx)
+            return self._handle_unknown(block_type, params, idx)
+        
+        depth = self.indent_level
+        for listener in self.listeners:
+            listener.enter_block(block_type, params, idx, depth)
+        started = time.perf_counter()
         if handler:
-            return handler(params, idx)
+            result = handler(params, idx)
         else:
-            return self._handle_unknown(block_type, params, idx)
+            result = self._handle_unknown(block_type, params, idx)
+        if self.metrics is not None:
+            self.metrics.record_handler(str(block_type), time.perf_counter() - started, depth)
+        for listener in self.listeners:
+            listener.exit_block(block_type, params, idx, result[0], result[1])
+        return result
+    
+    def _enter_branch(self, branch: str) -> None:
+        """Tell listeners that the following child blocks belong to a branch ("body", "if", "else")."""
+        for listener in self.listeners:
+            listener.enter_branch(branch)
     
     def _handle_move_forward(self, params: Dict[str, Any], idx: int) -> Tuple[str, List[Dict[str, Any]]]:
         """Handle move forward block."""
@@ -577,25 +946,35 @@ class CodeGenerator:
         code = f"{self._indent()}# Loop {iterations} times\n"
         code += f"{self._indent()}for i in range({iterations}):\n"
         
+        self._enter_branch("body")
         self.indent_level += 1
         body_code_lines = []
-        body_plan = []
+        body_block_plans = []
         
         for body_idx, body_block in enumerate(body):
             body_code, body_block_plan = self._process_block(body_block, f"{idx}_{body_idx}")
             if body_code:
                 body_code_lines.append(body_code)
             if body_block_plan:
-                # Replicate body plan for each iteration
-                for iteration in range(iterations):
-                    for plan_item in body_block_plan:
-                        plan_copy = plan_item.copy()
-                        plan_copy["step"] = f"{idx}_iter{iteration}_{body_idx}"
-                        plan_copy["loop_iteration"] = iteration
-                        body_plan.append(plan_copy)
+                body_block_plans.append((body_idx, body_block_plan))
         
         self.indent_level -= 1
         
+        # Replicate body plan for each iteration, in execution order. A body
+        # without plan items (e.g. an inner `repeat 0`) is not iterated at all,
+        # so its iteration count costs nothing
+        body_plan = []
+        for iteration in range(iterations if body_block_plans else 0):
+            for body_idx, body_block_plan in body_block_plans:
+                for plan_item in body_block_plan:
+                    plan_copy = plan_item.copy()
+                    plan_copy["step"] = f"{idx}_iter{iteration}_{body_idx}"
+                    plan_copy["loop_iteration"] = iteration
+                    body_plan.append(plan_copy)
+        
+        if self.metrics is not None:
+            self.metrics.record_loop(iterations, len(body_plan) // iterations if iterations else 0, len(body_plan))
+        
         if body_code_lines:
             code += "\n" + "\n".join(body_code_lines)
         else:
@@ -612,9 +991,11 @@ class CodeGenerator:
         code = f"{self._indent()}# Conditional: if {condition}\n"
         code += f"{self._indent()}if {condition}:\n"
         
+        self._enter_branch("if")
         self.indent_level += 1
         if_code_lines = []
         if_plan = []
+        else_plan = []
         
         for body_idx, body_block in enumerate(if_body):
             body_code, body_block_plan = self._process_block(body_block, f"{idx}_if_{body_idx}")
@@ -632,6 +1013,7 @@ class CodeGenerator:
         
         if else_body:
             code += f"\n{self._indent()}else:\n"
+            self._enter_branch("else")
             self.indent_level += 1
             else_code_lines = []
             
@@ -640,7 +1022,7 @@ class CodeGenerator:
                 if body_code:
                     else_code_lines.append(body_code)
                 if body_block_plan:
-                    if_plan.extend(body_block_plan)
+                    else_plan.extend(body_block_plan)
             
             self.indent_level -= 1
             
@@ -649,12 +1031,16 @@ class CodeGenerator:
             else:
                 code += f"{self._indent()}    pass"
         
-        # Add conditional marker to execution plan
+        # Add conditional marker to execution plan. "branches" keeps every step of
+        # both branches; the evaluator (evaluator.py) uses the split lists to
+        # expand only the branch that is taken.
         plan = [{
             "step": idx,
             "action": "conditional",
             "condition": condition,
-            "branches": if_plan
+            "branches": if_plan + else_plan,
+            "if_branch": if_plan,
+            "else_branch": else_plan
         }]
         
         return code, plan
@@ -703,9 +1089,18 @@ class CodeGenerator:
         code = f"{self._indent()}# Define function {func_name}\n"
         code += f"{self._indent()}def {func_name}({param_str}):\n"
         
+        # Calls that appear before the definition hold a placeholder record,
+        # which the first definition fills in; a redefinition gets a new record
+        subroutine = self.functions.get(func_name)
+        if subroutine is None or subroutine["defined"]:
+            subroutine = self._new_subroutine(func_name)
+        subroutine["defined"] = True
+        subroutine["parameters"] = func_params
+        
+        self._enter_branch("body")
         self.indent_level += 1
         body_code_lines = []
-        body_plan = []
+        body_plan = subroutine["body_plan"]
         
         for body_idx, body_block in enumerate(body):
             body_code, body_block_plan = self._process_block(body_block, f"{idx}_func_{body_idx}")
@@ -721,6 +1116,8 @@ class CodeGenerator:
         else:
             code += f"{self._indent()}    pass"
         
+        subroutine["effect"] = compute_subroutine_effect(body_plan)
+        
         plan = [{
             "step": idx,
             "action": "function_definition",
@@ -731,6 +1128,45 @@ class CodeGenerator:
         
         return code, plan
     
+    def _new_subroutine(self, func_name: str) -> Dict[str, Any]:
+        """Create and register an empty subroutine record."""
+        subroutine = {
+            "name": func_name,
+            "parameters": [],
+            "body_plan": [],
+            "effect": None,
+            "defined": False
+        }
+        self.functions[func_name] = subroutine
+        return subroutine
+    
+    def _handle_call(self, params: Dict[str, Any], idx: int) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Handle function call block.
+        The plan item references the subroutine record built by _handle_function
+        (body plan plus memoized effect) instead of copying the body.
+        """
+        func_name = params.get("name", "my_function")
+        arguments = params.get("arguments", [])
+        
+        subroutine = self.functions.get(func_name)
+        if subroutine is None:
+            subroutine = self._new_subroutine(func_name)
+        
+        arg_str = ", ".join(repr(arg) for arg in arguments)
+        code = f"{self._indent()}# Call function {func_name}\n"
+        code += f"{self._indent()}{func_name}({arg_str})"
+        
+        plan = [{
+            "step": idx,
+            "action": "call",
+            "name": func_name,
+            "arguments": arguments,
+            "subroutine": subroutine
+        }]
+        
+        return code, plan
+    
     def _handle_wait(self, params: Dict[str, Any], idx: int) -> Tuple[str, List[Dict[str, Any]]]:
         """Handle wait/sleep block."""
         seconds = params.get("seconds", 1)
@@ -760,18 +1196,52 @@ class CodeGenerator:
         return code, plan
 
 
+def serialize_plan(plan: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Convert an execution plan to plain JSON-friendly data.
+    Call items refer to their function by name; the body is only written once,
+    in the function_definition item, and recursive functions do not loop.
+    
+    Args:
+        plan: Execution plan from generate_from_blocks
+        
+    Returns:
+        A new plan without shared subroutine records
+    """
+    result = []
+    for item in plan:
+        if item.get("action") == "call":
+            effect = item["subroutine"].get("effect")
+            item = {key: value for key, value in item.items() if key != "subroutine"}
+            item["effect"] = effect.to_dict() if effect is not None else None
+        else:
+            item = dict(item)
+            for key in ("branches", "if_branch", "else_branch", "body_plan"):
+                if key in item:
+                    item[key] = serialize_plan(item[key])
+        result.append(item)
+    return result
+
+
 # Utility classes and functions for gameplay integration
 
 class GameplaySession:
     """
     Main gameplay session manager that integrates command palette,
     visual workflow, and code generation.
+    
+    Session changes are reported as SessionEvents to the configured event sink.
+    The default NullEventSink discards them; use ConsoleEventSink for terminal output.
     """
     
-    def __init__(self):
-        self.palette = CommandPalette()
+    def __init__(self, metrics: Optional[GenerationMetrics] = None, event_sink: Optional[EventSink] = None):
+        self.palette = PALETTE
         self.workflow = VisualWorkflow()
-        self.generator = CodeGenerator()
+        self.generator = CodeGenerator(metrics=metrics)
+        # Single-command snippets reset their generator, so they get their own
+        self.snippet_generator = CodeGenerator()
+        self.metrics = metrics
+        self.event_sink = event_sink or NullEventSink()
         self.code_cache = ""
         
     def add_command_from_palette(self, command_id: str, custom_params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -783,7 +1253,8 @@ class GameplaySession:
             custom_params: Optional custom parameters (overrides defaults)
             
         Returns:
-            Dictionary with command info and generated code
+            Dictionary with command info, the code for just this command
+            ("single_command_code") and the full generated code
         """
         # Get command from palette
         cmd_info = self.palette.get_command(command_id)
@@ -791,41 +1262,105 @@ class GameplaySession:
             return {"error": f"Command '{command_id}' not found in palette"}
         
         # Create block with parameters
-        params = cmd_info["default_params"].copy()
-        if custom_params:
-            params.update(custom_params)
+        block = self.build_block(command_id, custom_params)
         
-        block = {
-            "type": cmd_info["type"],
-            "params": params
-        }
+        result = self.add_block(block, cmd_info["label"])
+        result["command_id"] = command_id
+        return result
+    
+    def add_block(self, block: Dict[str, Any], label: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Add a prepared block (e.g. a loop compiled from the text DSL) to the workflow.
+        
+        Args:
+            block: Block dictionary with type and params
+            label: Display label (defaults to the block type)
+            
+        Returns:
+            Dictionary with command info, the code for just this command
+            ("single_command_code") and the full generated code
+        """
+        if label is None:
+            block_type = block.get("type", "unknown")
+            cmd_info = self.palette.get_command_by_type(block_type)
+            label = cmd_info["label"] if cmd_info else block_type
         
         # Add to workflow
         idx = self.workflow.add_command(block)
-        
-        # Generate code for just this command
-        single_code = self.generator.generate_code_for_single_command(block)
+        single_command_code = self.snippet_generator.generate_code_for_single_command(block)
+        
+        self.event_sink.emit(SessionEvent(
+            SessionEventType.COMMAND_ADDED,
+            {
+                "command_label": label,
+                "index": idx,
+                "block": block,
+                "single_command_code": single_command_code
+            }
+        ))
         
         # Generate updated full code
         self.update_code_display()
         
-        # Print the generated code immediately
-        print(f"\n✅ Generated code for '{cmd_info['label']}':")
-        print(single_code)
-        
         return {
             "success": True,
-            "command_id": command_id,
-            "command_label": cmd_info["label"],
+            "command_label": label,
             "index": idx,
             "block": block,
-            "code": self.code_cache,
-            "single_command_code": single_code
+            "single_command_code": single_command_code,
+            "code": self.code_cache
         }
     
+    def build_block(self, command_id: str, custom_params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Create a block for a palette command without adding it to the workflow.
+        
+        Args:
+            command_id: ID of the command from the palette
+            custom_params: Optional custom parameters (overrides defaults)
+            
+        Returns:
+            Block dictionary with type and params, or None if the command is unknown
+        """
+        cmd_info = self.palette.get_command(command_id)
+        if not cmd_info:
+            return None
+        
+        params = self.palette.default_params(command_id)
+        if custom_params:
+            params.update(custom_params)
+        
+        return {
+            "type": cmd_info["type"],
+            "params": params
+        }
+    
+    def get_single_command_code(self, index: int) -> str:
+        """
+        Generate code for a single command in the workflow.
+        
+        Args:
+            index: Position of the command in the workflow
+            
+        Returns:
+            Generated code string for this command
+        """
+        block = self.workflow.get_command(index)
+        if block is None:
+            return "# No code generated"
+        return self.snippet_generator.generate_code_for_single_command(block)
+    
     def remove_command_from_workflow(self, index: int) -> Dict[str, Any]:
         """Remove a command from the workflow and update code."""
+        block = self.workflow.get_command(index)
         self.workflow.remove_command(index)
+        
+        if block is not None:
+            self.event_sink.emit(SessionEvent(
+                SessionEventType.COMMAND_REMOVED,
+                {"index": index, "block": block}
+            ))
+        
         self.update_code_display()
         
         return {
@@ -833,6 +1368,12 @@ class GameplaySession:
             "code": self.code_cache
         }
     
+    def clear_workflow(self) -> None:
+        """Remove all commands from the workflow and update code."""
+        self.workflow.clear()
+        self.event_sink.emit(SessionEvent(SessionEventType.WORKFLOW_CLEARED, {}))
+        self.update_code_display()
+    
     def update_code_display(self) -> str:
         """
         Update the code display with current workflow.
@@ -840,6 +1381,10 @@ class GameplaySession:
         """
         sequence = self.workflow.get_sequence()
         self.code_cache = self.generator.generate_live_code_preview(sequence)
+        self.event_sink.emit(SessionEvent(
+            SessionEventType.CODE_UPDATED,
+            {"code": self.code_cache, "command_count": len(sequence)}
+        ))
         return self.code_cache
     
     def get_code_with_mode(self, mode: CodeDisplayMode) -> Dict[str, str]:
@@ -861,9 +1406,24 @@ class GameplaySession:
         return self.workflow.get_visual_representation()
     
     def get_palette_commands_by_category(self) -> Dict[str, List[Dict[str, Any]]]:
-        """Get all available commands organized by category."""
-        return self.palette.get_commands_by_category()
-    
+        """
+        Get all available commands organized by category.
+        Returns plain dicts and lists (JSON-serializable, safe to modify); the
+        palette's own index stays frozen.
+        """
+        return _thaw(self.palette.get_commands_by_category())
+
+    def get_metrics_snapshot(self) -> Dict[str, Any]:
+        """
+        Get profiling metrics collected by this session's generator.
+
+        Returns:
+            Metrics snapshot dictionary, or an empty dict when profiling is disabled
+        """
+        if self.metrics is None:
+            return {}
+        return self.metrics.snapshot()
+
     def export_session(self) -> Dict[str, Any]:
         """
         Export the current session state.
@@ -908,7 +1468,7 @@ def demonstrate_gameplay_features():
     print("=" * 70)
     
     # Create a gameplay session
-    session = GameplaySession()
+    session = GameplaySession(event_sink=ConsoleEventSink())
     
     print("\n1. COMMAND PALETTE - Available Commands:")
     print("-" * 70)
@@ -0,0 +1,462 @@
+"""
+Memory-mapped columnar corpus of recorded workflows.
+Workflows are flattened into preorder node columns and parameter columns, with
+a shared string table. CorpusWriter appends them to a directory of files.
+CorpusReader maps those files and slices the columns through memoryviews, so
+opening a corpus loads nothing. WorkflowView and BlockView present one
+workflow as read-only sequences and mappings that CodeGenerator and the
+optimizer can consume directly.
+
+Files (native byte order, recorded in corpus.json):
+    nodes_type.u32      string id of each node's block type
+    nodes_end.u32       end of each node's subtree, relative to its workflow's first node
+    nodes_slot.u32      string id of the parameter list holding the node ("" at top level)
+    nodes_params.u64    index of the node's first parameter
+    nodes_nparams.u16   number of parameters
+    params_key.u32      string id of each parameter name
+    params_kind.u8      value kind (see KIND_*)
+    params_value.i64    int value, float bits, or string id, by kind
+    strings.bin         UTF-8 strings, back to back
+    strings_end.u64     end offset of each string in strings.bin
+    workflows.u64       first node of each workflow, plus the total node count
+A workflow is committed once its entry in workflows.u64 is written, so
+readers ignore a partially appended workflow.
+"""
+
+from typing import Dict, List, Any, Iterator, Mapping, Optional, Sequence, Tuple
+from array import array
+from collections import Counter
+from functools import lru_cache
+import json
+import mmap
+import os
+import struct
+import sys
+
+CORPUS_VERSION = 1
+
+# Parameter value kinds
+KIND_NONE, KIND_BOOL, KIND_INT, KIND_FLOAT, KIND_STR, KIND_JSON, KIND_BLOCKS = range(7)
+
+# Parameters whose list values hold child blocks
+CHILD_LIST_KEYS = ("body", "if_body", "else_body")
+
+# Column name -> array typecode
+_COLUMNS = {
+    "nodes_type": "I",
+    "nodes_end": "I",
+    "nodes_slot": "I",
+    "nodes_params": "Q",
+    "nodes_nparams": "H",
+    "params_key": "I",
+    "params_kind": "B",
+    "params_value": "q",
+    "strings_end": "Q",
+    "workflows": "Q",
+}
+
+_FILE_SUFFIXES = {"I": ".u32", "Q": ".u64", "H": ".u16", "B": ".u8", "q": ".i64"}
+
+_INT64 = struct.Struct("=q")
+_FLOAT64 = struct.Struct("=d")
+
+
+def _column_path(path: str, name: str) -> str:
+    return os.path.join(path, name + _FILE_SUFFIXES[_COLUMNS[name]])
+
+
+class CorpusWriter:
+    """Append-only writer for a corpus directory."""
+
+    def __init__(self, path: str):
+        """
+        Open a corpus for appending, creating it if needed.
+
+        Args:
+            path: Corpus directory
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "corpus.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("version") != CORPUS_VERSION or meta.get("byteorder") != sys.byteorder:
+                raise ValueError(f"incompatible corpus at {path}")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"version": CORPUS_VERSION, "byteorder": sys.byteorder}, f)
+
+        self._files = {name: open(_column_path(path, name), "ab") for name in _COLUMNS}
+        self._strings_file = open(os.path.join(path, "strings.bin"), "ab")
+
+        # Resume counters and the string table from the committed data
+        with CorpusReader(path) as reader:
+            self._strings: Dict[str, int] = {reader.string(i): i for i in range(reader.string_count)}
+            self._string_bytes = reader.string_bytes
+            self._node_count = reader.node_count
+            self._param_count = reader.param_count
+            self._workflow_count = len(reader)
+        self._truncate_uncommitted()
+
+    def _truncate_uncommitted(self) -> None:
+        """Drop rows written after the last committed workflow."""
+        sizes = {
+            "nodes_type": self._node_count, "nodes_end": self._node_count,
+            "nodes_slot": self._node_count, "nodes_params": self._node_count,
+            "nodes_nparams": self._node_count, "params_key": self._param_count,
+            "params_kind": self._param_count, "params_value": self._param_count,
+            "strings_end": len(self._strings),
+            "workflows": self._workflow_count + 1 if self._workflow_count else 0,
+        }
+        for name, rows in sizes.items():
+            self._files[name].truncate(rows * array(_COLUMNS[name]).itemsize)
+        self._strings_file.truncate(self._string_bytes)
+        if self._workflow_count == 0:
+            # The workflows column starts with the first node of workflow 0
+            array("Q", [0]).tofile(self._files["workflows"])
+
+    def _string_id(self, text: str, new_strings: List[str]) -> int:
+        string_id = self._strings.get(text)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings[text] = string_id
+            new_strings.append(text)
+        return string_id
+
+    def add_workflow(self, blocks: Sequence[Mapping[str, Any]]) -> int:
+        """
+        Append a workflow.
+
+        Args:
+            blocks: Block dictionaries (e.g. VisualWorkflow.get_sequence())
+
+        Returns:
+            Index of the workflow in the corpus
+        """
+        columns = {name: array(typecode) for name, typecode in _COLUMNS.items()
+                   if name not in ("strings_end", "workflows")}
+        new_strings: List[str] = []
+        top_slot = self._string_id("", new_strings)
+
+        def add_block(block: Mapping[str, Any], slot: int) -> None:
+            node = len(columns["nodes_type"])
+            columns["nodes_type"].append(self._string_id(str(block.get("type", "")), new_strings))
+            columns["nodes_end"].append(0)
+            columns["nodes_slot"].append(slot)
+            columns["nodes_params"].append(self._param_count + len(columns["params_key"]))
+            params = block.get("params", {})
+            columns["nodes_nparams"].append(len(params))
+            children = []
+            for key, value in params.items():
+                kind, encoded = self._encode(key, value, new_strings)
+                columns["params_key"].append(self._string_id(str(key), new_strings))
+                columns["params_kind"].append(kind)
+                columns["params_value"].append(encoded)
+                if kind == KIND_BLOCKS:
+                    children.append((self._string_id(str(key), new_strings), value))
+            for child_slot, child_blocks in children:
+                for child in child_blocks:
+                    add_block(child, child_slot)
+            columns["nodes_end"][node] = len(columns["nodes_type"])
+
+        try:
+            for block in blocks:
+                add_block(block, top_slot)
+        except Exception:
+            for text in new_strings:
+                del self._strings[text]
+            raise
+
+        # Strings and rows first; the workflows entry commits them
+        if new_strings:
+            ends = array("Q")
+            for text in new_strings:
+                data = text.encode("utf-8")
+                self._strings_file.write(data)
+                self._string_bytes += len(data)
+                ends.append(self._string_bytes)
+            ends.tofile(self._files["strings_end"])
+        for name, column in columns.items():
+            column.tofile(self._files[name])
+        self._node_count += len(columns["nodes_type"])
+        self._param_count += len(columns["params_key"])
+        array("Q", [self._node_count]).tofile(self._files["workflows"])
+        self._workflow_count += 1
+        return self._workflow_count - 1
+
+    def _encode(self, key: str, value: Any, new_strings: List[str]) -> Tuple[int, int]:
+        if key in CHILD_LIST_KEYS and isinstance(value, (list, tuple)) \
+                and all(isinstance(child, Mapping) for child in value):
+            return KIND_BLOCKS, len(value)
+        if value is None:
+            return KIND_NONE, 0
+        if isinstance(value, bool):
+            return KIND_BOOL, int(value)
+        if isinstance(value, int) and -2 ** 63 <= value < 2 ** 63:
+            return KIND_INT, value
+        if isinstance(value, float):
+            return KIND_FLOAT, _INT64.unpack(_FLOAT64.pack(value))[0]
+        if isinstance(value, str):
+            return KIND_STR, self._string_id(value, new_strings)
+        return KIND_JSON, self._string_id(json.dumps(value), new_strings)
+
+    def flush(self) -> None:
+        """Flush written workflows to disk, making them visible to new readers."""
+        self._strings_file.flush()
+        for f in self._files.values():
+            f.flush()
+
+    def close(self) -> None:
+        """Flush and close all files."""
+        self.flush()
+        self._strings_file.close()
+        for f in self._files.values():
+            f.close()
+
+    def __enter__(self) -> "CorpusWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CorpusReader:
+    """
+    Read-only, memory-mapped view of a corpus directory.
+    Only the pages that are touched are read from disk.
+    """
+
+    def __init__(self, path: str, string_cache_size: int = 4096):
+        """
+        Args:
+            path: Corpus directory
+            string_cache_size: Number of decoded strings kept in an LRU cache
+        """
+        self.path = path
+        meta_path = os.path.join(path, "corpus.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("version") != CORPUS_VERSION or meta.get("byteorder") != sys.byteorder:
+                raise ValueError(f"incompatible corpus at {path}")
+        self._maps: List[mmap.mmap] = []
+        columns = {name: self._map(_column_path(path, name), typecode) for name, typecode in _COLUMNS.items()}
+        self._strings = self._map(os.path.join(path, "strings.bin"), "B")
+
+        # Committed sizes come from the workflows column; later rows are ignored
+        self._workflows = workflows = columns["workflows"]
+        self.node_count = workflows[-1] if len(workflows) else 0
+        self.nodes_type = columns["nodes_type"][:self.node_count]
+        self.nodes_end = columns["nodes_end"][:self.node_count]
+        self.nodes_slot = columns["nodes_slot"][:self.node_count]
+        self.nodes_params = columns["nodes_params"][:self.node_count]
+        self.nodes_nparams = columns["nodes_nparams"][:self.node_count]
+        if self.node_count:
+            last = self.node_count - 1
+            self.param_count = self.nodes_params[last] + self.nodes_nparams[last]
+        else:
+            self.param_count = 0
+        self.params_key = columns["params_key"][:self.param_count]
+        self.params_kind = columns["params_kind"][:self.param_count]
+        raw_values = columns["params_value"][:self.param_count]
+        self.params_int = raw_values
+        self.params_float = raw_values.cast("B").cast("d") if len(raw_values) else raw_values
+
+        # Strings are written before the rows that reference them
+        strings_end = columns["strings_end"]
+        self._strings_end = strings_end
+        self.string_count = len(strings_end)
+        self.string_bytes = strings_end[self.string_count - 1] if self.string_count else 0
+        self.string = lru_cache(maxsize=string_cache_size)(self._decode_string)
+
+    def _map(self, file_path: str, typecode: str) -> memoryview:
+        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            return memoryview(array(typecode))
+        with open(file_path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        itemsize = array(typecode).itemsize
+        view = memoryview(mapped)
+        usable = len(view) - len(view) % itemsize
+        return view[:usable].cast(typecode) if typecode != "B" else view
+
+    def _decode_string(self, string_id: int) -> str:
+        start = self._strings_end[string_id - 1] if string_id else 0
+        return str(self._strings[start:self._strings_end[string_id]], "utf-8")
+
+    def __len__(self) -> int:
+        """Number of committed workflows."""
+        return max(len(self._workflows) - 1, 0)
+
+    def __getitem__(self, index: int) -> "WorkflowView":
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("workflow index out of range")
+        return WorkflowView(self, self._workflows[index], self._workflows[index + 1])
+
+    def __iter__(self) -> Iterator["WorkflowView"]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def block_type_counts(self) -> Counter:
+        """
+        Count block types over the whole corpus.
+        Counts string ids straight from the mapped column, then decodes each
+        distinct id once.
+        """
+        counts = Counter(self.nodes_type)
+        return Counter({self.string(string_id): count for string_id, count in counts.items()})
+
+    def value(self, param: int) -> Any:
+        """Decode the value of a (non-block) parameter row."""
+        kind = self.params_kind[param]
+        if kind == KIND_INT:
+            return self.params_int[param]
+        if kind == KIND_FLOAT:
+            return self.params_float[param]
+        if kind == KIND_STR:
+            return self.string(self.params_int[param])
+        if kind == KIND_BOOL:
+            return bool(self.params_int[param])
+        if kind == KIND_JSON:
+            return json.loads(self.string(self.params_int[param]))
+        return None
+
+    def close(self) -> None:
+        """Release the mappings. Views still held elsewhere keep their pages alive."""
+        for name in ("nodes_type", "nodes_end", "nodes_slot", "nodes_params", "nodes_nparams",
+                     "params_key", "params_kind", "params_int", "params_float"):
+            setattr(self, name, None)
+        self._workflows = self._strings = self._strings_end = None
+        self.string.cache_clear()
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+        self._maps = []
+
+    def __enter__(self) -> "CorpusReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class WorkflowView(Sequence):
+    """Zero-copy sequence of the top-level blocks of one workflow."""
+
+    def __init__(self, reader: CorpusReader, start: int, end: int):
+        self.reader = reader
+        self.start = start
+        self.end = end
+        self._roots: Optional[List[int]] = None
+
+    @property
+    def node_types(self) -> memoryview:
+        """String ids of every node in the workflow, in preorder (zero-copy)."""
+        return self.reader.nodes_type[self.start:self.end]
+
+    def _root_nodes(self) -> List[int]:
+        if self._roots is None:
+            roots = []
+            node = self.start
+            while node < self.end:
+                roots.append(node)
+                node = self.start + self.reader.nodes_end[node]
+            self._roots = roots
+        return self._roots
+
+    def __len__(self) -> int:
+        return len(self._root_nodes())
+
+    def __getitem__(self, index):
+        roots = self._root_nodes()
+        if isinstance(index, slice):
+            return [BlockView(self.reader, self.start, node) for node in roots[index]]
+        return BlockView(self.reader, self.start, roots[index])
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Materialize the workflow as plain block dictionaries."""
+        return [block.to_dict() for block in self]
+
+
+class BlockView(Mapping):
+    """Read-only mapping with the "type" and "params" of one block node."""
+
+    __slots__ = ("reader", "base", "node")
+
+    def __init__(self, reader: CorpusReader, base: int, node: int):
+        self.reader = reader
+        self.base = base
+        self.node = node
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "type":
+            return self.reader.string(self.reader.nodes_type[self.node])
+        if key == "params":
+            return ParamsView(self.reader, self.base, self.node)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("type", "params"))
+
+    def __len__(self) -> int:
+        return 2
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Materialize the block as a plain dictionary."""
+        return {"type": self["type"], "params": self["params"].to_dict()}
+
+
+class ParamsView(Mapping):
+    """Read-only mapping of a block's parameters, decoded on access."""
+
+    __slots__ = ("reader", "base", "node")
+
+    def __init__(self, reader: CorpusReader, base: int, node: int):
+        self.reader = reader
+        self.base = base
+        self.node = node
+
+    def _rows(self) -> range:
+        start = self.reader.nodes_params[self.node]
+        return range(start, start + self.reader.nodes_nparams[self.node])
+
+    def _children(self, slot: int) -> List[BlockView]:
+        reader = self.reader
+        children = []
+        node = self.node + 1
+        end = self.base + reader.nodes_end[self.node]
+        while node < end:
+            if reader.nodes_slot[node] == slot:
+                children.append(BlockView(reader, self.base, node))
+            node = self.base + reader.nodes_end[node]
+        return children
+
+    def __getitem__(self, key: str) -> Any:
+        reader = self.reader
+        for row in self._rows():
+            key_id = reader.params_key[row]
+            if reader.string(key_id) == key:
+                if reader.params_kind[row] == KIND_BLOCKS:
+                    return self._children(key_id)
+                return reader.value(row)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.reader.string(self.reader.params_key[row]) for row in self._rows())
+
+    def __len__(self) -> int:
+        return self.reader.nodes_nparams[self.node]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Materialize the parameters as a plain dictionary."""
+        result = {}
+        for key, value in self.items():
+            if isinstance(value, list) and value and isinstance(value[0], BlockView):
+                value = [child.to_dict() for child in value]
+            result[key] = value
+        return result
@@ -0,0 +1,388 @@
+"""
+Source maps and step debugging for generated programs.
+SourceMapBuilder is a GenerationListener, so the source map is built during
+the generator's own traversal. Each block gets an entry with:
+- its path in the workflow, e.g. (2, "body", 0) for the first block in the
+  body of top-level block 2 ("if", "else" and "func" name the other branches)
+- the range of program lines it generated
+- the range of execution plan items it produced
+
+Every plan item is tagged with the id of the block that produced it (the
+"block" key), and loop copies keep the tag. StepDebugger walks the executed
+steps one at a time, looks the active block up by that tag and highlights
+its lines and its top-level position in the VisualWorkflow.
+"""
+
+from typing import Dict, List, Any, Optional, Set, Tuple, Union
+
+from code_generator import BlockType, CodeGenerator, GenerationListener, VisualWorkflow
+from evaluator import LevelState, PlanEvaluator
+from ir import lower_plan
+from simulation import CharacterState
+
+
+BlockPath = Tuple[Union[int, str], ...]
+
+
+class SourceMapEntry:
+    """Source map data for one block."""
+
+    __slots__ = ("id", "path", "block_type", "parent", "subtree_end", "line_start", "line_end",
+                 "plan_start", "plan_end", "_line_count", "_line_offset")
+
+    def __init__(self, entry_id: int, path: BlockPath, block_type: str, parent: Optional[int]):
+        self.id = entry_id
+        self.path = path
+        self.block_type = block_type
+        self.parent = parent
+        # Ids are assigned in pre-order, so descendants are ids id+1 .. subtree_end-1
+        self.subtree_end = entry_id + 1
+        # 1-based, inclusive program line range
+        self.line_start = 0
+        self.line_end = 0
+        # Top-level execution plan range [plan_start, plan_end), None if the block
+        # only runs inside conditional branches or function bodies
+        self.plan_start: Optional[int] = None
+        self.plan_end: Optional[int] = None
+        self._line_count = 0
+        self._line_offset = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the entry to a JSON-friendly dictionary."""
+        return {
+            "id": self.id,
+            "path": list(self.path),
+            "type": self.block_type,
+            "parent": self.parent,
+            "lines": [self.line_start, self.line_end],
+            "plan": [self.plan_start, self.plan_end] if self.plan_start is not None else None
+        }
+
+
+class SourceMap:
+    """Maps blocks to program lines and plan items, and program lines back to blocks."""
+
+    def __init__(self, entries: List[SourceMapEntry], line_blocks: List[int]):
+        self.entries = entries
+        self.by_path = {entry.path: entry for entry in entries}
+        # Innermost block id for each program line (index 0 is line 1), -1 if none
+        self.line_blocks = line_blocks
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def entry_for_path(self, path: BlockPath) -> Optional[SourceMapEntry]:
+        """Get the entry of a block path."""
+        return self.by_path.get(tuple(path))
+
+    def entry_for_line(self, line: int) -> Optional[SourceMapEntry]:
+        """Get the innermost block that generated a 1-based program line."""
+        if 1 <= line <= len(self.line_blocks) and self.line_blocks[line - 1] >= 0:
+            return self.entries[self.line_blocks[line - 1]]
+        return None
+
+    def entry_for_item(self, item: Dict[str, Any]) -> Optional[SourceMapEntry]:
+        """Get the block that produced a (tagged) plan item."""
+        block_id = item.get("block")
+        return self.entries[block_id] if block_id is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the source map to a JSON-friendly dictionary."""
+        return {"blocks": [entry.to_dict() for entry in self.entries]}
+
+
+class _Frame:
+    __slots__ = ("entry", "branch", "counts", "children")
+
+    def __init__(self, entry: SourceMapEntry):
+        self.entry = entry
+        self.branch = "body"
+        self.counts: Dict[str, int] = {}
+        self.children: List[Tuple[SourceMapEntry, str]] = []
+
+
+class SourceMapBuilder(GenerationListener):
+    """
+    Builds a SourceMap while CodeGenerator walks the blocks.
+    Child code is located inside its parent's code when the parent finishes,
+    so line ranges need no knowledge of each handler's layout.
+    """
+
+    def __init__(self):
+        self.entries: List[SourceMapEntry] = []
+        self._stack: List[_Frame] = []
+        self._top_level: List[SourceMapEntry] = []
+
+    def enter_block(self, block_type: str, params: Dict[str, Any], idx: Any, depth: int) -> None:
+        if self._stack:
+            frame = self._stack[-1]
+            position = frame.counts.get(frame.branch, 0)
+            frame.counts[frame.branch] = position + 1
+            path = frame.entry.path + (frame.branch, position)
+            parent = frame.entry.id
+        else:
+            path = (len(self._top_level),)
+            parent = None
+        entry = SourceMapEntry(len(self.entries), path, block_type, parent)
+        self.entries.append(entry)
+        self._stack.append(_Frame(entry))
+
+    def enter_branch(self, branch: str) -> None:
+        self._stack[-1].branch = branch
+
+    def exit_block(self, block_type: str, params: Dict[str, Any], idx: Any,
+                   code: str, plan: List[Dict[str, Any]]) -> None:
+        frame = self._stack.pop()
+        entry = frame.entry
+        entry.subtree_end = len(self.entries)
+        entry._line_count = code.count("\n") + 1
+
+        # Children appear in order inside the parent's code
+        cursor = 0
+        line = 0
+        for child, child_code in frame.children:
+            position = code.find(child_code, cursor)
+            if position < 0:
+                child._line_offset = 0
+                continue
+            line += code.count("\n", cursor, position)
+            child._line_offset = line
+            cursor = position + len(child_code)
+            line += child_code.count("\n")
+
+        # Loop plans are copies of already tagged child items
+        block_id = entry.id
+        for item in plan:
+            if "block" not in item:
+                item["block"] = block_id
+
+        if self._stack:
+            self._stack[-1].children.append((entry, code))
+        else:
+            self._top_level.append(entry)
+
+    def build(self, code: str, plan: List[Dict[str, Any]]) -> SourceMap:
+        """
+        Finish the source map once the program has been assembled.
+
+        Args:
+            code: Complete program from CodeGenerator.assemble_program
+            plan: Top-level execution plan
+        """
+        entries = self.entries
+        # Top-level block code follows the "# Main program" header and a blank line
+        marker = code.find("# Main program\n")
+        line = code.count("\n", 0, marker) + 3 if marker >= 0 else 1
+        # CodeGenerator.generate_body() places top-level function definitions first
+        hoisted = sorted(self._top_level, key=lambda entry: entry.block_type != BlockType.FUNCTION.value)
+        for entry in hoisted:
+            entry.line_start = line
+            line += entry._line_count
+        for entry in entries:
+            if entry.parent is not None:
+                entry.line_start = entries[entry.parent].line_start + entry._line_offset
+            entry.line_end = entry.line_start + entry._line_count - 1
+
+        for index, item in enumerate(plan):
+            entry = entries[item["block"]]
+            if entry.plan_start is None:
+                entry.plan_start = index
+            entry.plan_end = index + 1
+        # Children have larger ids than their parents, so one reverse pass widens every ancestor
+        for entry in reversed(entries):
+            if entry.parent is not None and entry.plan_start is not None:
+                parent = entries[entry.parent]
+                if parent.plan_start is None or entry.plan_start < parent.plan_start:
+                    parent.plan_start = entry.plan_start
+                if parent.plan_end is None or entry.plan_end > parent.plan_end:
+                    parent.plan_end = entry.plan_end
+
+        line_blocks = [-1] * (code.count("\n") + 1)
+        for entry in entries:
+            for line_index in range(entry.line_start - 1, min(entry.line_end, len(line_blocks))):
+                line_blocks[line_index] = entry.id
+        return SourceMap(entries, line_blocks)
+
+
+def generate_with_source_map(blocks: List[Dict[str, Any]], generator: Optional[CodeGenerator] = None,
+                             include_implementations: bool = False,
+                             virtual_time: bool = False) -> Tuple[str, List[Dict[str, Any]], SourceMap]:
+    """
+    Generate code, execution plan and source map in one traversal.
+    Plan items are tagged with the id of the block that produced them.
+
+    Returns:
+        Tuple of (generated_code, execution_plan, source_map); see serialize_plan()
+        for turning the plan into JSON
+    """
+    generator = generator if generator is not None else CodeGenerator()
+    builder = SourceMapBuilder()
+    generator.listeners.append(builder)
+    try:
+        code, plan = generator.generate_from_blocks(blocks, include_implementations, virtual_time)
+    finally:
+        generator.listeners.remove(builder)
+    return code, plan, builder.build(code, plan)
+
+
+class StepDebugger:
+    """
+    Steps through a workflow's executed plan items.
+    Each step is O(1): the evaluator yields the next executed item lazily and
+    the active block is found through the item's block tag. Visited steps are
+    kept, so stepping back replays nothing.
+    """
+
+    def __init__(self, workflow: Union[VisualWorkflow, List[Dict[str, Any]]],
+                 level: Optional[LevelState] = None, start: Optional[CharacterState] = None,
+                 generator: Optional[CodeGenerator] = None):
+        """
+        Args:
+            workflow: VisualWorkflow (its current_index follows the active block) or block list
+            level: Level used to decide conditions
+            start: Start state (defaults to the origin, facing +x)
+            generator: Code generator to use (a new one by default)
+        """
+        self.workflow = workflow if isinstance(workflow, VisualWorkflow) else None
+        blocks = workflow.get_sequence() if isinstance(workflow, VisualWorkflow) else workflow
+        self.code, self.plan, self.source_map = generate_with_source_map(blocks, generator)
+        self.program = lower_plan(self.plan)
+        self.lines = self.code.split("\n")
+        self.level = level
+        self.start = start
+        # Breakpoint block ids, and the breakpoint covering each block id
+        self.breakpoints: Set[int] = set()
+        self._break_cover: Dict[int, int] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        """Go back to before the first step."""
+        self.evaluator = PlanEvaluator(self.level)
+        self._steps = self.evaluator.iter_steps(self.program, self.start)
+        self.history: List[Tuple[Dict[str, Any], CharacterState]] = []
+        self.position = -1
+        self.finished = False
+        if self.workflow is not None:
+            self.workflow.current_index = -1
+
+    # Breakpoints
+
+    def _resolve(self, path: Optional[BlockPath], line: Optional[int]) -> SourceMapEntry:
+        entry = (self.source_map.entry_for_path(path) if path is not None
+                 else self.source_map.entry_for_line(line) if line is not None else None)
+        if entry is None:
+            raise ValueError(f"no block at {'path ' + repr(path) if path is not None else 'line ' + repr(line)}")
+        return entry
+
+    def _rebuild_cover(self) -> None:
+        cover: Dict[int, int] = {}
+        # Outer breakpoints first, so the innermost breakpoint covers each block
+        for block_id in sorted(self.breakpoints):
+            for covered in range(block_id, self.source_map.entries[block_id].subtree_end):
+                cover[covered] = block_id
+        self._break_cover = cover
+
+    def add_breakpoint(self, path: Optional[BlockPath] = None, line: Optional[int] = None) -> int:
+        """
+        Break when a block starts executing.
+        A breakpoint on a loop, conditional or function triggers on entry to it.
+
+        Args:
+            path: Block path, e.g. (2, "body", 0)
+            line: 1-based program line (its innermost block is used)
+
+        Returns:
+            Id of the block the breakpoint is set on
+        """
+        entry = self._resolve(path, line)
+        self.breakpoints.add(entry.id)
+        self._rebuild_cover()
+        return entry.id
+
+    def remove_breakpoint(self, path: Optional[BlockPath] = None, line: Optional[int] = None) -> None:
+        """Remove a breakpoint set with add_breakpoint()."""
+        self.breakpoints.discard(self._resolve(path, line).id)
+        self._rebuild_cover()
+
+    # Stepping
+
+    def step(self) -> Optional[Dict[str, Any]]:
+        """
+        Execute the next step.
+
+        Returns:
+            The new current step (see current()), or None when the program has finished
+        """
+        if self.position + 1 < len(self.history):
+            self.position += 1
+        else:
+            item = next(self._steps, None)
+            if item is None:
+                self.finished = True
+                return None
+            self.history.append((item, self.evaluator.state.copy()))
+            self.position += 1
+        current = self.current()
+        if self.workflow is not None:
+            self.workflow.current_index = current["path"][0] if current["path"] else -1
+        return current
+
+    def step_back(self) -> Optional[Dict[str, Any]]:
+        """Go back one step; returns the new current step, or None before the first."""
+        if self.position < 0:
+            return None
+        self.position -= 1
+        self.finished = False
+        current = self.current()
+        if self.workflow is not None:
+            self.workflow.current_index = current["path"][0] if current is not None and current["path"] else -1
+        return current
+
+    def _hits_breakpoint(self, item: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> bool:
+        block_id = item.get("block")
+        breakpoint_id = self._break_cover.get(block_id)
+        if breakpoint_id is None:
+            return False
+        if breakpoint_id == block_id:
+            return True
+        # Inside a composite breakpoint: only stop when entering it
+        previous_id = previous.get("block") if previous is not None else None
+        return previous_id is None or not breakpoint_id <= previous_id < self.source_map.entries[breakpoint_id].subtree_end
+
+    def continue_(self) -> Optional[Dict[str, Any]]:
+        """
+        Run until a breakpoint is hit or the program finishes.
+
+        Returns:
+            The step stopped at, or None when the program has finished
+        """
+        while True:
+            previous = self.history[self.position][0] if self.position >= 0 else None
+            current = self.step()
+            if current is None or self._hits_breakpoint(current["item"], previous):
+                return current
+
+    def current(self) -> Optional[Dict[str, Any]]:
+        """
+        Describe the current step.
+
+        Returns:
+            Dictionary with the step "index", plan "item", "state" after it, the block's
+            "path", "type" and 1-based "lines" range, and the highlighted "code"
+        """
+        if self.position < 0:
+            return None
+        item, state = self.history[self.position]
+        entry = self.source_map.entry_for_item(item)
+        if entry is None:
+            return {"index": self.position, "item": item, "state": state, "path": (),
+                    "type": None, "lines": None, "code": ""}
+        return {
+            "index": self.position,
+            "item": item,
+            "state": state,
+            "path": entry.path,
+            "type": entry.block_type,
+            "lines": (entry.line_start, entry.line_end),
+            "code": "\n".join(self.lines[entry.line_start - 1:entry.line_end])
+        }
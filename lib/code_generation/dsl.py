@@ -0,0 +1,417 @@
+"""
+Text DSL for authoring block programs.
+Compiles a small text language straight into the nested block dictionaries
+that CodeGenerator handles.
+
+Example:
+    repeat 4 {
+        move 2; right 90
+        pick coin
+    }
+    if has("key") and not facing_wall { move 1 } else { left 90 }
+    def square { repeat 4 { move 1; right 90 } }
+    call square
+
+Grammar:
+    program    := statements
+    statements := { ';' | NEWLINE | statement }
+    statement  := ('repeat' | 'loop') NUMBER ['times'] block
+                | 'if' condition block ['else' (block | if-statement)]
+                | 'def' NAME ['(' [NAME {',' NAME}] ')'] block
+                | 'call' NAME ['(' [value {',' value}] ')']
+                | 'let' NAME '=' value
+                | command {value}
+    condition  := and_cond {'or' and_cond}
+    and_cond   := not_cond {'and' not_cond}
+    not_cond   := 'not' not_cond | '(' condition ')' | 'has' '(' STRING ')'
+                | 'at_goal' | 'facing_wall' | 'true' | 'false'
+    block      := '{' statements '}'
+
+Commands use the quick-add names from the palette's alias index (move 5,
+turn_left 90, pick key, ...). Text parameters take the rest of the statement
+as written, up to ';', '}' or the end of the line (print Hello, world!). Tokenizing and parsing are single-pass, so compile time is
+linear in the source length. Errors carry line and column numbers; nesting
+deeper than MAX_NESTING is a syntax error rather than a RecursionError.
+"""
+
+from typing import Dict, List, Any, Optional
+import ast
+import json
+import re
+
+from code_generator import BlockType, CommandPalette, PALETTE
+
+
+# Condition keywords mapped to the Python expression emitted in generated code
+CONDITION_NAMES = {
+    'at_goal': 'at_goal',
+    'facing_wall': 'facing_wall',
+    'true': 'True',
+    'false': 'False',
+}
+
+# Deepest nesting of blocks, else-if chains, 'not' and parentheses. The parser
+# and everything downstream of it recurse once per level
+MAX_NESTING = 100
+
+KEYWORDS = {'repeat', 'loop', 'times', 'if', 'else', 'def', 'call', 'let', 'and', 'or', 'not'}
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<NEWLINE>\n)
+  | (?P<SKIP>[ \t\r]+|\#[^\n]*)
+  | (?P<NUMBER>-?\d+(?:\.\d+)?)
+  | (?P<STRING>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<NAME>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<PUNCT>[{}();,=])
+  | (?P<MISMATCH>.)
+""", re.VERBOSE)
+
+
+class DSLSyntaxError(ValueError):
+    """Raised when DSL source cannot be tokenized or parsed."""
+
+    def __init__(self, message: str, line: int, column: int):
+        super().__init__(f"line {line}, column {column}: {message}")
+        self.message = message
+        self.line = line
+        self.column = column
+
+    def format_with_source(self, source: str) -> str:
+        """Return the error with the offending source line and a caret marker."""
+        lines = source.splitlines()
+        if not 0 < self.line <= len(lines):
+            return str(self)
+        return f"{self}\n  {lines[self.line - 1]}\n  {' ' * (self.column - 1)}^"
+
+
+class Token:
+    """A lexical token with its source position."""
+    __slots__ = ("kind", "value", "line", "column")
+
+    def __init__(self, kind: str, value: str, line: int, column: int):
+        self.kind = kind
+        self.value = value
+        self.line = line
+        self.column = column
+
+    def __repr__(self) -> str:
+        return f"Token({self.kind}, {self.value!r}, {self.line}:{self.column})"
+
+
+def tokenize(source: str) -> List[Token]:
+    """
+    Split DSL source into tokens.
+
+    Args:
+        source: Program text
+
+    Returns:
+        List of tokens ending with an EOF token. Characters that do not start
+        any token become MISMATCH tokens, which only text parameters accept.
+    """
+    tokens = []
+    line = 1
+    line_start = 0
+    for match in TOKEN_PATTERN.finditer(source):
+        kind = match.lastgroup
+        value = match.group()
+        column = match.start() - line_start + 1
+        if kind == "NEWLINE":
+            tokens.append(Token(kind, value, line, column))
+            line += 1
+            line_start = match.end()
+        elif kind == "SKIP":
+            continue
+        elif kind == "NAME" and value in KEYWORDS:
+            tokens.append(Token("KEYWORD", value, line, column))
+        else:
+            tokens.append(Token(kind, value, line, column))
+    tokens.append(Token("EOF", "", line, len(source) - line_start + 1))
+    return tokens
+
+
+class Parser:
+    """Recursive-descent parser producing block dictionaries."""
+
+    def __init__(self, tokens: List[Token], palette: Optional[CommandPalette] = None):
+        self.tokens = tokens
+        self.pos = 0
+        self.palette = palette or PALETTE
+        self.depth = 0
+
+    # Token helpers
+
+    def _peek(self) -> Token:
+        return self.tokens[self.pos]
+
+    def _advance(self) -> Token:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _check(self, kind: str, value: Optional[str] = None) -> bool:
+        token = self.tokens[self.pos]
+        return token.kind == kind and (value is None or token.value == value)
+
+    def _accept(self, kind: str, value: Optional[str] = None) -> Optional[Token]:
+        if self._check(kind, value):
+            return self._advance()
+        return None
+
+    def _expect(self, kind: str, value: Optional[str] = None, what: Optional[str] = None) -> Token:
+        if self._check(kind, value):
+            return self._advance()
+        description = what or (repr(value) if value else kind.lower())
+        raise self._error(f"expected {description}")
+
+    def _error(self, message: str, token: Optional[Token] = None) -> DSLSyntaxError:
+        token = token or self._peek()
+        if token.kind == "MISMATCH":
+            return DSLSyntaxError(f"unexpected character {token.value!r}", token.line, token.column)
+        found = "end of input" if token.kind == "EOF" else repr(token.value)
+        if token.kind == "NEWLINE":
+            found = "end of line"
+        return DSLSyntaxError(f"{message}, found {found}", token.line, token.column)
+
+    def _enter(self, token: Token) -> None:
+        self.depth += 1
+        if self.depth > MAX_NESTING:
+            raise DSLSyntaxError("nesting too deep", token.line, token.column)
+
+    def _leave(self) -> None:
+        self.depth -= 1
+
+    def _skip_newlines(self) -> None:
+        while self._accept("NEWLINE"):
+            pass
+
+    # Grammar rules
+
+    def parse_program(self) -> List[Dict[str, Any]]:
+        """Parse the whole token stream."""
+        blocks = self._parse_statements()
+        if not self._check("EOF"):
+            token = self._peek()
+            raise DSLSyntaxError("unmatched '}'", token.line, token.column)
+        return blocks
+
+    def _parse_statements(self) -> List[Dict[str, Any]]:
+        blocks = []
+        while True:
+            if self._accept("NEWLINE") or self._accept("PUNCT", ";"):
+                continue
+            if self._check("EOF") or self._check("PUNCT", "}"):
+                return blocks
+            blocks.append(self._parse_statement())
+            if not (self._check("NEWLINE") or self._check("EOF")
+                    or self._check("PUNCT", ";") or self._check("PUNCT", "}")):
+                raise self._error("expected ';' or end of line")
+
+    def _parse_block(self) -> List[Dict[str, Any]]:
+        self._skip_newlines()
+        self._enter(self._expect("PUNCT", "{"))
+        body = self._parse_statements()
+        self._expect("PUNCT", "}")
+        self._leave()
+        return body
+
+    def _parse_statement(self) -> Dict[str, Any]:
+        token = self._peek()
+        if token.kind == "KEYWORD":
+            if token.value in ("repeat", "loop"):
+                return self._parse_repeat()
+            if token.value == "if":
+                return self._parse_if()
+            if token.value == "def":
+                return self._parse_def()
+            if token.value == "call":
+                return self._parse_call()
+            if token.value == "let":
+                return self._parse_let()
+            raise self._error("expected a statement")
+        if token.kind == "NAME":
+            return self._parse_command()
+        raise self._error("expected a command")
+
+    def _parse_repeat(self) -> Dict[str, Any]:
+        self._advance()
+        count = self._expect("NUMBER", what="repeat count")
+        if "." in count.value or count.value.startswith("-"):
+            raise self._error("repeat count must be a non-negative integer", count)
+        self._accept("KEYWORD", "times")
+        body = self._parse_block()
+        return {
+            "type": BlockType.LOOP.value,
+            "params": {"iterations": int(count.value), "body": body}
+        }
+
+    def _parse_if(self) -> Dict[str, Any]:
+        self._advance()
+        condition = self._parse_condition()
+        if_body = self._parse_block()
+
+        # Allow 'else' on the line after the closing brace
+        mark = self.pos
+        self._skip_newlines()
+        else_body: List[Dict[str, Any]] = []
+        if self._accept("KEYWORD", "else"):
+            if self._check("KEYWORD", "if"):
+                self._enter(self._peek())
+                else_body = [self._parse_if()]
+                self._leave()
+            else:
+                else_body = self._parse_block()
+        else:
+            self.pos = mark
+
+        return {
+            "type": BlockType.CONDITIONAL.value,
+            "params": {"condition": condition, "if_body": if_body, "else_body": else_body}
+        }
+
+    def _parse_condition(self) -> str:
+        parts = [self._parse_and_condition()]
+        while self._accept("KEYWORD", "or"):
+            parts.append(self._parse_and_condition())
+        return " or ".join(parts)
+
+    def _parse_and_condition(self) -> str:
+        parts = [self._parse_not_condition()]
+        while self._accept("KEYWORD", "and"):
+            parts.append(self._parse_not_condition())
+        return " and ".join(parts)
+
+    def _parse_not_condition(self) -> str:
+        token = self._peek()
+        if self._accept("KEYWORD", "not"):
+            self._enter(token)
+            operand = self._parse_not_condition()
+            self._leave()
+            return f"not {operand}"
+        if self._accept("PUNCT", "("):
+            self._enter(token)
+            inner = self._parse_condition()
+            self._expect("PUNCT", ")")
+            self._leave()
+            return f"({inner})"
+        if token.kind == "NAME" and token.value == "has":
+            self._advance()
+            self._expect("PUNCT", "(")
+            item = self._expect("STRING", what="item name string")
+            self._expect("PUNCT", ")")
+            return f"has_item({json.dumps(self._value(item))})"
+        if token.kind == "NAME" and token.value in CONDITION_NAMES:
+            self._advance()
+            return CONDITION_NAMES[token.value]
+        raise self._error("expected a condition (has(\"item\"), at_goal, facing_wall, true, false)")
+
+    def _parse_def(self) -> Dict[str, Any]:
+        self._advance()
+        name = self._expect("NAME", what="function name")
+        parameters = []
+        if self._accept("PUNCT", "("):
+            if not self._check("PUNCT", ")"):
+                parameters.append(self._expect("NAME", what="parameter name").value)
+                while self._accept("PUNCT", ","):
+                    parameters.append(self._expect("NAME", what="parameter name").value)
+            self._expect("PUNCT", ")")
+        body = self._parse_block()
+        return {
+            "type": BlockType.FUNCTION.value,
+            "params": {"name": name.value, "parameters": parameters, "body": body}
+        }
+
+    def _parse_call(self) -> Dict[str, Any]:
+        self._advance()
+        name = self._expect("NAME", what="function name")
+        arguments = []
+        if self._accept("PUNCT", "("):
+            if not self._check("PUNCT", ")"):
+                arguments.append(self._parse_argument())
+                while self._accept("PUNCT", ","):
+                    arguments.append(self._parse_argument())
+            self._expect("PUNCT", ")")
+        return {
+            "type": BlockType.CALL.value,
+            "params": {"name": name.value, "arguments": arguments}
+        }
+
+    def _parse_argument(self) -> Any:
+        if self._peek().kind not in ("NUMBER", "STRING", "NAME"):
+            raise self._error("expected an argument value")
+        return self._value(self._advance())
+
+    def _parse_let(self) -> Dict[str, Any]:
+        self._advance()
+        name = self._expect("NAME", what="variable name")
+        self._expect("PUNCT", "=")
+        token = self._peek()
+        if token.kind not in ("NUMBER", "STRING", "NAME"):
+            raise self._error("expected a value")
+        return {
+            "type": BlockType.VARIABLE.value,
+            "params": {"name": name.value, "value": self._value(self._advance())}
+        }
+
+    def _parse_command(self) -> Dict[str, Any]:
+        name = self._advance()
+        alias = self.palette.resolve_alias(name.value)
+        if alias is None:
+            raise DSLSyntaxError(f"unknown command {name.value!r}", name.line, name.column)
+        cmd_id, param_name = alias
+
+        cmd_info = self.palette.get_command(cmd_id)
+        params = self.palette.default_params(cmd_id)
+
+        # Text parameters take the rest of the statement, so 'print Hello, world!' works
+        args = []
+        if isinstance(params.get(param_name), str):
+            while not (self._check("NEWLINE") or self._check("EOF")
+                       or self._check("PUNCT", ";") or self._check("PUNCT", "}")):
+                args.append(self._advance())
+        elif self._peek().kind in ("NUMBER", "STRING", "NAME"):
+            args.append(self._advance())
+
+        if len(args) == 1 and args[0].kind in ("NUMBER", "STRING", "NAME"):
+            params[param_name] = self._value(args[0])
+        elif args:
+            params[param_name] = self._source_text(args)
+        return {"type": cmd_info["type"], "params": params}
+
+    @staticmethod
+    def _source_text(tokens: List[Token]) -> str:
+        """Rebuild the text of consecutive tokens on one line, keeping their spacing."""
+        parts = [tokens[0].value]
+        for previous, token in zip(tokens, tokens[1:]):
+            gap = token.column - previous.column - len(previous.value)
+            parts.append(" " * gap + token.value)
+        return "".join(parts)
+
+    @staticmethod
+    def _value(token: Token) -> Any:
+        if token.kind == "NUMBER":
+            return float(token.value) if "." in token.value else int(token.value)
+        if token.kind == "STRING":
+            try:
+                return ast.literal_eval(token.value)
+            except (SyntaxError, ValueError):
+                raise DSLSyntaxError(f"invalid string literal {token.value}", token.line, token.column)
+        return token.value
+
+
+def compile_program(source: str, palette: Optional[CommandPalette] = None) -> List[Dict[str, Any]]:
+    """
+    Compile DSL source into a list of block dictionaries.
+
+    Args:
+        source: Program text
+        palette: Palette supplying block types and default parameters
+
+    Returns:
+        List of block dictionaries for CodeGenerator.generate_from_blocks
+
+    Raises:
+        DSLSyntaxError: If the source is not a valid program
+    """
+    return Parser(tokenize(source), palette).parse_program()
+
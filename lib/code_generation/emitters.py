@@ -0,0 +1,186 @@
+"""
+Additional code generation targets driven by CodeGenerator listeners.
+An emitter is a GenerationListener that builds its own output while the
+generator walks the block tree, so several targets come out of one traversal:
+generate_all_targets() returns the Python template, the executable Python
+program, JavaScript and the execution plan from a single walk.
+"""
+
+from typing import Dict, List, Any, Optional
+import ast
+import json
+
+from code_generator import BlockType, CodeGenerator, GenerationListener
+
+
+# Runtime functions called by the JavaScript target, by block type
+JS_COMMANDS = {
+    BlockType.MOVE_FORWARD.value: ("moveForward", "distance", 1),
+    BlockType.MOVE_BACKWARD.value: ("moveBackward", "distance", 1),
+    BlockType.TURN_LEFT.value: ("turnLeft", "degrees", 90),
+    BlockType.TURN_RIGHT.value: ("turnRight", "degrees", 90),
+    BlockType.JUMP.value: ("jump", "height", 1),
+    BlockType.PICK_OBJECT.value: ("pickObject", "object_name", "item"),
+    BlockType.PRINT.value: ("console.log", "message", "Hello"),
+    BlockType.WAIT.value: ("wait", "seconds", 1),
+}
+
+# Condition names translated to JavaScript runtime calls
+JS_CONDITION_NAMES = {
+    "at_goal": "atGoal()",
+    "facing_wall": "facingWall()",
+    "has_item": "hasItem",
+}
+
+_JS_OPERATORS = {
+    ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.Mod: "%",
+    ast.Eq: "===", ast.NotEq: "!==", ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">=",
+}
+
+
+def _js_expression(node: ast.AST) -> str:
+    """Translate a Python condition expression node to JavaScript."""
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool):
+            return "true" if node.value else "false"
+        if node.value is None:
+            return "null"
+        return json.dumps(node.value)
+    if isinstance(node, ast.Name):
+        return JS_CONDITION_NAMES.get(node.id, node.id)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        name = JS_CONDITION_NAMES.get(node.func.id, node.func.id).rstrip("()")
+        return f"{name}({', '.join(_js_expression(arg) for arg in node.args)})"
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return f"!({_js_expression(node.operand)})"
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return f"-{_js_expression(node.operand)}"
+    if isinstance(node, ast.BoolOp):
+        joiner = " && " if isinstance(node.op, ast.And) else " || "
+        return "(" + joiner.join(_js_expression(value) for value in node.values) + ")"
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, ast.FloorDiv):
+            return f"Math.floor({_js_expression(node.left)} / {_js_expression(node.right)})"
+        if type(node.op) in _JS_OPERATORS:
+            return f"({_js_expression(node.left)} {_JS_OPERATORS[type(node.op)]} {_js_expression(node.right)})"
+    if isinstance(node, ast.Compare):
+        parts = []
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            if type(op) not in _JS_OPERATORS:
+                raise ValueError(f"unsupported comparison {type(op).__name__}")
+            parts.append(f"{_js_expression(left)} {_JS_OPERATORS[type(op)]} {_js_expression(right)}")
+            left = right
+        return " && ".join(parts) if len(parts) == 1 else "(" + " && ".join(parts) + ")"
+    raise ValueError(f"unsupported expression {type(node).__name__}")
+
+
+def js_condition(condition: Any) -> str:
+    """
+    Translate a block condition to a JavaScript expression.
+    Conditions that cannot be translated are kept verbatim in a comment.
+    """
+    if isinstance(condition, bool):
+        return "true" if condition else "false"
+    try:
+        return _js_expression(ast.parse(str(condition).strip(), mode="eval").body)
+    except (SyntaxError, ValueError):
+        return f"false /* untranslated: {str(condition).replace('*/', '* /')} */"
+
+
+class JavaScriptEmitter(GenerationListener):
+    """
+    Emits JavaScript for the traversed blocks. The program expects a runtime
+    providing moveForward, moveBackward, turnLeft, turnRight, jump,
+    pickObject, wait, hasItem, atGoal and facingWall.
+    """
+
+    def __init__(self, indent: str = "  "):
+        self.indent = indent
+        self.lines: List[str] = []
+        self.depth = 0
+        # Parameter names of the enclosing function definitions
+        self.parameters: List[str] = []
+        self._parameter_counts: List[int] = []
+
+    def _value(self, value: Any) -> str:
+        """A literal, or a bare identifier if it names a parameter of an enclosing function."""
+        if isinstance(value, str) and value in self.parameters:
+            return value
+        return json.dumps(value)
+
+    def _emit(self, line: str, depth: Optional[int] = None) -> None:
+        self.lines.append(self.indent * (self.depth if depth is None else depth) + line)
+
+    def enter_block(self, block_type: str, params: Dict[str, Any], idx: Any, depth: int) -> None:
+        if block_type in JS_COMMANDS:
+            function, param_name, default = JS_COMMANDS[block_type]
+            self._emit(f"{function}({self._value(params.get(param_name, default))});")
+        elif block_type == BlockType.VARIABLE.value:
+            self._emit(f"var {params.get('name', 'x')} = {self._value(params.get('value', 0))};")
+        elif block_type == BlockType.CALL.value:
+            arguments = ", ".join(self._value(arg) for arg in params.get("arguments", []))
+            self._emit(f"{params.get('name', 'my_function')}({arguments});")
+        elif block_type == BlockType.LOOP.value:
+            self._emit(f"for (let i = 0; i < {params.get('iterations', 3)}; i++) {{")
+            self.depth += 1
+        elif block_type == BlockType.CONDITIONAL.value:
+            self._emit(f"if ({js_condition(params.get('condition', 'True'))}) {{")
+            self.depth += 1
+        elif block_type == BlockType.FUNCTION.value:
+            parameters = list(params.get("parameters", []))
+            self._emit(f"function {params.get('name', 'my_function')}({', '.join(parameters)}) {{")
+            self.parameters.extend(parameters)
+            self._parameter_counts.append(len(parameters))
+            self.depth += 1
+        else:
+            self._emit(f"// Unknown block type: {block_type}")
+
+    def enter_branch(self, branch: str) -> None:
+        if branch == "else":
+            self._emit("} else {", self.depth - 1)
+
+    def exit_block(self, block_type: str, params: Dict[str, Any], idx: Any,
+                   code: str, plan: List[Dict[str, Any]]) -> None:
+        if block_type in (BlockType.LOOP.value, BlockType.CONDITIONAL.value, BlockType.FUNCTION.value):
+            self.depth -= 1
+            self._emit("}")
+        if block_type == BlockType.FUNCTION.value:
+            del self.parameters[len(self.parameters) - self._parameter_counts.pop():]
+
+    def get_code(self) -> str:
+        """Get the complete JavaScript program."""
+        return "\n".join(["// Generated code from visual blocks", ""] + self.lines)
+
+
+def generate_all_targets(blocks: List[Dict[str, Any]], generator: Optional[CodeGenerator] = None,
+                         virtual_time: bool = False,
+                         emitters: Optional[List[GenerationListener]] = None) -> Dict[str, Any]:
+    """
+    Generate every output view from one traversal of the block tree.
+
+    Args:
+        blocks: List of block dictionaries
+        generator: Code generator to use (a new one by default)
+        virtual_time: If True, the executable program uses a virtual clock
+        emitters: Extra listeners to feed during the same traversal
+
+    Returns:
+        Dictionary with "template", "executable", "javascript" and "plan"
+        (the execution plan; see serialize_plan() for JSON)
+    """
+    generator = generator if generator is not None else CodeGenerator()
+    javascript = JavaScriptEmitter()
+    listeners = [javascript] + list(emitters or [])
+    generator.listeners.extend(listeners)
+    try:
+        body_lines, plan = generator.generate_body(blocks)
+    finally:
+        del generator.listeners[-len(listeners):]
+
+    return {
+        "template": generator.assemble_program(body_lines),
+        "executable": generator.assemble_program(body_lines, True, virtual_time),
+        "javascript": javascript.get_code(),
+        "plan": plan
+    }
@@ -0,0 +1,267 @@
+"""
+State-aware evaluation of execution plans.
+Conditional plan items carry the steps of both branches. PlanEvaluator walks a
+plan against a simulated character and level, resolves each condition when it
+is reached (has_item("key"), at_goal, facing_wall, True/False, not/and/or)
+and expands only the branch that is taken, so consumers see exactly the steps
+that run.
+
+The level is a grid of unit cells: a position belongs to the cell of its
+rounded coordinates, and "ahead" is the cell one unit along the heading.
+"""
+
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, Tuple, Union
+from functools import lru_cache
+import ast
+import math
+
+from ir import CALL, INVALID, JUMP, RETURN, STEP, TEST, WIDTH, PlanProgram, lower_plan
+from optimizer import evaluate_constant_condition
+from simulation import MAX_CALL_DEPTH, CharacterState, apply_plan_item
+
+
+Cell = Tuple[int, int]
+
+
+class ConditionError(ValueError):
+    """Raised when a condition uses names or syntax the evaluator does not know."""
+
+
+class LevelState:
+    """Static level layout that conditions are evaluated against."""
+
+    def __init__(self, goal: Optional[Cell] = None, walls: Iterable[Cell] = (),
+                 bounds: Optional[Tuple[int, int, int, int]] = None,
+                 objects: Optional[Dict[Cell, str]] = None):
+        """
+        Args:
+            goal: Goal cell, or None if the level has no goal
+            walls: Blocked cells
+            bounds: Inclusive (min_x, min_y, max_x, max_y); cells outside count as walls
+            objects: Object names by cell, or None if objects can be picked anywhere
+        """
+        self.goal = tuple(goal) if goal is not None else None
+        self.walls = frozenset(tuple(cell) for cell in walls)
+        self.bounds = tuple(bounds) if bounds is not None else None
+        self.objects = {tuple(cell): name for cell, name in objects.items()} if objects is not None else None
+
+    @staticmethod
+    def cell_of(state: CharacterState) -> Cell:
+        """Get the cell the character stands in."""
+        return (int(round(state.x)), int(round(state.y)))
+
+    @staticmethod
+    def cell_ahead(state: CharacterState) -> Cell:
+        """Get the cell one unit ahead of the character."""
+        radians = math.radians(state.angle)
+        return (int(round(state.x + math.cos(radians))), int(round(state.y + math.sin(radians))))
+
+    def in_bounds(self, cell: Cell) -> bool:
+        """Check whether a cell is inside the level bounds."""
+        if self.bounds is None:
+            return True
+        min_x, min_y, max_x, max_y = self.bounds
+        return min_x <= cell[0] <= max_x and min_y <= cell[1] <= max_y
+
+    def is_blocked(self, cell: Cell) -> bool:
+        """Check whether a cell is a wall or outside the level."""
+        return cell in self.walls or not self.in_bounds(cell)
+
+    def at_goal(self, state: CharacterState) -> bool:
+        return self.goal is not None and self.cell_of(state) == self.goal
+
+    def facing_wall(self, state: CharacterState) -> bool:
+        return self.is_blocked(self.cell_ahead(state))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the level to a JSON-friendly dictionary."""
+        return {
+            "goal": list(self.goal) if self.goal is not None else None,
+            "walls": sorted(list(cell) for cell in self.walls),
+            "bounds": list(self.bounds) if self.bounds is not None else None,
+            "objects": [[cell[0], cell[1], name] for cell, name in sorted(self.objects.items())]
+                       if self.objects is not None else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LevelState":
+        """Create a level from a dictionary produced by to_dict()."""
+        objects = data.get("objects")
+        if objects is not None:
+            objects = {(x, y): name for x, y, name in objects}
+        return cls(data.get("goal"), data.get("walls", ()), data.get("bounds"), objects)
+
+
+Predicate = Callable[[CharacterState, LevelState], bool]
+
+# Names usable as bare conditions or as zero-argument calls
+_STATE_PREDICATES: Dict[str, Predicate] = {
+    "at_goal": lambda state, level: level.at_goal(state),
+    "facing_wall": lambda state, level: level.facing_wall(state),
+}
+
+
+def _compile_node(node: ast.AST, source: str) -> Predicate:
+    if isinstance(node, ast.Constant):
+        value = bool(node.value)
+        return lambda state, level: value
+    if isinstance(node, ast.Name) and node.id in _STATE_PREDICATES:
+        return _STATE_PREDICATES[node.id]
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        name = node.func.id
+        if name in _STATE_PREDICATES and not node.args:
+            return _STATE_PREDICATES[name]
+        if name == "has_item" and len(node.args) == 1 \
+                and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+            object_name = node.args[0].value
+            return lambda state, level: state.has_item(object_name)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile_node(node.operand, source)
+        return lambda state, level: not operand(state, level)
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile_node(value, source) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda state, level: all(operand(state, level) for operand in operands)
+        return lambda state, level: any(operand(state, level) for operand in operands)
+
+    # Anything else must be a literal-only expression such as "1 > 2"
+    value = evaluate_constant_condition(ast.unparse(node))
+    if value is None:
+        raise ConditionError(f"unsupported condition {source!r}")
+    return lambda state, level: value
+
+
+# Most distinct condition texts kept compiled; conditions come from user input
+CONDITION_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=CONDITION_CACHE_SIZE)
+def _compile_text(condition: str) -> Predicate:
+    try:
+        tree = ast.parse(condition.strip(), mode="eval")
+        return _compile_node(tree.body, condition)
+    except ConditionError:
+        raise
+    except (SyntaxError, ValueError):
+        raise ConditionError(f"invalid condition {condition!r}")
+    except (RecursionError, MemoryError):
+        raise ConditionError(f"condition {condition[:40]!r}... is nested too deeply")
+
+
+def compile_condition(condition: Any) -> Predicate:
+    """
+    Compile a condition string into a predicate over (state, level).
+    The last CONDITION_CACHE_SIZE compiled conditions are cached by text.
+
+    Raises:
+        ConditionError: If the condition cannot be evaluated against game state
+    """
+    if isinstance(condition, (bool, int, float)):
+        value = bool(condition)
+        return lambda state, level: value
+    return _compile_text(str(condition))
+
+
+def evaluate_condition(condition: Any, state: CharacterState, level: Optional[LevelState] = None) -> bool:
+    """
+    Evaluate a condition against a character and level.
+
+    Args:
+        condition: Condition as written in a conditional block
+        state: Current character state
+        level: Level layout (defaults to an empty, unbounded level)
+
+    Returns:
+        Whether the condition holds
+    """
+    return compile_condition(condition)(state, level if level is not None else LevelState())
+
+
+class PlanEvaluator:
+    """
+    Walks an execution plan, expanding only the conditional branches that are taken.
+    Call items are expanded into their subroutine's body plan. Function
+    definitions are skipped, since defining a function runs nothing.
+    Plans are lowered to the flat opcode form of ir.py and run from there.
+    """
+
+    def __init__(self, level: Optional[LevelState] = None):
+        self.level = level if level is not None else LevelState()
+        self.state = CharacterState()
+        self.decisions: List[Dict[str, Any]] = []
+
+    def iter_steps(self, plan: Union[List[Dict[str, Any]], PlanProgram],
+                   state: Optional[CharacterState] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield the plan items that actually execute, in order.
+        Each item is applied to `self.state` before it is yielded, so the state
+        seen while handling an item is the state after it. Every resolved
+        condition is appended to `self.decisions`.
+
+        Args:
+            plan: Execution plan from CodeGenerator.generate_from_blocks, or a
+                PlanProgram from ir.lower_plan to skip lowering it again
+            state: Starting state (defaults to the origin, facing +x)
+
+        Raises:
+            ConditionError: If a condition cannot be evaluated
+            ValueError: If a conditional item has no if_branch/else_branch (old plans),
+                or calls nest deeper than MAX_CALL_DEPTH
+        """
+        program = plan if isinstance(plan, PlanProgram) else lower_plan(plan)
+        self.state = state.copy() if state is not None else CharacterState()
+        self.decisions = []
+        code = program.code
+        items = program.items
+        level = self.level
+        returns: List[int] = []
+        pc = 0
+        while True:
+            base = pc * WIDTH
+            opcode = code[base]
+            pc += 1
+            if opcode == STEP:
+                item = items[code[base + 1]]
+                apply_plan_item(self.state, item)
+                yield item
+            elif opcode == TEST:
+                item = items[code[base + 1]]
+                taken = compile_condition(item.get("condition", "True"))(self.state, level)
+                self.decisions.append({"step": item.get("step"), "condition": item.get("condition"), "taken": taken})
+                if not taken:
+                    pc = code[base + 2]
+            elif opcode == JUMP:
+                pc = code[base + 2]
+            elif opcode == CALL:
+                if len(returns) >= MAX_CALL_DEPTH:
+                    raise ValueError(f"calls to {items[code[base + 1]].get('name')!r} nest deeper than {MAX_CALL_DEPTH}")
+                returns.append(pc)
+                pc = code[base + 2]
+            elif opcode == RETURN:
+                pc = returns.pop()
+            elif opcode == INVALID:
+                raise ValueError(f"conditional step {items[code[base + 1]].get('step')} has no "
+                                 "if_branch/else_branch; regenerate the plan")
+            else:
+                return
+
+    def run(self, plan: Union[List[Dict[str, Any]], PlanProgram],
+            state: Optional[CharacterState] = None) -> Tuple[List[Dict[str, Any]], CharacterState]:
+        """
+        Evaluate a whole plan.
+
+        Returns:
+            Tuple of (executed plan items, final state)
+        """
+        steps = list(self.iter_steps(plan, state))
+        return steps, self.state
+
+
+def resolve_plan(plan: List[Dict[str, Any]], level: Optional[LevelState] = None,
+                 state: Optional[CharacterState] = None) -> List[Dict[str, Any]]:
+    """
+    Get the flat list of plan items that actually execute.
+    The result contains no conditional markers, so it can be passed straight
+    to PlanTimeline or KeyframeBaker.
+    """
+    return PlanEvaluator(level).run(plan, state)[0]
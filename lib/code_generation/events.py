@@ -0,0 +1,130 @@
+"""
+Structured event sinks for GameplaySession.
+Sessions emit typed events instead of printing, so batch and server callers
+pay nothing for output they never read.
+
+Available sinks:
+1. NullEventSink - Discards every event (default for GameplaySession)
+2. BufferedLoggingSink - Buffers events and writes them to a logger in batches
+3. ConsoleEventSink - Prints generated code like the interactive terminal expects
+"""
+
+from typing import Dict, List, Any, Callable, Optional
+from enum import Enum
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class SessionEventType(Enum):
+    """Types of events emitted by GameplaySession."""
+    COMMAND_ADDED = "command_added"
+    COMMAND_REMOVED = "command_removed"
+    CODE_UPDATED = "code_updated"
+    WORKFLOW_CLEARED = "workflow_cleared"
+
+
+class SessionEvent:
+    """
+    A single session event.
+    Expensive fields are registered as callables and only computed when read.
+    """
+
+    def __init__(self, event_type: SessionEventType, data: Dict[str, Any],
+                 lazy_fields: Optional[Dict[str, Callable[[], Any]]] = None):
+        self.type = event_type
+        self.data = data
+        self._lazy_fields = lazy_fields or {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.data:
+            return self.data[key]
+        if key in self._lazy_fields:
+            value = self._lazy_fields.pop(key)()
+            self.data[key] = value
+            return value
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a field, computing it if it is lazy."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self, resolve_lazy: bool = False) -> Dict[str, Any]:
+        """
+        Convert the event to a plain dictionary.
+
+        Args:
+            resolve_lazy: If True, computes and includes lazy fields
+
+        Returns:
+            Dictionary with the event type and its fields
+        """
+        if resolve_lazy:
+            for key in list(self._lazy_fields):
+                self[key]
+        return {"event": self.type.value, **self.data}
+
+
+class EventSink:
+    """Base class for session event sinks."""
+
+    def emit(self, event: SessionEvent) -> None:
+        """Handle a single event."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Flush any buffered events."""
+
+    def close(self) -> None:
+        """Flush and release resources."""
+        self.flush()
+
+
+class NullEventSink(EventSink):
+    """Sink that discards all events."""
+
+    def emit(self, event: SessionEvent) -> None:
+        pass
+
+
+class ConsoleEventSink(EventSink):
+    """
+    Sink that prints the generated code for each added command.
+    Matches the output the terminal interfaces in main.py have always shown.
+    """
+
+    def emit(self, event: SessionEvent) -> None:
+        if event.type is SessionEventType.COMMAND_ADDED:
+            print(f"\n✅ Generated code for '{event['command_label']}':")
+            print(event["single_command_code"])
+
+
+class BufferedLoggingSink(EventSink):
+    """
+    Sink that buffers events and writes them to a logger in batches.
+    Lazy fields are not resolved, so logging never triggers extra code generation.
+    """
+
+    def __init__(self, capacity: int = 100, log: Optional[logging.Logger] = None,
+                 level: int = logging.DEBUG):
+        self.capacity = capacity
+        self.log = log or logger
+        self.level = level
+        self.buffer: List[SessionEvent] = []
+
+    def emit(self, event: SessionEvent) -> None:
+        self.buffer.append(event)
+        if len(self.buffer) >= self.capacity:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        if self.log.isEnabledFor(self.level):
+            for event in self.buffer:
+                self.log.log(self.level, "session event: %s", event.to_dict())
+        self.buffer.clear()
@@ -0,0 +1,298 @@
+"""
+Per-level test-case grading.
+A submitted workflow is compiled once, and its execution plan is then run
+against every test case of a level (different start positions and object
+layouts). Each case is walked lazily with PlanEvaluator and stops at its first
+failure, e.g. walking into a wall, leaving the level, or picking up something
+that is not there. Cases can be spread over worker processes, which receive
+the plan once each (or read it from shared memory) rather than once per case.
+"""
+
+from typing import Dict, List, Any, Iterable, Optional, Sequence, Union
+from concurrent.futures import ProcessPoolExecutor
+import math
+
+from budget import CompilationBudget, compile_with_budget
+from code_generator import CodeGenerator
+from evaluator import ConditionError, LevelState, PlanEvaluator
+from ir import PlanProgram, lower_plan
+from shared_plans import SharedPlan, attach_plan
+from simulation import CharacterState
+
+
+class TestCase:
+    """One grading scenario: a level layout, a start state and the expected outcome."""
+
+    def __init__(self, name: str, level: Optional[LevelState] = None,
+                 start: Optional[CharacterState] = None, reach_goal: bool = True,
+                 final_cell: Optional[List[int]] = None, final_heading: Optional[float] = None,
+                 required_items: Iterable[str] = (), max_steps: Optional[int] = None):
+        """
+        Args:
+            name: Case name shown in reports
+            level: Level layout (goal, walls, bounds, objects)
+            start: Start state (defaults to the origin, facing +x)
+            reach_goal: If True, the character must end on the level's goal cell
+            final_cell: Cell the character must end on, if any
+            final_heading: Heading in degrees the character must end with, if any
+            required_items: Objects that must be in the inventory at the end
+            max_steps: Maximum number of executed steps before the case fails
+        """
+        self.name = name
+        self.level = level if level is not None else LevelState()
+        self.start = start if start is not None else CharacterState()
+        self.reach_goal = reach_goal
+        self.final_cell = tuple(final_cell) if final_cell is not None else None
+        self.final_heading = final_heading
+        self.required_items = tuple(required_items)
+        self.max_steps = max_steps
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the test case to a JSON-friendly dictionary."""
+        return {
+            "name": self.name,
+            "level": self.level.to_dict(),
+            "start": {"x": self.start.x, "y": self.start.y, "angle": self.start.angle,
+                      "inventory": list(self.start.inventory)},
+            "reach_goal": self.reach_goal,
+            "final_cell": list(self.final_cell) if self.final_cell is not None else None,
+            "final_heading": self.final_heading,
+            "required_items": list(self.required_items),
+            "max_steps": self.max_steps
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TestCase":
+        """Create a test case from a dictionary produced by to_dict()."""
+        start = data.get("start") or {}
+        return cls(
+            data.get("name", "case"),
+            LevelState.from_dict(data.get("level") or {}),
+            CharacterState(start.get("x", 0.0), start.get("y", 0.0), start.get("angle", 0.0),
+                           start.get("inventory", ())),
+            data.get("reach_goal", True),
+            data.get("final_cell"),
+            data.get("final_heading"),
+            data.get("required_items", ()),
+            data.get("max_steps")
+        )
+
+
+class CaseResult:
+    """Outcome of one test case."""
+
+    def __init__(self, name: str, passed: bool, reason: Optional[str] = None, message: str = "",
+                 step_index: Optional[int] = None, step: Any = None, steps_executed: int = 0,
+                 final_state: Optional[CharacterState] = None):
+        self.name = name
+        self.passed = passed
+        self.reason = reason
+        self.message = message
+        self.step_index = step_index
+        self.step = step
+        self.steps_executed = steps_executed
+        self.final_state = final_state
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the result to a JSON-friendly dictionary."""
+        return {
+            "name": self.name,
+            "passed": self.passed,
+            "reason": self.reason,
+            "message": self.message,
+            "step_index": self.step_index,
+            "step": self.step,
+            "steps_executed": self.steps_executed,
+            "final_state": self.final_state.to_dict() if self.final_state is not None else None
+        }
+
+
+class GradeReport:
+    """Results of grading one workflow against all cases of a level."""
+
+    def __init__(self, results: List[CaseResult]):
+        self.results = results
+
+    @property
+    def passed(self) -> bool:
+        """True if every case passed."""
+        return all(result.passed for result in self.results)
+
+    @property
+    def passed_count(self) -> int:
+        return sum(1 for result in self.results if result.passed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the report to a JSON-friendly dictionary."""
+        return {
+            "passed": self.passed,
+            "passed_count": self.passed_count,
+            "total": len(self.results),
+            "cases": [result.to_dict() for result in self.results]
+        }
+
+
+def _check_move(level: LevelState, x: float, y: float, state: CharacterState) -> Optional[str]:
+    """Check every cell crossed by a move from (x, y) to the state's position."""
+    dx = state.x - x
+    dy = state.y - y
+    count = max(1, int(math.ceil(math.hypot(dx, dy) - 1e-9)))
+    for k in range(1, count + 1):
+        cell = (int(round(x + dx * k / count)), int(round(y + dy * k / count)))
+        if cell in level.walls:
+            return "hit_wall"
+        if not level.in_bounds(cell):
+            return "out_of_bounds"
+    return None
+
+
+def grade_plan(plan: Union[Sequence[Dict[str, Any]], PlanProgram], case: TestCase) -> CaseResult:
+    """
+    Run an execution plan against one test case, stopping at the first failure.
+
+    Args:
+        plan: Execution plan from CodeGenerator.generate_from_blocks, or its
+            lowered PlanProgram (see ir.py)
+        case: Test case to run
+
+    Returns:
+        CaseResult with the failure reason and step, if any
+    """
+    level = case.level
+    evaluator = PlanEvaluator(level)
+    remaining_objects = dict(level.objects) if level.objects is not None else None
+    executed = 0
+
+    def fail(reason: str, message: str, item: Optional[Dict[str, Any]] = None) -> CaseResult:
+        return CaseResult(case.name, False, reason, message,
+                          executed - 1 if item is not None else None,
+                          item.get("step") if item is not None else None,
+                          executed, evaluator.state.copy())
+
+    steps = evaluator.iter_steps(plan, case.start)
+    x, y = case.start.x, case.start.y
+    try:
+        for item in steps:
+            executed += 1
+            state = evaluator.state
+            if case.max_steps is not None and executed > case.max_steps:
+                return fail("too_many_steps", f"more than {case.max_steps} steps", item)
+
+            action = item.get("action")
+            if action == "move":
+                reason = _check_move(level, x, y, state)
+                if reason is not None:
+                    return fail(reason, f"moved into blocked cell near {level.cell_of(state)}", item)
+            elif action == "pick_object" and remaining_objects is not None:
+                cell = level.cell_of(state)
+                wanted = item.get("object_name", "item")
+                found = remaining_objects.get(cell)
+                if found is None:
+                    return fail("nothing_to_pick", f"no object at {cell}", item)
+                if found != wanted:
+                    return fail("wrong_object", f"tried to pick {wanted!r} but found {found!r} at {cell}", item)
+                del remaining_objects[cell]
+            x, y = state.x, state.y
+    except ConditionError as e:
+        return fail("invalid_condition", str(e))
+    except ValueError as e:
+        return fail("invalid_plan", str(e))
+
+    state = evaluator.state
+    cell = level.cell_of(state)
+    if case.reach_goal and not level.at_goal(state):
+        return fail("missed_goal", f"ended on {cell}, goal is {level.goal}")
+    if case.final_cell is not None and cell != case.final_cell:
+        return fail("wrong_position", f"ended on {cell}, expected {case.final_cell}")
+    if case.final_heading is not None and abs((state.angle - case.final_heading + 180) % 360 - 180) > 1e-6:
+        return fail("wrong_heading", f"ended facing {state.angle:g}°, expected {case.final_heading:g}°")
+    missing = [name for name in case.required_items if not state.has_item(name)]
+    if missing:
+        return fail("missing_items", f"missing {', '.join(missing)}")
+    return CaseResult(case.name, True, steps_executed=executed, final_state=state.copy())
+
+
+# Lowered plan held by each grading worker process, set once by the pool initializer
+_worker_plan: Optional[PlanProgram] = None
+
+
+def _init_worker(program: PlanProgram) -> None:
+    global _worker_plan
+    _worker_plan = program
+
+
+def _init_shared_worker(descriptor: Dict[str, Any]) -> None:
+    global _worker_plan
+    # The lowered program refers to items of the view, which stays attached
+    _worker_plan = lower_plan(attach_plan(descriptor))
+
+
+def _grade_in_worker(case: TestCase) -> CaseResult:
+    return grade_plan(_worker_plan, case)
+
+
+class WorkflowGrader:
+    """
+    Grades one workflow against many test cases.
+    The workflow is compiled and its plan lowered (see ir.py) once when the
+    grader is created.
+    """
+
+    def __init__(self, blocks: List[Dict[str, Any]], generator: Optional[CodeGenerator] = None,
+                 budget: Optional[CompilationBudget] = None):
+        """
+        Args:
+            blocks: Submitted workflow blocks
+            generator: Code generator to compile with (a new one by default)
+            budget: Compilation limits; BudgetExceededError is raised before grading
+                if the workflow goes over them (unlimited by default)
+        """
+        generator = generator if generator is not None else CodeGenerator()
+        if budget is not None:
+            self.code, self.plan = compile_with_budget(blocks, budget, generator)
+        else:
+            self.code, self.plan = generator.generate_from_blocks(blocks)
+        self.program = lower_plan(self.plan)
+
+    def grade(self, cases: List[TestCase], processes: int = 1, shared: bool = False) -> GradeReport:
+        """
+        Run every test case.
+
+        Args:
+            cases: Test cases for the level
+            processes: Worker processes to spread cases over (1 runs in this process)
+            shared: If True, workers read the plan from shared memory (see
+                shared_plans.py) instead of each receiving a copy. Worth it
+                with the spawn/forkserver start methods and many workers;
+                forked workers inherit the plan without pickling anyway
+
+        Returns:
+            GradeReport with one result per case, in the order of `cases`
+        """
+        if processes <= 1 or len(cases) <= 1:
+            return GradeReport([grade_plan(self.program, case) for case in cases])
+        chunksize = max(1, len(cases) // (processes * 4))
+        if not shared:
+            with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self.program,)) as executor:
+                return GradeReport(list(executor.map(_grade_in_worker, cases, chunksize=chunksize)))
+        with SharedPlan(self.plan) as shared_plan:
+            with ProcessPoolExecutor(processes, initializer=_init_shared_worker,
+                                     initargs=(shared_plan.descriptor,)) as executor:
+                return GradeReport(list(executor.map(_grade_in_worker, cases, chunksize=chunksize)))
+
+
+def grade_workflow(blocks: List[Dict[str, Any]], cases: List[TestCase], processes: int = 1,
+                   budget: Optional[CompilationBudget] = None) -> GradeReport:
+    """
+    Compile a workflow once and grade it against a list of test cases.
+
+    Args:
+        blocks: Submitted workflow blocks
+        cases: Test cases for the level
+        processes: Worker processes to spread cases over
+        budget: Compilation limits for the submitted workflow
+
+    Returns:
+        GradeReport with one result per case
+    """
+    return WorkflowGrader(blocks, budget=budget).grade(cases, processes)
@@ -0,0 +1,148 @@
+"""
+Checkpointed incremental simulation of a VisualWorkflow.
+IncrementalSimulator keeps, for every top-level block, the compiled plan of
+that block and the character state (position, heading, inventory) before it.
+As a WorkflowListener it hears every edit and only drops what the edit can
+affect: the edited block's plan and the checkpoints after it. The next
+preview resumes from the last valid checkpoint, so its cost is proportional
+to the blocks after the edit rather than the whole program.
+
+Functions are the exception: which definition a call runs depends on where
+both sit in the program, so editing a block that defines or calls a function
+recompiles the whole workflow and re-simulates from the start.
+"""
+
+from typing import Dict, List, Any, Optional
+
+from code_generator import BlockType, CodeGenerator, GameplaySession, VisualWorkflow, WorkflowListener
+from evaluator import LevelState, PlanEvaluator
+from simulation import CharacterState
+
+
+def _uses_functions(block: Dict[str, Any]) -> bool:
+    """Check whether a block is, or contains, a function definition or call."""
+    if block.get("type") in (BlockType.FUNCTION.value, BlockType.CALL.value):
+        return True
+    params = block.get("params", {})
+    for key in ("body", "if_body", "else_body"):
+        for child in params.get(key, ()):
+            if _uses_functions(child):
+                return True
+    return False
+
+
+class IncrementalSimulator(WorkflowListener):
+    """
+    Simulates a workflow, reusing per-block plans and state checkpoints across edits.
+    Work is done lazily: edits only invalidate, and preview() or state_before()
+    resume from the last valid checkpoint.
+    """
+
+    def __init__(self, workflow: Any, level: Optional[LevelState] = None,
+                 start: Optional[CharacterState] = None):
+        """
+        Args:
+            workflow: VisualWorkflow or GameplaySession to follow
+            level: Level used to decide conditions
+            start: Start state (defaults to the origin, facing +x)
+        """
+        if isinstance(workflow, GameplaySession):
+            workflow = workflow.workflow
+        self.workflow: VisualWorkflow = workflow
+        self.level = level if level is not None else LevelState()
+        self.generator = CodeGenerator()
+        # Compiled plan of each top-level block, None until compiled
+        self.plans: List[Optional[List[Dict[str, Any]]]] = []
+        # Whether each top-level block defines or calls a function
+        self.uses_functions: List[bool] = []
+        # checkpoints[i] is the state before block i; the first `valid` are current
+        self.checkpoints: List[CharacterState] = [start.copy() if start is not None else CharacterState()]
+        self.valid = 1
+        # Number of blocks simulated so far, for measuring reuse
+        self.blocks_simulated = 0
+        self._rebuild()
+        workflow.listeners.append(self)
+
+    def _rebuild(self) -> None:
+        """Forget every checkpoint except the start state and recompile."""
+        sequence = self.workflow.sequence
+        self.generator.reset()
+        self.plans = [None] * len(sequence)
+        self.uses_functions = [_uses_functions(block) for block in sequence]
+        del self.checkpoints[1:]
+        self.valid = 1
+        if any(self.uses_functions):
+            # Compile in program order so every call sees the same function
+            # records as a full generation, including later definitions
+            for index in range(len(sequence)):
+                self._plan(index)
+
+    def _invalidate_after(self, index: int) -> None:
+        """Keep checkpoints up to the state before block `index`."""
+        if self.valid > index + 1:
+            self.valid = index + 1
+            del self.checkpoints[self.valid:]
+
+    def workflow_changed(self, operation: str, index: int, command: Optional[Dict[str, Any]] = None,
+                         target: Optional[int] = None) -> None:
+        if operation == "clear":
+            self._rebuild()
+            return
+        touches_function = command is not None and _uses_functions(command)
+        if operation in ("remove", "update", "move"):
+            touches_function = touches_function or self.uses_functions[index]
+        if touches_function:
+            self._rebuild()
+            return
+
+        if operation in ("add", "insert"):
+            self.plans.insert(index, None)
+            self.uses_functions.insert(index, False)
+        elif operation == "remove":
+            del self.plans[index]
+            del self.uses_functions[index]
+        elif operation == "update":
+            self.plans[index] = None
+        elif operation == "move":
+            self.plans.insert(target, self.plans.pop(index))
+            self.uses_functions.insert(target, self.uses_functions.pop(index))
+            index = min(index, target)
+        self._invalidate_after(index)
+
+    def _plan(self, index: int) -> List[Dict[str, Any]]:
+        # Only blocks without functions are compiled out of program order, and
+        # those do not read the generator's function registry
+        plan = self.plans[index]
+        if plan is None:
+            _, plan = self.generator.compile_block(self.workflow.sequence[index], index)
+            self.plans[index] = plan
+        return plan
+
+    def state_before(self, index: int) -> CharacterState:
+        """
+        Get the state before a top-level block (index len(sequence) is the final state).
+        Simulates only the blocks between the last valid checkpoint and `index`.
+
+        Raises:
+            ConditionError: If a condition on the way cannot be evaluated
+        """
+        if not 0 <= index <= len(self.workflow.sequence):
+            raise IndexError(f"block index {index} out of range")
+        evaluator = PlanEvaluator(self.level)
+        while self.valid <= index:
+            block_index = self.valid - 1
+            for _ in evaluator.iter_steps(self._plan(block_index), self.checkpoints[block_index]):
+                pass
+            self.checkpoints.append(evaluator.state.copy())
+            self.valid += 1
+            self.blocks_simulated += 1
+        return self.checkpoints[index].copy()
+
+    def preview(self) -> CharacterState:
+        """Get the state at the end of the workflow ("where will I end up")."""
+        return self.state_before(len(self.workflow.sequence))
+
+    def close(self) -> None:
+        """Stop following the workflow."""
+        if self in self.workflow.listeners:
+            self.workflow.listeners.remove(self)
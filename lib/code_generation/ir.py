@@ -0,0 +1,140 @@
+"""
+Flat opcode form of execution plans.
+Execution plans are trees: conditional items hold both branches, and call
+items point at shared subroutine records. lower_plan() lays a plan out once
+as a flat instruction array with jump targets, placing each subroutine body
+once however many calls refer to it. PlanEvaluator runs plans in this form, so
+every consumer that simulates a plan (grading, quizzes, the step debugger,
+incremental previews, resolve_plan for timelines and keyframes) walks integer
+instructions instead of nested lists.
+
+The leaf plan items themselves are the ones the CodeGenerator handlers built;
+lowering only encodes control flow, so code templates and durations stay in
+one place.
+
+Instructions are WIDTH ints (opcode, a, b):
+    STEP item                 execute items[item]
+    TEST item else_pc         evaluate the condition of conditional items[item];
+                              jump to else_pc if it is false
+    JUMP - target             continue at target
+    CALL item entry_pc        push a return address and enter a subroutine body
+    RETURN                    resume after the matching CALL
+    INVALID item              raise: a conditional item without split branches
+    HALT                      end of the main program
+"""
+
+from typing import Dict, List, Any, Tuple
+from array import array
+
+
+WIDTH = 3
+
+STEP, TEST, JUMP, CALL, RETURN, INVALID, HALT = range(7)
+
+
+class PlanProgram:
+    """A lowered execution plan: instruction array plus the plan items it refers to."""
+    __slots__ = ("code", "items")
+
+    def __init__(self, code: array, items: List[Dict[str, Any]]):
+        self.code = code
+        self.items = items
+
+    def __len__(self) -> int:
+        """Number of instructions."""
+        return len(self.code) // WIDTH
+
+    def instructions(self) -> List[Tuple[int, int, int]]:
+        """Get the instructions as (opcode, a, b) tuples (for inspection and tests)."""
+        code = self.code
+        return [(code[pc], code[pc + 1], code[pc + 2]) for pc in range(0, len(code), WIDTH)]
+
+
+class _Lowering:
+    """Lays out a plan and the subroutines it reaches without recursing."""
+
+    def __init__(self):
+        self.code = array("i")
+        self.items: List[Dict[str, Any]] = []
+        # Entry pc of each subroutine body, by id() of its record
+        self.entries: Dict[int, int] = {}
+        # CALL instructions waiting for an entry pc, and subroutines to lay out
+        self.unresolved: List[Tuple[int, Dict[str, Any]]] = []
+
+    def emit(self, opcode: int, a: int = 0, b: int = 0) -> int:
+        pc = len(self.code) // WIDTH
+        self.code.extend((opcode, a, b))
+        return pc
+
+    def patch(self, pc: int, b: int) -> None:
+        self.code[pc * WIDTH + 2] = b
+
+    def item(self, item: Dict[str, Any]) -> int:
+        self.items.append(item)
+        return len(self.items) - 1
+
+    def emit_plan(self, plan: Any) -> None:
+        # Work list processed last-in first-out: ("items", items, start) lays out
+        # items[start:], and the "else"/"end" entries run between the branches
+        # they separate, so nesting depth never becomes recursion depth
+        work: List[Tuple[str, Any, int]] = [("items", plan, 0)]
+        while work:
+            kind, value, pc = work.pop()
+            if kind == "items":
+                self._emit_items(value, pc, work)
+            elif kind == "else":
+                # End of the if branch: jump over the else branch, which starts here
+                jump = self.emit(JUMP)
+                self.patch(pc, jump + 1)
+                work.append(("end", None, jump))
+                work.append(("items", value, 0))
+            else:
+                self.patch(pc, len(self.code) // WIDTH)
+
+    def _emit_items(self, items: Any, start: int, work: List[Tuple[str, Any, int]]) -> None:
+        for position in range(start, len(items)):
+            item = items[position]
+            action = item.get("action")
+            if action == "conditional":
+                if "if_branch" not in item:
+                    self.emit(INVALID, self.item(item))
+                    continue
+                test = self.emit(TEST, self.item(item))
+                # Continue with the rest of this list once both branches are laid out
+                work.append(("items", items, position + 1))
+                work.append(("else", item["else_branch"], test))
+                work.append(("items", item["if_branch"], 0))
+                return
+            if action == "call":
+                call = self.emit(CALL, self.item(item))
+                self.unresolved.append((call, item["subroutine"]))
+            elif action != "function_definition":
+                self.emit(STEP, self.item(item))
+
+    def lower(self, plan: Any) -> PlanProgram:
+        self.emit_plan(plan)
+        self.emit(HALT)
+        while self.unresolved:
+            call, subroutine = self.unresolved.pop()
+            entry = self.entries.get(id(subroutine))
+            if entry is None:
+                entry = self.entries[id(subroutine)] = len(self.code) // WIDTH
+                self.emit_plan(subroutine["body_plan"])
+                self.emit(RETURN)
+            self.patch(call, entry)
+        return PlanProgram(self.code, self.items)
+
+
+def lower_plan(plan: Any) -> PlanProgram:
+    """
+    Lower an execution plan to a PlanProgram.
+    Runs in time linear in the plan plus the subroutine bodies it reaches.
+
+    Args:
+        plan: Execution plan from CodeGenerator.generate_from_blocks (or a PlanView)
+
+    Returns:
+        The lowered program; pass it to PlanEvaluator.iter_steps in place of
+        the plan to evaluate it many times without lowering again
+    """
+    return _Lowering().lower(plan)
@@ -0,0 +1,242 @@
+"""
+Keyframe baker for execution plans.
+Samples a plan at a fixed frame rate into packed position, heading and event
+arrays that the frontend can upload directly instead of interpreting plan
+dicts one step at a time.
+
+Binary layout (little-endian, every section 4-byte aligned):
+    header   "<4sHHfIIII": magic b"SSKF", version, reserved, fps,
+                           frame_count, event_count, string_count, string_table_size
+    float32  x[frame_count], y[frame_count], z[frame_count], heading[frame_count]
+    uint32   event_frame[event_count]
+    uint32   event_code[event_count]
+    int32    event_arg[event_count]   (string table index, or -1)
+    uint32   string_end[string_count] (end offset of each string in the table)
+    bytes    string table: concatenated UTF-8 strings, padded to 4 bytes
+
+String i spans string_end[i - 1] (0 for the first) to string_end[i], so
+empty strings and strings containing NUL survive a round trip.
+"""
+
+from typing import Dict, List, Any, Optional
+from array import array
+import math
+import struct
+import sys
+
+from simulation import CharacterState, apply_plan_item, item_duration
+
+
+MAGIC = b"SSKF"
+VERSION = 2
+HEADER = struct.Struct("<4sHHfIIII")
+
+# Event codes written to the event_code array
+EVENT_CODES = {
+    "move": 1,
+    "rotate": 2,
+    "jump": 3,
+    "pick_object": 4,
+    "print": 5,
+    "wait": 6,
+    "variable": 7,
+    "unknown": 255,
+}
+
+
+def _to_little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class BakedAnimation:
+    """Per-frame animation arrays plus a table of discrete events."""
+
+    def __init__(self, fps: float):
+        self.fps = fps
+        self.x = array("f")
+        self.y = array("f")
+        self.z = array("f")
+        self.heading = array("f")
+        self.event_frames = array("I")
+        self.event_codes = array("I")
+        self.event_args = array("i")
+        self.strings: List[str] = []
+
+    @property
+    def frame_count(self) -> int:
+        """Number of sampled frames."""
+        return len(self.x)
+
+    def to_bytes(self) -> bytes:
+        """Serialize to the packed little-endian buffer described in the module docstring."""
+        encoded = [text.encode("utf-8") for text in self.strings]
+        string_ends = array("I")
+        end = 0
+        for text in encoded:
+            end += len(text)
+            string_ends.append(end)
+        table = b"".join(encoded)
+        table += b"\0" * (-len(table) % 4)
+        parts = [
+            HEADER.pack(MAGIC, VERSION, 0, self.fps, self.frame_count,
+                        len(self.event_frames), len(encoded), len(table)),
+            _to_little_endian(self.x),
+            _to_little_endian(self.y),
+            _to_little_endian(self.z),
+            _to_little_endian(self.heading),
+            _to_little_endian(self.event_frames),
+            _to_little_endian(self.event_codes),
+            _to_little_endian(self.event_args),
+            _to_little_endian(string_ends),
+            table
+        ]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BakedAnimation":
+        """Load a buffer produced by to_bytes()."""
+        magic, version, _, fps, frames, events, string_count, table_size = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a baked animation buffer")
+        baked = cls(fps)
+        offset = HEADER.size
+        for name in ("x", "y", "z", "heading"):
+            setattr(baked, name, _from_little_endian("f", data[offset:offset + 4 * frames]))
+            offset += 4 * frames
+        for name, typecode in (("event_frames", "I"), ("event_codes", "I"), ("event_args", "i")):
+            setattr(baked, name, _from_little_endian(typecode, data[offset:offset + 4 * events]))
+            offset += 4 * events
+        string_ends = _from_little_endian("I", data[offset:offset + 4 * string_count])
+        offset += 4 * string_count
+        if string_ends and string_ends[-1] > table_size:
+            raise ValueError("string table is truncated")
+        start = offset
+        for end in string_ends:
+            baked.strings.append(data[start:offset + end].decode("utf-8"))
+            start = offset + end
+        return baked
+
+
+class KeyframeBaker:
+    """
+    Samples flat execution plans at a fixed frame rate.
+    Frames inside each move/rotate/jump segment are computed in one batch from
+    the segment's start and end state, using the durations set by the handlers.
+    Structural items without a duration (conditional markers, function
+    definitions) only contribute events.
+    """
+
+    def __init__(self, fps: float = 60.0):
+        if fps <= 0:
+            raise ValueError("fps must be positive")
+        self.fps = fps
+
+    def bake(self, plan: List[Dict[str, Any]], start_state: Optional[CharacterState] = None) -> BakedAnimation:
+        """
+        Bake a plan into per-frame arrays.
+
+        Args:
+            plan: Flat execution plan
+            start_state: State at time 0 (defaults to the origin, facing +x)
+
+        Returns:
+            BakedAnimation with frame_count = floor(total_duration * fps) + 1
+        """
+        fps = self.fps
+        baked = BakedAnimation(fps)
+        string_ids: Dict[str, int] = {}
+        state = start_state.copy() if start_state is not None else CharacterState()
+        start_time = 0.0
+        next_frame = 0
+
+        for item in plan:
+            action = item.get("action", "unknown")
+            duration = item_duration(item)
+            end_time = start_time + duration
+
+            if action in EVENT_CODES:
+                text = item.get("object_name", item.get("message"))
+                arg = -1
+                if text is not None:
+                    text = str(text)
+                    if text not in string_ids:
+                        string_ids[text] = len(baked.strings)
+                        baked.strings.append(text)
+                    arg = string_ids[text]
+                baked.event_frames.append(int(math.ceil(start_time * fps - 1e-9)))
+                baked.event_codes.append(EVENT_CODES[action])
+                baked.event_args.append(arg)
+
+            before = state.copy()
+            apply_plan_item(state, item)
+
+            # Frames whose timestamp falls inside [start_time, end_time)
+            last_frame = int(math.ceil(end_time * fps - 1e-9))
+            if duration > 0 and last_frame > next_frame:
+                fractions = [(frame / fps - start_time) / duration for frame in range(next_frame, last_frame)]
+                self._sample_segment(baked, item, before, state, fractions)
+                next_frame = last_frame
+            start_time = end_time
+
+        # Final resting frame
+        baked.x.append(state.x)
+        baked.y.append(state.y)
+        baked.z.append(state.z)
+        baked.heading.append(state.angle)
+        return baked
+
+    @staticmethod
+    def _sample_segment(baked: BakedAnimation, item: Dict[str, Any], before: CharacterState,
+                        after: CharacterState, fractions: List[float]) -> None:
+        count = len(fractions)
+        action = item.get("action")
+
+        if action == "move":
+            dx = after.x - before.x
+            dy = after.y - before.y
+            baked.x.extend([before.x + dx * f for f in fractions])
+            baked.y.extend([before.y + dy * f for f in fractions])
+        else:
+            baked.x.extend([before.x] * count)
+            baked.y.extend([before.y] * count)
+
+        if action == "jump":
+            height = 4 * item.get("height", 1)
+            baked.z.extend([height * f * (1 - f) for f in fractions])
+        else:
+            baked.z.extend([before.z] * count)
+
+        if action == "rotate":
+            degrees = item.get("degrees", 90)
+            if item.get("direction") == "right":
+                degrees = -degrees
+            baked.heading.extend([(before.angle + degrees * f) % 360 for f in fractions])
+        else:
+            baked.heading.extend([before.angle] * count)
+
+
+def bake_plan(plan: List[Dict[str, Any]], fps: float = 60.0,
+              start_state: Optional[CharacterState] = None) -> bytes:
+    """
+    Bake a plan and return the packed binary buffer.
+
+    Args:
+        plan: Flat execution plan
+        fps: Sampling rate in frames per second
+        start_state: State at time 0
+
+    Returns:
+        Little-endian buffer ready to upload to the client
+    """
+    return KeyframeBaker(fps).bake(plan, start_state).to_bytes()
@@ -4,7 +4,14 @@ Interactive Code Generator - Terminal Interface
 User can input workflow commands and get generated Python code.
 """
 
-from code_generator import GameplaySession, CodeDisplayMode, CommandPalette
+from code_generator import CodeGenerator, GameplaySession, CodeDisplayMode, PALETTE, serialize_plan
+from dsl import DSLSyntaxError, compile_program
+from events import ConsoleEventSink
+from evaluator import PlanEvaluator
+from simulation import item_duration
+from typing import Any, Dict, List, TextIO
+import argparse
+import json
 import sys
 
 
@@ -12,8 +19,8 @@ class InteractiveTerminal:
     """Interactive terminal interface for code generation."""
     
     def __init__(self):
-        self.session = GameplaySession()
-        self.palette = CommandPalette()
+        self.session = GameplaySession(event_sink=ConsoleEventSink())
+        self.palette = PALETTE
         self.running = True
         
     def clear_screen(self):
@@ -54,7 +61,7 @@ class InteractiveTerminal:
             for idx, cmd in enumerate(commands, 1):
                 print(f"  {idx}. {cmd['icon']} {cmd['label']:<20} | {cmd['description']}")
                 print(f"      Command ID: '{cmd['id']}'")
-                print(f"      Default params: {cmd['default_params']}")
+                print(f"      Default params: {self.palette.default_params(cmd['id'])}")
             print()
             
     def add_command_interactive(self):
@@ -81,7 +88,8 @@ class InteractiveTerminal:
                     print("❌ Invalid command number!")
                     return
             else:
-                cmd_id = choice
+                # Accepts an ID, alias, label, or an unambiguous prefix of one
+                cmd_id = self.palette.resolve(choice) or choice
             
             # Get command info
             cmd_info = self.palette.get_command(cmd_id)
@@ -90,7 +98,7 @@ class InteractiveTerminal:
                 return
             
             print(f"\n✓ Selected: {cmd_info['label']}")
-            print(f"Default parameters: {cmd_info['default_params']}")
+            print(f"Default parameters: {self.palette.default_params(cmd_id)}")
             
             # Ask if user wants to customize parameters
             customize = input("\nCustomize parameters? (y/n): ").strip().lower()
@@ -172,8 +180,7 @@ class InteractiveTerminal:
         
     def clear_workflow(self):
         """Clear the workflow."""
-        self.session.workflow.clear()
-        self.session.update_code_display()
+        self.session.clear_workflow()
         print("\n✅ Workflow cleared!")
         
     def remove_last_command(self):
@@ -224,6 +231,8 @@ class InteractiveTerminal:
         print("  jump 3         - Jump 3 units high")
         print("  pick key       - Pick object named 'key'")
         print("  print Hello    - Print 'Hello'")
+        print("  repeat 4 { move 2; right 90 }")
+        print("  if has(\"key\") { move 1 } else { left 90 }")
         print("  done           - Finish and return to menu")
         print("-" * 70)
         
@@ -237,51 +246,15 @@ class InteractiveTerminal:
                 continue
                 
             # Parse command
-            parts = cmd_input.split(maxsplit=1)
-            if not parts:
+            try:
+                blocks = compile_program(cmd_input, self.palette)
+            except DSLSyntaxError as e:
+                print(f"  ✗ {e.format_with_source(cmd_input)}")
                 continue
-                
-            cmd_name = parts[0].lower()
-            param_value = parts[1] if len(parts) > 1 else None
             
-            # Map to actual commands
-            cmd_map = {
-                'move': ('move', 'distance'),
-                'move_forward': ('move', 'distance'),
-                'move_back': ('move_back', 'distance'),
-                'move_backward': ('move_back', 'distance'),
-                'turn_left': ('turn_left', 'degrees'),
-                'left': ('turn_left', 'degrees'),
-                'turn_right': ('turn_right', 'degrees'),
-                'right': ('turn_right', 'degrees'),
-                'jump': ('jump', 'height'),
-                'pick': ('pick_object', 'object_name'),
-                'pick_object': ('pick_object', 'object_name'),
-                'print': ('print', 'message'),
-                'wait': ('wait', 'seconds'),
-            }
-            
-            if cmd_name in cmd_map:
-                cmd_id, param_name = cmd_map[cmd_name]
-                
-                custom_params = {}
-                if param_value:
-                    # Try to convert to number if possible
-                    try:
-                        if '.' in param_value:
-                            custom_params[param_name] = float(param_value)
-                        else:
-                            custom_params[param_name] = int(param_value)
-                    except ValueError:
-                        custom_params[param_name] = param_value
-                
-                result = self.session.add_command_from_palette(cmd_id, custom_params if custom_params else None)
-                if result.get('success'):
-                    print(f"  ✓ Added: {result['command_label']}")
-                else:
-                    print(f"  ✗ Error: {result.get('error')}")
-            else:
-                print(f"  ✗ Unknown command: {cmd_name}")
+            for block in blocks:
+                result = self.session.add_block(block)
+                print(f"  ✓ Added: {result['command_label']}")
         
         print("\n✅ Quick add completed!")
         
@@ -328,7 +301,7 @@ class InteractiveTerminal:
 
 def simple_command_interface():
     """Simple interface for selecting and generating commands."""
-    session = GameplaySession()
+    session = GameplaySession(event_sink=ConsoleEventSink())
     
     print("=" * 70)
     print("🎮 CODE GENERATOR - Command Selection")
@@ -377,8 +350,7 @@ def simple_command_interface():
             continue
             
         if '6' in selections:
-            session.workflow.clear()
-            session.update_code_display()
+            session.clear_workflow()
             print("\n✅ All commands cleared!")
             input("\nPress Enter to continue...")
             continue
@@ -414,6 +386,113 @@ def simple_command_interface():
             input("\nPress Enter to continue...")
 
 
+def render_script_output(source: str, code: str, plan: List[Dict[str, Any]], output_format: str) -> str:
+    """
+    Format the generated code and plan for one script.
+    The virtual duration sums the steps that actually run (taken branches,
+    expanded calls) on an empty level. It is None (unknown) when the plan
+    cannot be simulated: calls recurse without bound, a condition is not
+    known to the evaluator, a step's magnitude is a function parameter, or a
+    magnitude is too large for a float.
+    """
+    try:
+        duration = sum(item_duration(item) for item in PlanEvaluator().iter_steps(plan))
+    except (ValueError, OverflowError):
+        duration = None
+    plan = serialize_plan(plan)
+    if output_format == 'json':
+        return json.dumps({"script": source, "code": code, "plan": plan, "duration": duration})
+    duration_text = f"{duration:g}s" if duration is not None else "unknown"
+    return "\n".join([
+        f"# === {source} ===",
+        code,
+        "",
+        f"# --- execution plan (virtual duration: {duration_text}) ---",
+        json.dumps(plan, indent=2),
+        ""
+    ])
+
+
+def script_mode(argv: List[str], stdin: TextIO = sys.stdin, stdout: TextIO = sys.stdout) -> int:
+    """
+    Non-interactive batch mode: build workflows from quick-add / DSL scripts.
+    A script that cannot be read, parsed or generated is reported on stderr
+    and produces no output; the remaining scripts are still processed.
+    
+    Args:
+        argv: Command line arguments after '--script'
+        stdin: Stream read for the '-' script
+        stdout: Stream written when no --output file is given
+        
+    Returns:
+        Process exit code (1 if any script had errors)
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py --script",
+        description="Generate code and execution plans from quick-add scripts."
+    )
+    parser.add_argument('scripts', nargs='+', metavar='FILE',
+                        help="quick-add / DSL script file, or '-' for stdin (at most once)")
+    parser.add_argument('-e', '--executable', action='store_true',
+                        help="generate executable code with implementations")
+    parser.add_argument('-O', '--optimize', action='store_true',
+                        help="fold constant conditions, unwrap trivial loops, drop unused functions")
+    parser.add_argument('--virtual-time', action='store_true',
+                        help="executable code advances a virtual clock instead of sleeping")
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help="write output to FILE instead of stdout")
+    parser.add_argument('-f', '--format', choices=['text', 'json'], default='text',
+                        help="text blocks, or one JSON object per script per line")
+    args = parser.parse_args(argv)
+    if args.scripts.count('-') > 1:
+        parser.error("'-' (stdin) can only be given once")
+    
+    generator = CodeGenerator()
+    out = open(args.output, 'w') if args.output else stdout
+    exit_code = 0
+    try:
+        for source in args.scripts:
+            try:
+                if source == '-':
+                    lines = stdin.read().splitlines()
+                    source = '<stdin>'
+                else:
+                    with open(source) as f:
+                        lines = f.read().splitlines()
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"❌ Error reading {source}: {e}", file=sys.stderr)
+                exit_code = 1
+                continue
+            
+            text = "\n".join(line for line in lines if line.strip().lower() != 'done')
+            try:
+                blocks = compile_program(text, generator.palette)
+            except DSLSyntaxError as e:
+                print(f"❌ {source}:{e.line}:{e.column}: {e.message}", file=sys.stderr)
+                exit_code = 1
+                continue
+            
+            try:
+                code, plan = generator.generate_from_blocks(
+                    blocks,
+                    include_implementations=args.executable,
+                    virtual_time=args.virtual_time,
+                    optimize=args.optimize
+                )
+                rendered = render_script_output(source, code, plan, args.format)
+            except (ValueError, TypeError, ArithmeticError, RecursionError, MemoryError) as e:
+                print(f"❌ {source}: {type(e).__name__}: {e}", file=sys.stderr)
+                exit_code = 1
+                continue
+            out.write(rendered)
+            out.write("\n")
+    finally:
+        if out is not stdout:
+            out.close()
+    
+    return exit_code
+
+
 def main():
     """Main entry point."""
     # Check for command line arguments
@@ -426,12 +505,18 @@ def main():
             terminal.display_workflow()
             print("\n")
             terminal.generate_and_display_code(mode='template')
+        elif sys.argv[1] == '--script':
+            sys.exit(script_mode(sys.argv[2:]))
         elif sys.argv[1] == '--help' or sys.argv[1] == '-h':
             print("Interactive Code Generator")
             print("\nUsage:")
             print("  python3 main.py              - Run simple command selection mode")
             print("  python3 main.py --simple     - Run simple command selection mode")
             print("  python3 main.py --quick      - Quick add mode")
+            print("  python3 main.py --script FILE [FILE ...] [-e] [-O] [--virtual-time] [-o OUT] [-f text|json]")
+            print("                               - Batch mode from quick-add / DSL scripts ('-' reads stdin once)")
+            print("                                 -e executable code, -O optimize blocks, --virtual-time")
+            print("                                 virtual clock for waits; 'main.py --script -h' for details")
             print("  python3 main.py --help       - Show this help")
     else:
         # Default to simple interface
@@ -0,0 +1,281 @@
+"""
+Static optimization pass for block programs.
+Runs before code generation and shrinks both the generated code and the
+execution plan:
+
+1. Constant folding - conditions built only from literals ("True", "1 > 2",
+   "not False and True") are evaluated, and the dead branch is removed
+2. Trivial loops - loops with 0 iterations (or an empty body) are removed,
+   and single-iteration loops are replaced by their body
+3. Unused definitions - functions that cannot be reached from the main
+   program through calls (or names in conditions) are dropped, including
+   ones only called by other unused functions
+4. Empty conditionals - conditionals whose branches are both empty are removed
+   (conditions have no side effects in this language)
+"""
+
+from typing import Dict, List, Any, Optional, Set
+import ast
+import operator
+import re
+
+from code_generator import BlockType
+
+
+class _Unknown(Exception):
+    """Raised when a condition depends on runtime state."""
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Mod: operator.mod,
+    ast.FloorDiv: operator.floordiv,
+}
+
+# Longest string/bytes/tuple a fold may produce; folding runs on user input
+MAX_FOLDED_SEQUENCE = 256
+
+_COMPARE_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float))
+
+
+def _fold_binary(op: ast.operator, left: Any, right: Any) -> Any:
+    """Apply a binary operator to literals, refusing anything that could allocate a lot."""
+    if _is_number(left) and _is_number(right):
+        return _BINARY_OPERATORS[type(op)](left, right)
+    if isinstance(op, ast.Add) and type(left) is type(right) and isinstance(left, (str, bytes, tuple)):
+        size = len(left) + len(right)
+    elif isinstance(op, ast.Mult) and isinstance(left, (str, bytes, tuple)) and isinstance(right, int):
+        size = len(left) * max(right, 0)
+    elif isinstance(op, ast.Mult) and isinstance(right, (str, bytes, tuple)) and isinstance(left, int):
+        size = len(right) * max(left, 0)
+    else:
+        raise _Unknown()
+    if size > MAX_FOLDED_SEQUENCE:
+        raise _Unknown()
+    return _BINARY_OPERATORS[type(op)](left, right)
+
+
+def _evaluate(node: ast.AST) -> Any:
+    """Evaluate a literal-only expression node, raising _Unknown otherwise."""
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.UnaryOp):
+        if isinstance(node.op, ast.Not):
+            return not _evaluate(node.operand)
+        if isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = _evaluate(node.operand)
+            if not _is_number(operand):
+                raise _Unknown()
+            return -operand if isinstance(node.op, ast.USub) else +operand
+    if isinstance(node, ast.BoolOp):
+        # A known short-circuit value decides the result even if other operands are unknown
+        is_and = isinstance(node.op, ast.And)
+        unknown = False
+        for value in node.values:
+            try:
+                result = _evaluate(value)
+            except _Unknown:
+                unknown = True
+                continue
+            if bool(result) != is_and:
+                return result
+        if unknown:
+            raise _Unknown()
+        return is_and
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        try:
+            return _fold_binary(node.op, _evaluate(node.left), _evaluate(node.right))
+        except (TypeError, ZeroDivisionError, ValueError):
+            raise _Unknown()
+    if isinstance(node, ast.Compare):
+        left = _evaluate(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            if type(op) not in _COMPARE_OPERATORS:
+                raise _Unknown()
+            right = _evaluate(comparator)
+            try:
+                if not _COMPARE_OPERATORS[type(op)](left, right):
+                    return False
+            except TypeError:
+                raise _Unknown()
+            left = right
+        return True
+    raise _Unknown()
+
+
+def evaluate_constant_condition(condition: Any) -> Optional[bool]:
+    """
+    Evaluate a condition made only of literals.
+
+    Args:
+        condition: Condition expression string (or a literal bool/number)
+
+    Returns:
+        True or False if the condition is constant, None if it depends on runtime state
+    """
+    if isinstance(condition, (bool, int, float)):
+        return bool(condition)
+    if not isinstance(condition, str):
+        return None
+    try:
+        tree = ast.parse(condition.strip(), mode="eval")
+        return bool(_evaluate(tree.body))
+    except (_Unknown, SyntaxError, RecursionError, MemoryError, ValueError):
+        # Deeply nested or null-byte conditions fail to parse with the latter three
+        return None
+
+
+class BlockOptimizer:
+    """
+    Rewrites block lists without mutating the input.
+    Counts of each rewrite are kept in `stats`.
+    """
+
+    def __init__(self, drop_unused_functions: bool = True):
+        self.drop_unused_functions = drop_unused_functions
+        self.stats = {
+            "folded_conditionals": 0,
+            "removed_conditionals": 0,
+            "unwrapped_loops": 0,
+            "removed_loops": 0,
+            "dropped_functions": 0,
+        }
+        # Names referenced from each function body (None for the main program)
+        self._references: Dict[Optional[str], Set[str]] = {}
+        self._referenced: Set[str] = set()
+
+    def optimize(self, blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Optimize a block list.
+
+        Args:
+            blocks: Block dictionaries as accepted by CodeGenerator
+
+        Returns:
+            A new, optimized block list
+        """
+        optimized = self._optimize_body(blocks)
+        if self.drop_unused_functions:
+            self._references = {}
+            self._collect_references(optimized, None)
+            self._referenced = self._reachable()
+            optimized = self._drop_unused(optimized)
+        return optimized
+
+    def _optimize_body(self, blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        result = []
+        for block in blocks:
+            result.extend(self._optimize_block(block))
+        return result
+
+    def _optimize_block(self, block: Dict[str, Any]) -> List[Dict[str, Any]]:
+        block_type = block.get("type", "")
+        params = block.get("params", {})
+
+        if block_type == BlockType.CONDITIONAL.value:
+            if_body = self._optimize_body(params.get("if_body", []))
+            else_body = self._optimize_body(params.get("else_body", []))
+            value = evaluate_constant_condition(params.get("condition", "True"))
+            if value is not None:
+                self.stats["folded_conditionals"] += 1
+                return if_body if value else else_body
+            if not if_body and not else_body:
+                self.stats["removed_conditionals"] += 1
+                return []
+            return [{**block, "params": {**params, "if_body": if_body, "else_body": else_body}}]
+
+        if block_type == BlockType.LOOP.value:
+            iterations = params.get("iterations", 3)
+            body = self._optimize_body(params.get("body", []))
+            if isinstance(iterations, int) and not isinstance(iterations, bool):
+                if iterations <= 0 or not body:
+                    self.stats["removed_loops"] += 1
+                    return []
+                if iterations == 1:
+                    self.stats["unwrapped_loops"] += 1
+                    return body
+            return [{**block, "params": {**params, "body": body}}]
+
+        if block_type == BlockType.FUNCTION.value:
+            body = self._optimize_body(params.get("body", []))
+            return [{**block, "params": {**params, "body": body}}]
+
+        return [block]
+
+    def _collect_references(self, blocks: List[Dict[str, Any]], current_function: Optional[str]) -> None:
+        """Collect names referenced by calls and conditions, grouped by the enclosing function."""
+        referenced = self._references.setdefault(current_function, set())
+        for block in blocks:
+            block_type = block.get("type", "")
+            params = block.get("params", {})
+            if block_type == BlockType.CONDITIONAL.value:
+                condition = params.get("condition", "")
+                if isinstance(condition, str):
+                    referenced.update(re.findall(r"[A-Za-z_][A-Za-z0-9_]*", condition))
+                self._collect_references(params.get("if_body", []), current_function)
+                self._collect_references(params.get("else_body", []), current_function)
+            elif block_type == BlockType.CALL.value:
+                referenced.add(params.get("name", "my_function"))
+            elif block_type == BlockType.LOOP.value:
+                self._collect_references(params.get("body", []), current_function)
+            elif block_type == BlockType.FUNCTION.value:
+                self._collect_references(params.get("body", []), params.get("name", "my_function"))
+
+    def _reachable(self) -> Set[str]:
+        """Get the names reachable from the main program, following references transitively."""
+        reachable = set(self._references.get(None, ()))
+        pending = list(reachable)
+        while pending:
+            for name in self._references.get(pending.pop(), ()):
+                if name not in reachable:
+                    reachable.add(name)
+                    pending.append(name)
+        return reachable
+
+    def _drop_unused(self, blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        result = []
+        for block in blocks:
+            block_type = block.get("type", "")
+            params = block.get("params", {})
+            if block_type == BlockType.FUNCTION.value:
+                if params.get("name", "my_function") not in self._referenced:
+                    self.stats["dropped_functions"] += 1
+                    continue
+                block = {**block, "params": {**params, "body": self._drop_unused(params.get("body", []))}}
+            elif block_type == BlockType.LOOP.value:
+                block = {**block, "params": {**params, "body": self._drop_unused(params.get("body", []))}}
+            elif block_type == BlockType.CONDITIONAL.value:
+                block = {**block, "params": {
+                    **params,
+                    "if_body": self._drop_unused(params.get("if_body", [])),
+                    "else_body": self._drop_unused(params.get("else_body", []))
+                }}
+            result.append(block)
+        return result
+
+
+def optimize_blocks(blocks: List[Dict[str, Any]], drop_unused_functions: bool = True) -> List[Dict[str, Any]]:
+    """
+    Constant-fold conditions, unwrap trivial loops and drop unused functions.
+
+    Args:
+        blocks: Block dictionaries as accepted by CodeGenerator
+        drop_unused_functions: If True, removes functions that are never referenced
+
+    Returns:
+        A new, optimized block list
+    """
+    return BlockOptimizer(drop_unused_functions).optimize(blocks)
@@ -0,0 +1,211 @@
+"""
+Opt-in profiling hooks for the code generation engine.
+Collects per-handler timings, emitted line counts, plan sizes and cache statistics.
+
+Usage:
+    metrics = GenerationMetrics()
+    generator = CodeGenerator(metrics=metrics)
+    ...
+    print(metrics.snapshot())
+
+When no metrics object is attached, the generator skips every hook.
+"""
+
+from typing import Dict, Any, Optional
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationMetrics:
+    """
+    Accumulates counters reported by CodeGenerator and GameplaySession.
+    All recording methods are thread-safe so a MetricsLogger can read snapshots
+    from a background thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset all counters."""
+        with self._lock:
+            self.started_at = time.time()
+            self.handler_calls: Dict[str, int] = {}
+            self.handler_time: Dict[str, float] = {}
+            self.generations = 0
+            self.generation_time = 0.0
+            self.lines_emitted = 0
+            self.plan_items = 0
+            self.max_plan_items = 0
+            self.loops = 0
+            self.loop_items_before_expansion = 0
+            self.loop_items_after_expansion = 0
+            self.max_loop_expansion = 0
+            self.max_depth = 0
+            self.cache_hits: Dict[str, int] = {}
+            self.cache_misses: Dict[str, int] = {}
+
+    def record_handler(self, block_type: str, elapsed: float, depth: int) -> None:
+        """
+        Record one block handler call.
+
+        Args:
+            block_type: Block type string (BlockType value or unknown type)
+            elapsed: Handler time in seconds, including nested blocks
+            depth: Nesting depth the block was processed at
+        """
+        with self._lock:
+            self.handler_calls[block_type] = self.handler_calls.get(block_type, 0) + 1
+            self.handler_time[block_type] = self.handler_time.get(block_type, 0.0) + elapsed
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+    def record_loop(self, iterations: int, body_items: int, expanded_items: int) -> None:
+        """
+        Record the plan expansion performed by a loop block.
+
+        Args:
+            iterations: Number of loop iterations
+            body_items: Plan items produced by a single pass over the body
+            expanded_items: Plan items emitted after replicating the body
+        """
+        with self._lock:
+            self.loops += 1
+            self.loop_items_before_expansion += body_items
+            self.loop_items_after_expansion += expanded_items
+            if iterations > self.max_loop_expansion:
+                self.max_loop_expansion = iterations
+
+    def record_generation(self, lines: int, plan_items: int, elapsed: float) -> None:
+        """
+        Record a completed generate_from_blocks call.
+
+        Args:
+            lines: Number of emitted code lines
+            plan_items: Number of top-level execution plan items
+            elapsed: Total generation time in seconds
+        """
+        with self._lock:
+            self.generations += 1
+            self.generation_time += elapsed
+            self.lines_emitted += lines
+            self.plan_items += plan_items
+            if plan_items > self.max_plan_items:
+                self.max_plan_items = plan_items
+
+    def record_cache(self, name: str, hit: bool) -> None:
+        """
+        Record a lookup in a named cache.
+
+        Args:
+            name: Cache name (e.g. "bytecode")
+            hit: Whether the lookup was served from the cache
+        """
+        with self._lock:
+            counters = self.cache_hits if hit else self.cache_misses
+            counters[name] = counters.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a point-in-time copy of all metrics.
+
+        Returns:
+            Dictionary with handler, generation, plan, nesting and cache metrics
+        """
+        with self._lock:
+            handlers = {
+                block_type: {
+                    "calls": calls,
+                    "total_time": self.handler_time[block_type],
+                    "avg_time": self.handler_time[block_type] / calls
+                }
+                for block_type, calls in self.handler_calls.items()
+            }
+
+            caches = {}
+            for name in set(self.cache_hits) | set(self.cache_misses):
+                hits = self.cache_hits.get(name, 0)
+                misses = self.cache_misses.get(name, 0)
+                caches[name] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses)
+                }
+
+            expansion = 0.0
+            if self.loop_items_before_expansion:
+                expansion = self.loop_items_after_expansion / self.loop_items_before_expansion
+
+            return {
+                "uptime": time.time() - self.started_at,
+                "handlers": handlers,
+                "generation": {
+                    "count": self.generations,
+                    "total_time": self.generation_time,
+                    "lines_emitted": self.lines_emitted,
+                    "plan_items": self.plan_items,
+                    "max_plan_items": self.max_plan_items
+                },
+                "loops": {
+                    "count": self.loops,
+                    "items_before_expansion": self.loop_items_before_expansion,
+                    "items_after_expansion": self.loop_items_after_expansion,
+                    "avg_expansion_factor": expansion,
+                    "max_iterations": self.max_loop_expansion
+                },
+                "max_depth": self.max_depth,
+                "caches": caches
+            }
+
+
+class MetricsLogger:
+    """
+    Periodically logs GenerationMetrics snapshots from a daemon thread.
+    Can be used as a context manager.
+    """
+
+    def __init__(self, metrics: GenerationMetrics, interval: float = 60.0,
+                 log: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.metrics = metrics
+        self.interval = interval
+        self.log = log or logger
+        self.level = level
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the background logging thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-logger", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and log a final snapshot."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.log_snapshot()
+
+    def log_snapshot(self) -> None:
+        """Log the current snapshot once."""
+        self.log.log(self.level, "code generation metrics: %s", self.metrics.snapshot())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.log_snapshot()
+
+    def __enter__(self) -> "MetricsLogger":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
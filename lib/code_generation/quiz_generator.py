@@ -0,0 +1,296 @@
+"""
+Quiz generation from workflows.
+Questions such as "where does the seahorse end up?" are answered by compiling
+the workflow with CodeGenerator and walking its execution plan. Distractors
+are the answers of perturbed programs (a dropped or repeated block, a turn
+the other way, one loop iteration more or less), so wrong options are the
+mistakes a student could plausibly make.
+
+Simulation results are memoized by a hash of the workflow and level, so
+regenerating quizzes for a whole class only simulates programs not seen
+before. Questions use the same shape as the app's quiz route:
+{"question", "options", "correctAnswer", "explanation"}.
+"""
+
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Sequence
+from collections import Counter, OrderedDict
+import hashlib
+import json
+import random
+
+from budget import BudgetExceededError, CompilationBudget, compile_with_budget
+from code_generator import BlockType
+from evaluator import LevelState, PlanEvaluator
+from simulation import CharacterState
+
+
+QUESTION_KINDS = ("final_position", "coins", "heading", "forward_moves")
+
+OPTION_COUNT = 4
+
+# Compass names for headings; angle 0 faces +x and left turns are counter-clockwise
+_HEADINGS = {0: "east", 90: "north", 180: "west", 270: "south"}
+
+# Programs built from student input are simulated within this budget
+QUIZ_BUDGET = CompilationBudget(max_depth=12, max_blocks=500, max_plan_steps=10000, max_seconds=0.5)
+
+
+def workflow_key(blocks: List[Dict[str, Any]], level: Optional[LevelState] = None,
+                 start: Optional[CharacterState] = None) -> str:
+    """Get a cache key for simulating a workflow in a level from a start state."""
+    text = json.dumps([
+        blocks,
+        level.to_dict() if level is not None else None,
+        [start.x, start.y, start.angle, list(start.inventory)] if start is not None else None
+    ], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SimulationCache:
+    """LRU cache of simulation outcomes keyed by workflow_key()."""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key: str, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def simulate_outcome(blocks: List[Dict[str, Any]], level: Optional[LevelState] = None,
+                     start: Optional[CharacterState] = None,
+                     budget: CompilationBudget = QUIZ_BUDGET) -> Optional[Dict[str, Any]]:
+    """
+    Compile and run a workflow, returning the facts quizzes ask about.
+
+    Returns:
+        Dictionary with "cell", "heading", "coins" (pickups of objects whose
+        name contains "coin"), "forward_moves" and "steps", or None if the
+        workflow cannot be compiled or run
+    """
+    try:
+        _, plan = compile_with_budget(blocks, budget)
+        evaluator = PlanEvaluator(level)
+        forward_moves = 0
+        coins = 0
+        steps = 0
+        for item in evaluator.iter_steps(plan, start):
+            steps += 1
+            action = item.get("action")
+            if action == "move" and item.get("direction") == "forward":
+                forward_moves += 1
+            elif action == "pick_object" and "coin" in str(item.get("object_name", "")).lower():
+                coins += 1
+    except (BudgetExceededError, ValueError, TypeError):
+        return None
+    state = evaluator.state
+    return {
+        "cell": evaluator.level.cell_of(state),
+        "heading": round(state.angle, 6) % 360,
+        "coins": coins,
+        "forward_moves": forward_moves,
+        "steps": steps
+    }
+
+
+def _block_variants(block: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Yield single-edit variants of one block."""
+    block_type = block.get("type")
+    params = block.get("params", {})
+    flipped = {
+        BlockType.TURN_LEFT.value: BlockType.TURN_RIGHT.value,
+        BlockType.TURN_RIGHT.value: BlockType.TURN_LEFT.value,
+        BlockType.MOVE_FORWARD.value: BlockType.MOVE_BACKWARD.value,
+        BlockType.MOVE_BACKWARD.value: BlockType.MOVE_FORWARD.value,
+    }.get(block_type)
+    if flipped is not None:
+        yield {**block, "type": flipped}
+    if block_type == BlockType.LOOP.value:
+        iterations = params.get("iterations", 3)
+        if isinstance(iterations, int):
+            for changed in (iterations - 1, iterations + 1):
+                if changed >= 0:
+                    yield {**block, "params": {**params, "iterations": changed}}
+    for key in ("body", "if_body", "else_body"):
+        children = params.get(key)
+        if children:
+            for variant in perturb_workflow(children):
+                yield {**block, "params": {**params, key: variant}}
+
+
+def perturb_workflow(blocks: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield single-edit variants of a workflow: each block dropped, repeated or
+    changed (see _block_variants), including blocks inside bodies. Unchanged
+    blocks are shared with the original rather than copied.
+    """
+    for index, block in enumerate(blocks):
+        before, after = blocks[:index], blocks[index + 1:]
+        yield before + after
+        yield before + [block, block] + after
+        for variant in _block_variants(block):
+            yield before + [variant] + after
+
+
+def _format_answer(kind: str, value: Any) -> str:
+    if kind == "final_position":
+        return f"({value[0]}, {value[1]})"
+    if kind == "heading":
+        name = _HEADINGS.get(value)
+        return f"facing {name}" if name is not None else f"turned {value:g}°"
+    return str(value)
+
+
+def _fallback_answers(kind: str, value: Any) -> Iterator[Any]:
+    """Yield nearby wrong answers, for when perturbed programs give too few."""
+    if kind == "final_position":
+        x, y = value
+        for dx, dy in ((1, 0), (0, 1), (-1, 0), (0, -1), (1, 1), (-1, -1), (2, 0), (0, 2)):
+            yield (x + dx, y + dy)
+    elif kind == "heading":
+        for offset in (90, 180, 270, 45, 135):
+            yield (value + offset) % 360
+    else:
+        for offset in (1, 2, -1, 3, -2, 4, 5, 6):
+            if value + offset >= 0:
+                yield value + offset
+
+
+_QUESTION_TEXT = {
+    "final_position": "Where does the seahorse end up?",
+    "coins": "How many coins does the seahorse collect?",
+    "heading": "Which way is the seahorse facing at the end?",
+    "forward_moves": "How many times does the seahorse swim forward?",
+}
+
+
+class QuizGenerator:
+    """
+    Builds multiple-choice questions for workflows.
+    One generator (and its cache) can be reused across a whole class.
+    """
+
+    def __init__(self, level: Optional[LevelState] = None, start: Optional[CharacterState] = None,
+                 cache: Optional[SimulationCache] = None, max_variants: int = 24):
+        """
+        Args:
+            level: Level the workflows run in (an open level by default)
+            start: Start state (defaults to the origin, facing east)
+            cache: Outcome cache to use (a new one by default)
+            max_variants: Most perturbed programs simulated per workflow
+        """
+        self.level = level if level is not None else LevelState()
+        self.start = start
+        self.cache = cache if cache is not None else SimulationCache()
+        self.max_variants = max_variants
+
+    def _outcome(self, blocks: List[Dict[str, Any]], key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        key = key if key is not None else workflow_key(blocks, self.level, self.start)
+        outcome = self.cache.get(key, False)
+        if outcome is False:
+            outcome = simulate_outcome(blocks, self.level, self.start)
+            self.cache.put(key, outcome)
+        return outcome
+
+    def analyze(self, blocks: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Simulate a workflow and a sample of its perturbed variants.
+
+        Returns:
+            Dictionary with the "key", the workflow's "outcome" and the outcomes of
+            its "variants", or None if the workflow itself cannot be run
+        """
+        key = workflow_key(blocks, self.level, self.start)
+        analysis_key = "analysis:" + key
+        analysis = self.cache.get(analysis_key)
+        if analysis is not None:
+            return analysis
+
+        outcome = self._outcome(blocks, key)
+        if outcome is None:
+            return None
+        variants = list(perturb_workflow(blocks))
+        if len(variants) > self.max_variants:
+            variants = random.Random(key).sample(variants, self.max_variants)
+        outcomes = [self._outcome(variant) for variant in variants]
+        analysis = {"key": key, "outcome": outcome,
+                    "variants": [result for result in outcomes if result is not None]}
+        self.cache.put(analysis_key, analysis)
+        return analysis
+
+    def _question(self, kind: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        field = "cell" if kind == "final_position" else kind
+        correct = analysis["outcome"][field]
+        # Most common mistakes first; ties keep the variant order
+        counts = Counter(variant[field] for variant in analysis["variants"] if variant[field] != correct)
+        candidates = [value for value, _ in counts.most_common()]
+        for value in _fallback_answers(kind, correct):
+            if value != correct and value not in candidates:
+                candidates.append(value)
+        values = [correct] + candidates[:OPTION_COUNT - 1]
+
+        rng = random.Random(f"{analysis['key']}:{kind}")
+        rng.shuffle(values)
+        answer = _format_answer(kind, correct)
+        return {
+            "question": _QUESTION_TEXT[kind],
+            "options": [_format_answer(kind, value) for value in values],
+            "correctAnswer": values.index(correct),
+            "explanation": f"Running the program step by step ({analysis['outcome']['steps']} steps), "
+                           f"the answer is {answer}."
+        }
+
+    def generate(self, blocks: List[Dict[str, Any]], kinds: Sequence[str] = QUESTION_KINDS) -> List[Dict[str, Any]]:
+        """
+        Generate questions for one workflow.
+
+        Args:
+            blocks: Workflow blocks
+            kinds: Question kinds to include (see QUESTION_KINDS)
+
+        Returns:
+            List of questions, empty if the workflow cannot be run
+        """
+        for kind in kinds:
+            if kind not in _QUESTION_TEXT:
+                raise ValueError(f"unknown question kind {kind!r}")
+        analysis = self.analyze(blocks)
+        if analysis is None:
+            return []
+        return [self._question(kind, analysis) for kind in kinds]
+
+    def generate_batch(self, workflows: Iterable[List[Dict[str, Any]]],
+                       kinds: Sequence[str] = QUESTION_KINDS) -> List[List[Dict[str, Any]]]:
+        """
+        Generate questions for many workflows, e.g. a whole class.
+        Identical workflows, and variants shared between workflows, are simulated once.
+
+        Returns:
+            One list of questions per workflow, in order
+        """
+        return [self.generate(blocks, kinds) for blocks in workflows]
+
+
+def generate_quiz(blocks: List[Dict[str, Any]], level: Optional[LevelState] = None,
+                  kinds: Sequence[str] = QUESTION_KINDS) -> List[Dict[str, Any]]:
+    """Generate questions for one workflow with a throwaway generator."""
+    return QuizGenerator(level).generate(blocks, kinds)
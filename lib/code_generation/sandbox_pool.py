@@ -0,0 +1,430 @@
+"""
+Warm worker pool for running generated executable code.
+Each worker is forked once, imports and compiles the Character runtime ahead
+of time, and then runs submitted programs with per-job CPU and memory limits,
+capturing output as structured results. Workers are replaced after a fixed
+number of jobs, or when they crash or overrun the wall-clock limit.
+
+Submissions are compiled in the parent through a BytecodeCache and sent to
+workers as marshalled code objects. Workers never see the cache directory
+or its signing secret, so a submission cannot plant bytecode for later ones.
+
+Isolation comes from the separate process, resource limits (CPU, address
+space, no file writes), a restricted set of builtins and imports, and a
+check that rejects attribute access to underscore names and frame internals
+(so `().__class__.__base__.__subclasses__()` is refused). It keeps buggy or
+runaway programs contained, but it is NOT a security boundary: a Python-level
+filter can be bypassed, and RLIMIT_NPROC does not stop a worker running as
+root (or with CAP_SYS_RESOURCE) from creating processes. Run deliberately
+hostile code under OS-level sandboxing (an unprivileged user, containers,
+seccomp) as well.
+
+Linux only (uses fork and the resource module).
+"""
+
+from typing import Dict, List, Any, Optional, Iterable, Union
+import ast
+import builtins
+import io
+import marshal
+import math
+import multiprocessing
+import multiprocessing.connection
+import signal
+import sys
+import threading
+import time
+
+from bytecode_cache import BytecodeCache
+from code_generator import CodeGenerator
+from simulation import VirtualClock
+
+
+# Modules generated code may import
+ALLOWED_IMPORTS = frozenset({"math", "time"})
+
+SAFE_BUILTIN_NAMES = (
+    "abs", "all", "any", "bool", "dict", "divmod", "enumerate", "filter", "float",
+    "format", "int", "isinstance", "len", "list", "map", "max", "min", "object",
+    "print", "range", "repr", "reversed", "round", "set", "sorted", "str", "sum",
+    "tuple", "zip", "True", "False", "None", "Exception", "ValueError",
+    "TypeError", "ZeroDivisionError", "__build_class__",
+)
+
+
+# Attributes that reach frames, globals or code objects without an underscore
+FORBIDDEN_ATTRIBUTES = frozenset({
+    "gi_frame", "gi_code", "gi_yieldfrom", "cr_frame", "cr_code", "cr_await",
+    "ag_frame", "ag_code", "ag_await", "f_back", "f_globals", "f_locals",
+    "f_builtins", "f_code", "tb_frame", "tb_next", "co_code", "co_consts",
+})
+
+
+class CPUTimeExceeded(Exception):
+    """Raised inside a worker when a job uses up its CPU time."""
+
+
+class OutputLimitExceeded(Exception):
+    """Raised inside a worker when a job prints more than the output limit."""
+
+
+class _LimitedOutput(io.StringIO):
+    """StringIO that refuses to grow past a fixed number of characters."""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+
+    def write(self, text: str) -> int:
+        if self.tell() + len(text) > self.limit:
+            raise OutputLimitExceeded(f"output exceeded {self.limit} characters")
+        return super().write(text)
+
+
+def forbidden_access(code: str) -> Optional[str]:
+    """
+    Find attribute access that could escape the restricted builtins.
+
+    Returns:
+        Description of the first forbidden attribute, or None if there is none
+        (or the code does not parse; compiling it reports that)
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return None
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and (node.attr.startswith("_") or node.attr in FORBIDDEN_ATTRIBUTES):
+            return f"access to attribute {node.attr!r} is not allowed (line {node.lineno})"
+    return None
+
+
+# Worker process side
+
+def _restricted_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if name not in ALLOWED_IMPORTS:
+        raise ImportError(f"import of '{name}' is not allowed")
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+def _raise_cpu_exceeded(signum, frame):
+    raise CPUTimeExceeded("CPU time limit exceeded")
+
+
+def _cpu_time() -> float:
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _apply_limits(memory_bytes: Optional[int]) -> None:
+    import resource
+    if memory_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    signal.signal(signal.SIGXCPU, _raise_cpu_exceeded)
+
+
+def _character_state(namespace: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    character = namespace.get("character")
+    if character is None:
+        return None
+    try:
+        return {
+            "x": float(character.x),
+            "y": float(character.y),
+            "angle": float(character.angle),
+            "inventory": [str(item) for item in character.inventory],
+            "actions": len(character.history)
+        }
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _virtual_time_import(clock: VirtualClock):
+    def _import(name, globals=None, locals=None, fromlist=(), level=0):
+        if name == "time":
+            return clock
+        return _restricted_import(name, globals, locals, fromlist, level)
+    return _import
+
+
+def _run_job(code: Union[str, bytes], runtime, safe_builtins: Dict[str, Any], cpu_seconds: float,
+             max_output: int, virtual_time: bool) -> Dict[str, Any]:
+    import resource
+
+    output = _LimitedOutput(max_output)
+    clock = None
+    if virtual_time:
+        # 'import time' inside the job gets a fresh logical clock
+        clock = VirtualClock()
+        safe_builtins = dict(safe_builtins, __import__=_virtual_time_import(clock))
+    namespace = {"__builtins__": safe_builtins, "__name__": "__main__"}
+    result: Dict[str, Any] = {"status": "ok", "error": None}
+
+    cpu_start = _cpu_time()
+    wall_start = time.perf_counter()
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    # RLIMIT_CPU has one-second granularity
+    soft = math.ceil(cpu_start + cpu_seconds)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+    real_stdout = sys.stdout
+    sys.stdout = output
+    try:
+        if runtime is not None:
+            exec(runtime, namespace)
+        # Source only arrives here when the parent could not compile it
+        program = marshal.loads(code) if isinstance(code, bytes) else compile(code, "<submission>", "exec")
+        exec(program, namespace)
+    except CPUTimeExceeded as e:
+        result.update(status="cpu_limit", error=str(e))
+    except MemoryError:
+        result.update(status="memory_limit", error="memory limit exceeded")
+    except OutputLimitExceeded as e:
+        result.update(status="output_limit", error=str(e))
+    except SyntaxError as e:
+        result.update(status="error", error=f"SyntaxError: {e}")
+    except BaseException as e:  # report everything the submission raised, including SystemExit
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    finally:
+        sys.stdout = real_stdout
+        resource.setrlimit(resource.RLIMIT_CPU, (resource.RLIM_INFINITY, hard))
+
+    result.update(
+        ok=result["status"] == "ok",
+        stdout=output.getvalue(),
+        cpu_time=_cpu_time() - cpu_start,
+        wall_time=time.perf_counter() - wall_start,
+        virtual_time=clock.now if clock is not None else None,
+        character=_character_state(namespace)
+    )
+    return result
+
+
+def _worker_main(conn, cpu_seconds: float, memory_bytes: Optional[int], max_output: int) -> None:
+    """Worker loop: warm up once, then run jobs until told to stop."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Warm up: compile the Character runtime once; math and time are already imported
+    runtime_source = "\n".join(["import time"] + CodeGenerator()._get_function_implementations())
+    runtime = compile(runtime_source, "<runtime>", "exec")
+    safe_builtins = {name: getattr(builtins, name) for name in SAFE_BUILTIN_NAMES}
+    safe_builtins["__import__"] = _restricted_import
+
+    _apply_limits(memory_bytes)
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        job_id, code, with_runtime, virtual_time = job
+        result = _run_job(code, runtime if with_runtime else None, safe_builtins,
+                          cpu_seconds, max_output, virtual_time)
+        result["job_id"] = job_id
+        conn.send(result)
+
+
+# Parent side
+
+class _Worker:
+    """Handle for one worker process."""
+
+    def __init__(self, context, cpu_seconds: float, memory_bytes: Optional[int], max_output: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, cpu_seconds, memory_bytes, max_output),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+        self.job_id: Any = None
+        self.deadline = 0.0
+
+    def stop(self, force: bool = False) -> None:
+        if not force:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                force = True
+        if force:
+            self.process.kill()
+        self.process.join(timeout=1.0)
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    Pool of pre-forked, pre-warmed workers for running generated programs.
+
+    Usage:
+        with SandboxPool(processes=4) as pool:
+            results = pool.run_many([code1, code2, ...])
+    """
+
+    def __init__(self, processes: Optional[int] = None, cpu_seconds: float = 2.0,
+                 memory_bytes: Optional[int] = 512 * 1024 * 1024, wall_timeout: float = 10.0,
+                 max_jobs_per_worker: int = 200, max_output: int = 64 * 1024,
+                 virtual_time: bool = False, bytecode_cache_dir: Optional[str] = None,
+                 bytecode_cache_size: int = 256, bytecode_cache_secret: Optional[bytes] = None):
+        """
+        Start the worker processes.
+
+        Args:
+            processes: Number of workers (defaults to the CPU count)
+            cpu_seconds: CPU time allowed per job (rounded up to whole seconds of process CPU time)
+            memory_bytes: Address-space limit per worker, or None for no limit
+            wall_timeout: Wall-clock seconds before a job's worker is killed
+            max_jobs_per_worker: Jobs a worker runs before it is replaced
+            max_output: Maximum characters of captured output per job
+            virtual_time: If True, 'import time' in jobs yields a VirtualClock so
+                time.sleep() advances logical time instead of blocking
+            bytecode_cache_dir: Directory for the parent's signed, marshalled code objects
+            bytecode_cache_size: Code objects the parent keeps in memory
+            bytecode_cache_secret: Key signing disk entries (see BytecodeCache);
+                random by default, so entries are reused only by this pool
+        """
+        self.context = multiprocessing.get_context("fork")
+        self.processes = processes or multiprocessing.cpu_count()
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.wall_timeout = wall_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_output = max_output
+        self.virtual_time = virtual_time
+        self.bytecode_cache = BytecodeCache(max_entries=bytecode_cache_size, cache_dir=bytecode_cache_dir,
+                                            secret=bytecode_cache_secret)
+        self._lock = threading.Lock()
+        self._workers = [self._spawn() for _ in range(self.processes)]
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self.context, self.cpu_seconds, self.memory_bytes, self.max_output)
+
+    def _compiled(self, code: str) -> Union[str, bytes]:
+        """Get the marshalled code object for a job, or its source if it does not compile."""
+        try:
+            return marshal.dumps(self.bytecode_cache.compile(code, "<submission>"))
+        except (SyntaxError, ValueError, RecursionError, MemoryError):
+            # The worker compiles it again and reports the error like any other
+            return code
+
+    def _replace(self, worker: _Worker, force: bool) -> None:
+        worker.stop(force=force)
+        self._workers[self._workers.index(worker)] = self._spawn()
+
+    def run(self, code: str, with_runtime: bool = True) -> Dict[str, Any]:
+        """
+        Run a single program.
+
+        Args:
+            code: Python source (template or executable generated code)
+            with_runtime: If True, the Character runtime is defined before the code runs
+
+        Returns:
+            Structured result dictionary
+        """
+        return self.run_many([code], with_runtime)[0]
+
+    def run_many(self, codes: Iterable[str], with_runtime: bool = True) -> List[Dict[str, Any]]:
+        """
+        Run many programs across the pool.
+
+        Returns:
+            Result dictionaries in the same order as the inputs. Each has job_id,
+            ok, status (ok, error, cpu_limit, memory_limit, output_limit, timeout,
+            crashed, rejected by forbidden_access), stdout, error, cpu_time, wall_time, virtual_time (None unless
+            the pool runs in virtual-time mode) and character state.
+        """
+        codes = list(codes)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(codes)
+        jobs = []
+        for job_id, code in enumerate(codes):
+            reason = forbidden_access(code)
+            if reason is not None:
+                results[job_id] = self._failure(job_id, "rejected", reason)
+            else:
+                jobs.append((job_id, code))
+        pending = iter(jobs)
+
+        with self._lock:
+            busy: Dict[Any, _Worker] = {}
+            exhausted = False
+
+            while True:
+                # Hand out jobs to idle workers
+                for worker in list(self._workers):
+                    if exhausted or worker.conn in busy:
+                        continue
+                    job = next(pending, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                    worker.job_id = job[0]
+                    worker.deadline = time.monotonic() + self.wall_timeout
+                    worker.conn.send((job[0], self._compiled(job[1]), with_runtime, self.virtual_time))
+                    busy[worker.conn] = worker
+
+                if not busy:
+                    break
+
+                timeout = max(0.0, min(w.deadline for w in busy.values()) - time.monotonic())
+                ready = multiprocessing.connection.wait(list(busy), timeout=timeout)
+
+                for conn in ready:
+                    worker = busy.pop(conn)
+                    try:
+                        result = conn.recv()
+                    except (EOFError, OSError):
+                        results[worker.job_id] = self._failure(worker.job_id, "crashed", "worker process died")
+                        self._replace(worker, force=True)
+                        continue
+                    results[worker.job_id] = result
+                    worker.jobs_done += 1
+                    if worker.jobs_done >= self.max_jobs_per_worker:
+                        self._replace(worker, force=False)
+
+                now = time.monotonic()
+                for conn, worker in list(busy.items()):
+                    if worker.deadline <= now:
+                        del busy[conn]
+                        results[worker.job_id] = self._failure(
+                            worker.job_id, "timeout", f"wall time limit of {self.wall_timeout}s exceeded"
+                        )
+                        self._replace(worker, force=True)
+
+        return results
+
+    def _failure(self, job_id: Any, status: str, error: str) -> Dict[str, Any]:
+        return {
+            "job_id": job_id,
+            "ok": False,
+            "status": status,
+            "error": error,
+            "stdout": "",
+            "cpu_time": None,
+            "wall_time": None,
+            "virtual_time": None,
+            "character": None
+        }
+
+    def close(self) -> None:
+        """Stop all workers."""
+        with self._lock:
+            for worker in self._workers:
+                worker.stop()
+            self._workers = []
+
+    def __enter__(self) -> "SandboxPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
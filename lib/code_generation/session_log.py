@@ -0,0 +1,238 @@
+"""
+Event-sourced session log.
+SessionLogger listens to a session's VisualWorkflow and appends every change
+(add, insert, remove, move, update, clear) to a compact binary log, with a
+snapshot of the whole workflow every `snapshot_interval` events. SessionReplay
+reads the log back and rebuilds the workflow at any event index by loading
+the nearest earlier snapshot and applying at most `snapshot_interval` events.
+
+Log layout: an 8-byte magic, then records of
+    header  <B d i i I>  operation, timestamp, index, target, payload length
+    payload              UTF-8 JSON of the command (add/insert/update) or of
+                         the workflow sequence (snapshot); empty otherwise
+Payloads are JSON rather than marshal, whose format may change between
+Python versions, so logs stay readable across interpreters. A truncated
+trailing record (e.g. after a crash) is ignored when reading.
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+import bisect
+import json
+import struct
+import time
+
+from code_generator import GameplaySession, VisualWorkflow, WorkflowListener
+
+
+LOG_MAGIC = b"VWLOG\x00\x02\x00"
+
+_HEADER = struct.Struct("<BdiiI")
+
+# Operation codes stored in the log; SNAPSHOT records are not events
+OPERATIONS = ("add", "insert", "remove", "move", "update", "clear")
+_OPCODES = {name: code for code, name in enumerate(OPERATIONS)}
+SNAPSHOT = 255
+
+# Operations whose payload is the new command
+_WITH_COMMAND = frozenset(("add", "insert", "update"))
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _encode(value: Any) -> bytes:
+    return _encoder.encode(value).encode("utf-8")
+
+
+def apply_change(sequence: List[Dict[str, Any]], operation: str, index: int,
+                 command: Optional[Dict[str, Any]] = None, target: Optional[int] = None) -> None:
+    """
+    Apply one logged workflow change to a command sequence in place.
+
+    Args:
+        sequence: Command sequence to change
+        operation: One of OPERATIONS
+        index: Position reported by the workflow listener
+        command: New command for add, insert and update
+        target: Destination of a move
+    """
+    if operation == "add":
+        sequence.append(command)
+    elif operation == "insert":
+        sequence.insert(index, command)
+    elif operation == "remove":
+        del sequence[index]
+    elif operation == "move":
+        sequence.insert(target, sequence.pop(index))
+    elif operation == "update":
+        sequence[index] = command
+    elif operation == "clear":
+        sequence.clear()
+    else:
+        raise ValueError(f"unknown workflow operation {operation!r}")
+
+
+class SessionLogger(WorkflowListener):
+    """
+    Appends workflow changes to a binary log file.
+    Records are packed into an in-memory buffer and written in batches, so an
+    edit costs one JSON encode and one struct pack.
+    """
+
+    def __init__(self, workflow: Any, path: str, snapshot_interval: int = 100,
+                 buffer_size: int = 64 * 1024):
+        """
+        Args:
+            workflow: VisualWorkflow or GameplaySession to log
+            path: Log file to create (an existing file is replaced)
+            snapshot_interval: Events between workflow snapshots
+            buffer_size: Bytes buffered before writing to the file
+        """
+        if snapshot_interval < 1:
+            raise ValueError("snapshot_interval must be positive")
+        if isinstance(workflow, GameplaySession):
+            workflow = workflow.workflow
+        self.workflow: VisualWorkflow = workflow
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.buffer_size = buffer_size
+        self.event_count = 0
+        self._file = open(path, "wb")
+        self._file.write(LOG_MAGIC)
+        self._buffer = bytearray()
+        # The workflow may already hold commands; event 0 starts from them
+        self._append(SNAPSHOT, 0, 0, _encode(self.workflow.sequence))
+        workflow.listeners.append(self)
+
+    def _append(self, opcode: int, index: int, target: int, payload: bytes) -> None:
+        self._buffer += _HEADER.pack(opcode, time.time(), index, target, len(payload))
+        self._buffer += payload
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def workflow_changed(self, operation: str, index: int, command: Optional[Dict[str, Any]] = None,
+                         target: Optional[int] = None) -> None:
+        payload = _encode(command) if operation in _WITH_COMMAND else b""
+        self._append(_OPCODES[operation], index, -1 if target is None else target, payload)
+        self.event_count += 1
+        if self.event_count % self.snapshot_interval == 0:
+            self._append(SNAPSHOT, self.event_count, 0, _encode(self.workflow.sequence))
+
+    def flush(self) -> None:
+        """Write buffered records to the log file."""
+        if self._buffer and self._file is not None:
+            self._file.write(self._buffer)
+            self._file.flush()
+            self._buffer.clear()
+
+    def close(self) -> None:
+        """Flush the log, close the file and stop listening to the workflow."""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+        if self in self.workflow.listeners:
+            self.workflow.listeners.remove(self)
+
+    def __enter__(self) -> "SessionLogger":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class SessionReplay:
+    """
+    Random access to a session log.
+    Opening the log scans record headers only; payloads are decoded on demand.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        if self.data[:len(LOG_MAGIC)] != LOG_MAGIC:
+            raise ValueError(f"{path} is not a session log")
+        # Record offsets of events, and (event count, offset) of snapshots
+        self.event_offsets: List[int] = []
+        self.snapshots: List[Tuple[int, int]] = []
+
+        data = self.data
+        offset = len(LOG_MAGIC)
+        end = len(data)
+        while offset + _HEADER.size <= end:
+            opcode, _, index, _, length = _HEADER.unpack_from(data, offset)
+            if offset + _HEADER.size + length > end:
+                break
+            if opcode == SNAPSHOT:
+                self.snapshots.append((index, offset))
+            else:
+                self.event_offsets.append(offset)
+            offset += _HEADER.size + length
+        self._snapshot_events = [count for count, _ in self.snapshots]
+
+    def __len__(self) -> int:
+        """Number of logged events."""
+        return len(self.event_offsets)
+
+    def _payload(self, offset: int) -> Any:
+        length = _HEADER.unpack_from(self.data, offset)[4]
+        start = offset + _HEADER.size
+        return json.loads(self.data[start:start + length].decode("utf-8")) if length else None
+
+    def event(self, event_index: int) -> Dict[str, Any]:
+        """
+        Get one logged event.
+
+        Returns:
+            Dictionary with operation, timestamp, index, target and command
+        """
+        offset = self.event_offsets[event_index]
+        opcode, timestamp, index, target, _ = _HEADER.unpack_from(self.data, offset)
+        return {
+            "operation": OPERATIONS[opcode],
+            "timestamp": timestamp,
+            "index": index,
+            "target": None if target < 0 else target,
+            "command": self._payload(offset)
+        }
+
+    def state_at(self, event_index: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Rebuild the workflow sequence after the first `event_index` events.
+
+        Args:
+            event_index: Number of events to apply (all of them by default)
+
+        Returns:
+            Command sequence at that point of the session
+        """
+        if event_index is None:
+            event_index = len(self.event_offsets)
+        if not 0 <= event_index <= len(self.event_offsets):
+            raise IndexError(f"event index {event_index} out of range 0..{len(self.event_offsets)}")
+        position = bisect.bisect_right(self._snapshot_events, event_index) - 1
+        start, offset = self.snapshots[position]
+        sequence = self._payload(offset)
+        data = self.data
+        for event_offset in self.event_offsets[start:event_index]:
+            opcode, _, index, target, _ = _HEADER.unpack_from(data, event_offset)
+            operation = OPERATIONS[opcode]
+            command = self._payload(event_offset) if operation in _WITH_COMMAND else None
+            apply_change(sequence, operation, index, command, target)
+        return sequence
+
+    def restore_session(self, event_index: Optional[int] = None,
+                        session: Optional[GameplaySession] = None) -> GameplaySession:
+        """
+        Load the workflow at an event index into a gameplay session.
+
+        Args:
+            event_index: Number of events to apply (all of them by default)
+            session: Session to load into (a new one by default)
+
+        Returns:
+            The session, with its code display updated
+        """
+        session = session if session is not None else GameplaySession()
+        session.import_session({"workflow": self.state_at(event_index)})
+        return session
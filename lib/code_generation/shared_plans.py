@@ -0,0 +1,402 @@
+"""
+Execution plans in shared memory.
+A plan is packed into fixed-width float64 records plus a string table, inside one multiprocessing.shared_memory block.
+Worker processes attach by name and read records straight from the shared
+buffer: a PlanView is a sequence whose items are decoded into plan
+dictionaries only when accessed, so nothing is pickled or copied per worker.
+
+Block layout (native byte order):
+    header   8 x uint64   magic, version, record width, record count,
+                          top-level item count, string count, records offset,
+                          strings offset
+    records  float64 x RECORD_WIDTH per plan item
+    strings  uint64 end offsets (string count), then UTF-8 bytes of plain
+             strings and JSON-encoded values
+
+Record slots:
+    0 action id     1 value kinds   2 step         3 duration
+    4 field A       5 field B       6 loop iteration (-1 if none)
+    7 child start   8 child count   9 else-branch count
+
+Nested plans (conditional branches, function bodies and subroutine bodies)
+are stored as contiguous record ranges; a conditional's if and else branches
+are adjacent, so "branches" is the range covering both. Subroutine bodies are
+stored once, however many calls refer to them. Subroutine effects are not
+stored; simulation falls back to walking the body.
+"""
+
+from typing import Dict, List, Any, Iterator, Optional, Sequence, Tuple
+from multiprocessing import shared_memory
+import json
+import struct
+import sys
+
+PLAN_MAGIC = 0x4E414C5053574B56
+PLAN_VERSION = 1
+RECORD_WIDTH = 10
+
+_HEADER = struct.Struct("=8Q")
+
+# Action ids and the two fields each action keeps in slots A and B
+ACTIONS = ("move", "rotate", "jump", "pick_object", "print", "variable", "wait",
+           "unknown", "conditional", "function_definition", "call")
+_ACTION_IDS = {action: index for index, action in enumerate(ACTIONS)}
+_FIELDS = {
+    "move": ("direction", "distance"),
+    "rotate": ("direction", "degrees"),
+    "jump": ("height", None),
+    "pick_object": ("object_name", None),
+    "print": ("message", None),
+    "variable": ("name", "value"),
+    "wait": (None, None),
+    "unknown": ("type", None),
+    "conditional": ("condition", None),
+    "function_definition": ("name", "parameters"),
+    "call": ("name", "arguments"),
+}
+
+# Value kinds, three bits per value slot (step, duration, A, B). Plain strings
+# are stored as UTF-8; other non-numeric values as JSON.
+_ABSENT, _FLOAT, _INT, _STR, _JSON = range(5)
+_VALUE_SLOTS = (2, 3, 4, 5)
+
+_encode_json = json.JSONEncoder(separators=(",", ":"), default=str).encode
+
+
+class _Packer:
+    """Lays a plan out as records, breadth first."""
+
+    def __init__(self):
+        self.records: List[float] = []
+        self.strings: List[bytes] = []
+        # String table ids of plain strings and of JSON-encoded values
+        self._str_ids: Dict[str, int] = {}
+        self._json_ids: Dict[str, int] = {}
+        self._subroutines: Dict[int, Tuple[int, int]] = {}
+        self._pending: List[Tuple[int, Dict[str, Any]]] = []
+
+    def _value(self, value: Any) -> Tuple[int, float]:
+        value_type = type(value)
+        if value_type is int and -2 ** 53 < value < 2 ** 53:
+            return _INT, float(value)
+        if value_type is float:
+            return _FLOAT, value
+        if value is None:
+            return _ABSENT, 0.0
+        if value_type is str:
+            return _STR, float(self._string(value, self._str_ids))
+        return _JSON, float(self._string(_encode_json(value), self._json_ids))
+
+    def _string(self, text: str, ids: Dict[str, int]) -> int:
+        string_id = ids.get(text)
+        if string_id is None:
+            string_id = ids[text] = len(self.strings)
+            self.strings.append(text.encode("utf-8"))
+        return string_id
+
+    def reserve(self, items: Sequence[Dict[str, Any]]) -> int:
+        """Reserve records for a list of items and queue them for encoding."""
+        start = len(self.records) // RECORD_WIDTH
+        self.records.extend([0.0] * (RECORD_WIDTH * len(items)))
+        for offset, item in enumerate(items):
+            self._pending.append((start + offset, item))
+        return start
+
+    def run(self) -> None:
+        while self._pending:
+            pending, self._pending = self._pending, []
+            for index, item in pending:
+                self._encode(index, item)
+
+    def _encode(self, index: int, item: Dict[str, Any]) -> None:
+        action = item.get("action")
+        if action not in _ACTION_IDS:
+            raise ValueError(f"cannot pack plan item with action {action!r}")
+        field_a, field_b = _FIELDS[action]
+        values = (item.get("step"), item.get("duration"),
+                  item.get(field_a) if field_a else None, item.get(field_b) if field_b else None)
+
+        record = [0.0] * RECORD_WIDTH
+        record[0] = _ACTION_IDS[action]
+        kinds = 0
+        for position, (slot, value) in enumerate(zip(_VALUE_SLOTS, values)):
+            kind, number = self._value(value)
+            kinds |= kind << (3 * position)
+            record[slot] = number
+        record[1] = kinds
+        record[6] = item.get("loop_iteration", -1)
+
+        if action == "conditional":
+            if_branch = item.get("if_branch", [])
+            else_branch = item.get("else_branch", [])
+            record[7] = self.reserve(list(if_branch) + list(else_branch))
+            record[8] = len(if_branch)
+            record[9] = len(else_branch)
+        elif action == "function_definition":
+            body = item.get("body_plan", [])
+            record[7] = self.reserve(body)
+            record[8] = len(body)
+        elif action == "call":
+            subroutine = item["subroutine"]
+            body_range = self._subroutines.get(id(subroutine))
+            if body_range is None:
+                body = subroutine["body_plan"]
+                # Registered before encoding, so recursive calls reuse the range
+                body_range = self._subroutines[id(subroutine)] = (len(self.records) // RECORD_WIDTH, len(body))
+                self.reserve(body)
+            record[7], record[8] = body_range
+
+        base = index * RECORD_WIDTH
+        self.records[base:base + RECORD_WIDTH] = record
+
+
+def pack_plan(plan: List[Dict[str, Any]]) -> bytes:
+    """
+    Pack an execution plan into the shared block layout.
+
+    Args:
+        plan: Execution plan from CodeGenerator.generate_from_blocks
+
+    Returns:
+        Packed bytes, readable with PlanView
+    """
+    packer = _Packer()
+    packer.reserve(plan)
+    packer.run()
+
+    record_count = len(packer.records) // RECORD_WIDTH
+    records_offset = _HEADER.size
+    strings_offset = records_offset + 8 * len(packer.records)
+    ends = []
+    total = 0
+    for data in packer.strings:
+        total += len(data)
+        ends.append(total)
+
+    return b"".join([
+        _HEADER.pack(PLAN_MAGIC, PLAN_VERSION, RECORD_WIDTH, record_count, len(plan),
+                     len(packer.strings), records_offset, strings_offset),
+        struct.pack(f"={len(packer.records)}d", *packer.records),
+        struct.pack(f"={len(ends)}Q", *ends),
+    ] + packer.strings)
+
+
+class PlanView(Sequence):
+    """
+    Read-only view of a packed plan. Indexing or iterating decodes plan items
+    on demand; nested plans are PlanViews over the same buffer. Each record is
+    decoded at most once per process, so walking the plan again (e.g. for the
+    next test case) costs the same as walking a list. Treat items as read-only.
+    """
+
+    def __init__(self, buffer: Any, start: Optional[int] = None, count: Optional[int] = None,
+                 _shared: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            buffer: Bytes-like object holding a packed plan (e.g. SharedMemory.buf)
+            start: First record of the view (the top-level plan by default)
+            count: Number of records in the view
+        """
+        if _shared is None:
+            memory = memoryview(buffer)
+            (magic, version, width, record_count, top_count, string_count,
+             records_offset, strings_offset) = _HEADER.unpack_from(memory, 0)
+            if magic != PLAN_MAGIC or version != PLAN_VERSION or width != RECORD_WIDTH:
+                raise ValueError("buffer does not hold a packed plan of this version")
+            ends_size = 8 * string_count
+            _shared = {
+                "records": memory[records_offset:strings_offset].cast("d"),
+                "ends": memory[strings_offset:strings_offset + ends_size].cast("Q"),
+                "strings": memory[strings_offset + ends_size:],
+                "string_cache": {},
+                "subroutines": {},
+                "items": [None] * record_count,
+                "top_count": top_count,
+            }
+        self._shared = _shared
+        self._records = _shared["records"]
+        self.start = 0 if start is None else start
+        self.count = _shared["top_count"] if count is None else count
+
+    def _string(self, string_id: int, is_json: bool) -> Any:
+        cache = self._shared["string_cache"]
+        if string_id in cache:
+            return cache[string_id]
+        ends = self._shared["ends"]
+        begin = ends[string_id - 1] if string_id else 0
+        value = str(self._shared["strings"][begin:ends[string_id]], "utf-8")
+        if is_json:
+            value = json.loads(value)
+        cache[string_id] = value
+        return value
+
+    def _value(self, kind: int, number: float) -> Any:
+        if kind == _INT:
+            return int(number)
+        if kind == _FLOAT:
+            return number
+        if kind == _ABSENT:
+            return None
+        return self._string(int(number), kind == _JSON)
+
+    def _view(self, start: float, count: float) -> "PlanView":
+        return PlanView(None, int(start), int(count), self._shared)
+
+    def _decode(self, index: int) -> Dict[str, Any]:
+        item = self._shared["items"][index]
+        if item is None:
+            item = self._shared["items"][index] = self._decode_record(index)
+        return item
+
+    def _decode_record(self, index: int) -> Dict[str, Any]:
+        base = index * RECORD_WIDTH
+        (action_id, kinds, step, duration, value_a, value_b, loop_iteration,
+         child_start, child_count, else_count) = self._records[base:base + RECORD_WIDTH].tolist()
+        action = ACTIONS[int(action_id)]
+        kinds = int(kinds)
+        value = self._value
+
+        item = {"step": value(kinds & 7, step), "action": action}
+        field_a, field_b = _FIELDS[action]
+        if kinds >> 6 & 7:
+            item[field_a] = value(kinds >> 6 & 7, value_a)
+        if kinds >> 9 & 7:
+            item[field_b] = value(kinds >> 9 & 7, value_b)
+        if kinds >> 3 & 7:
+            item["duration"] = value(kinds >> 3 & 7, duration)
+        if loop_iteration >= 0:
+            item["loop_iteration"] = int(loop_iteration)
+
+        if action == "conditional":
+            item["branches"] = self._view(child_start, child_count + else_count)
+            item["if_branch"] = self._view(child_start, child_count)
+            item["else_branch"] = self._view(child_start + child_count, else_count)
+        elif action == "function_definition":
+            item["body_plan"] = self._view(child_start, child_count)
+        elif action == "call":
+            # One subroutine dictionary per body, like CodeGenerator.functions
+            subroutines = self._shared["subroutines"]
+            key = int(child_start)
+            subroutine = subroutines.get(key)
+            if subroutine is None:
+                subroutine = subroutines[key] = {
+                    "name": item.get("name"),
+                    "body_plan": self._view(child_start, child_count),
+                    "effect": None
+                }
+            item["subroutine"] = subroutine
+        return item
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self._decode(self.start + i) for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("plan index out of range")
+        return self._decode(self.start + index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        decode = self._decode
+        for index in range(self.start, self.start + self.count):
+            yield decode(index)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Decode the whole view into ordinary plan lists, recursively."""
+        def materialize(value: Any) -> Any:
+            if isinstance(value, PlanView):
+                return value.to_list()
+            return value
+
+        items = []
+        for item in self:
+            item = dict(item)
+            for key in ("branches", "if_branch", "else_branch", "body_plan"):
+                if key in item:
+                    item[key] = materialize(item[key])
+            if "subroutine" in item:
+                item["subroutine"] = dict(item["subroutine"], body_plan=None)
+            items.append(item)
+        return items
+
+    def close(self) -> None:
+        """
+        Release the buffer (closing the shared memory block if the view was
+        attached with attach_plan). Views nested in this plan stop working too.
+        """
+        shared = self._shared
+        if shared.get("closed"):
+            return
+        shared["closed"] = True
+        shared["items"] = [None] * len(shared["items"])
+        for key in ("records", "ends", "strings"):
+            shared[key].release()
+        if shared.get("memory") is not None:
+            shared["memory"].close()
+
+
+class SharedPlan:
+    """
+    A packed plan published in a shared memory block.
+    The publishing process owns the block and must close() it (which also
+    unlinks it); workers attach with attach_plan(descriptor).
+    """
+
+    def __init__(self, plan: List[Dict[str, Any]]):
+        data = pack_plan(plan)
+        self.memory = shared_memory.SharedMemory(create=True, size=len(data))
+        self.memory.buf[:len(data)] = data
+        self.size = len(data)
+        self._views: List[PlanView] = []
+
+    @property
+    def descriptor(self) -> Dict[str, Any]:
+        """Small picklable description of the block, for sending to workers."""
+        return {"name": self.memory.name, "size": self.size}
+
+    def view(self) -> PlanView:
+        """View the plan from the publishing process (valid until close())."""
+        view = PlanView(self.memory.buf)
+        self._views.append(view)
+        return view
+
+    def close(self) -> None:
+        """Close and unlink the shared memory block."""
+        if self.memory is not None:
+            for view in self._views:
+                view.close()
+            self._views = []
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+    def __enter__(self) -> "SharedPlan":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def attach_plan(descriptor: Dict[str, Any]) -> PlanView:
+    """
+    Attach to a plan published by SharedPlan.
+
+    Args:
+        descriptor: SharedPlan.descriptor
+
+    Returns:
+        View of the plan; close() it to detach from the block
+    """
+    if sys.version_info >= (3, 13):
+        memory = shared_memory.SharedMemory(descriptor["name"], track=False)
+    else:
+        # Before 3.13 attaching registers the block with the resource tracker.
+        # Workers started by the publisher share its tracker, where the block
+        # is already registered, so only the publisher's unlink counts.
+        memory = shared_memory.SharedMemory(descriptor["name"])
+    view = PlanView(memory.buf)
+    view._shared["memory"] = memory
+    return view
@@ -0,0 +1,319 @@
+"""
+Similarity index for workflows.
+Flags near-identical submissions and groups similar solutions without
+comparing every pair:
+
+1. Each workflow is flattened to a token sequence of block types and
+   parameters. Short loops are unrolled, so `loop 3 { move }` and three
+   `move` blocks produce the same tokens; longer loops keep a loop token.
+2. Overlapping k-token shingles are hashed with blake2b and summarized by a
+   MinHash signature, whose agreement estimates the Jaccard similarity.
+3. Signatures are split into bands for locality-sensitive hashing: workflows
+   sharing any band bucket become candidates, so a query only compares
+   against a few workflows instead of the whole index.
+
+Workflows can be added one at a time, and the index can be saved to and
+loaded from a compact binary file.
+"""
+
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+from array import array
+import hashlib
+import marshal
+import os
+import random
+import struct
+import sys
+
+from code_generator import BlockType
+
+
+INDEX_MAGIC = b"WFMH\x00\x01\x00\x00"
+
+# Mersenne prime for the universal hash family used by MinHash
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 61) - 1
+
+_HEADER = struct.Struct("<IIIIQI")
+
+# Loops are unrolled when the unrolled body has at most this many tokens
+UNROLL_LIMIT = 16
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _params_token(params: Dict[str, Any]) -> str:
+    values = [f"{key}={params[key]!r}" for key in sorted(params)
+              if key not in ("body", "if_body", "else_body")]
+    return ",".join(values)
+
+
+def workflow_tokens(blocks: List[Dict[str, Any]], unroll_limit: int = UNROLL_LIMIT) -> List[str]:
+    """
+    Flatten a workflow to tokens with loops normalized.
+
+    Args:
+        blocks: Workflow blocks
+        unroll_limit: Unroll loops whose expansion has at most this many tokens
+
+    Returns:
+        List of tokens such as "move_forward(distance=1)"
+    """
+    tokens: List[str] = []
+    for block in blocks:
+        block_type = block.get("type", "unknown")
+        params = block.get("params", {})
+        if block_type == BlockType.LOOP.value:
+            body = workflow_tokens(params.get("body", []), unroll_limit)
+            iterations = params.get("iterations", 3)
+            if isinstance(iterations, int) and 0 <= iterations and len(body) * iterations <= unroll_limit:
+                tokens.extend(body * iterations)
+            else:
+                tokens.append(f"loop({iterations!r})[")
+                tokens.extend(body)
+                tokens.append("]")
+        elif block_type == BlockType.CONDITIONAL.value:
+            tokens.append(f"if({params.get('condition', 'True')})[")
+            tokens.extend(workflow_tokens(params.get("if_body", []), unroll_limit))
+            else_tokens = workflow_tokens(params.get("else_body", []), unroll_limit)
+            if else_tokens:
+                tokens.append("]else[")
+                tokens.extend(else_tokens)
+            tokens.append("]")
+        elif block_type == BlockType.FUNCTION.value:
+            tokens.append(f"def({_params_token(params)})[")
+            tokens.extend(workflow_tokens(params.get("body", []), unroll_limit))
+            tokens.append("]")
+        else:
+            tokens.append(f"{block_type}({_params_token(params)})")
+    return tokens
+
+
+def workflow_shingles(blocks: List[Dict[str, Any]], size: int = 3,
+                      unroll_limit: int = UNROLL_LIMIT) -> Set[int]:
+    """
+    Get the hashed k-token shingles of a workflow.
+    Workflows shorter than `size` tokens yield a single shingle of all tokens.
+    """
+    tokens = workflow_tokens(blocks, unroll_limit)
+    if len(tokens) <= size:
+        return {_hash("\x1f".join(tokens))}
+    return {_hash("\x1f".join(tokens[start:start + size])) for start in range(len(tokens) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures from a seeded family of universal hash functions."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.seed = seed
+        self.permutations = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, shingles: Iterable[int]) -> Tuple[int, ...]:
+        """Compute the signature of a set of hashed shingles."""
+        values = [shingle % _PRIME for shingle in shingles]
+        if not values:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(min((a * value + b) % _PRIME for value in values) for a, b in self.permutations)
+
+
+def estimate_similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimate the Jaccard similarity of two signatures."""
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+class SimilarityIndex:
+    """
+    MinHash/LSH index of workflows keyed by submission id.
+    With `bands` bands of `num_perm // bands` rows, pairs above roughly
+    (1 / bands) ** (bands / num_perm) similarity are likely to be found.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, shingle_size: int = 3, seed: int = 1):
+        """
+        Args:
+            num_perm: Signature length
+            bands: LSH bands (must divide num_perm)
+            shingle_size: Tokens per shingle
+            seed: Seed of the hash family; indexes only agree with the same seed
+        """
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm")
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.signatures: Dict[str, Tuple[int, ...]] = {}
+        self.buckets: List[Dict[int, List[str]]] = [{} for _ in range(bands)]
+
+    @property
+    def threshold(self) -> float:
+        """Similarity at which a pair has a 50% chance of becoming a candidate."""
+        return (1 / self.bands) ** (1 / self.rows)
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.signatures
+
+    def signature(self, blocks: List[Dict[str, Any]]) -> Tuple[int, ...]:
+        """Compute the MinHash signature of a workflow."""
+        return self.hasher.signature(workflow_shingles(blocks, self.shingle_size))
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[int]:
+        rows = self.rows
+        return [hash(signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def add(self, key: str, blocks: List[Dict[str, Any]]) -> None:
+        """
+        Add a workflow to the index.
+
+        Raises:
+            KeyError: If the key is already indexed (remove() it first)
+        """
+        self.add_signature(key, self.signature(blocks))
+
+    def add_signature(self, key: str, signature: Tuple[int, ...]) -> None:
+        """Add a precomputed signature to the index."""
+        if key in self.signatures:
+            raise KeyError(f"{key!r} is already indexed")
+        self.signatures[key] = signature
+        for buckets, band_key in zip(self.buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, []).append(key)
+
+    def remove(self, key: str) -> None:
+        """Remove a workflow from the index."""
+        signature = self.signatures.pop(key)
+        for buckets, band_key in zip(self.buckets, self._band_keys(signature)):
+            members = buckets[band_key]
+            members.remove(key)
+            if not members:
+                del buckets[band_key]
+
+    def _candidates(self, signature: Tuple[int, ...]) -> Set[str]:
+        candidates: Set[str] = set()
+        for buckets, band_key in zip(self.buckets, self._band_keys(signature)):
+            members = buckets.get(band_key)
+            if members:
+                candidates.update(members)
+        return candidates
+
+    def query(self, blocks: List[Dict[str, Any]], threshold: float = 0.8,
+              limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Find indexed workflows similar to a workflow.
+
+        Args:
+            blocks: Workflow to look up
+            threshold: Minimum estimated similarity
+            limit: Most results to return
+
+        Returns:
+            (key, estimated similarity) pairs, most similar first
+        """
+        return self.query_signature(self.signature(blocks), threshold, limit)
+
+    def query_signature(self, signature: Tuple[int, ...], threshold: float = 0.8,
+                        limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Find indexed workflows similar to a precomputed signature."""
+        results = []
+        for key in self._candidates(signature):
+            similarity = estimate_similarity(signature, self.signatures[key])
+            if similarity >= threshold:
+                results.append((key, similarity))
+        results.sort(key=lambda pair: (-pair[1], pair[0]))
+        return results[:limit] if limit is not None else results
+
+    def near_duplicates(self, threshold: float = 0.9) -> List[Tuple[str, str, float]]:
+        """
+        Find all indexed pairs above a similarity threshold.
+
+        Returns:
+            (key, other key, estimated similarity) triples, most similar first
+        """
+        seen: Set[Tuple[str, str]] = set()
+        pairs = []
+        for buckets in self.buckets:
+            for members in buckets.values():
+                for position, first in enumerate(members):
+                    for second in members[position + 1:]:
+                        pair = (first, second) if first < second else (second, first)
+                        if pair in seen:
+                            continue
+                        seen.add(pair)
+                        similarity = estimate_similarity(self.signatures[first], self.signatures[second])
+                        if similarity >= threshold:
+                            pairs.append((pair[0], pair[1], similarity))
+        pairs.sort(key=lambda triple: (-triple[2], triple[0], triple[1]))
+        return pairs
+
+    def groups(self, threshold: float = 0.8) -> List[List[str]]:
+        """
+        Group indexed workflows into clusters of similar solutions.
+        Clusters are connected components of the near-duplicate pairs.
+
+        Returns:
+            Clusters of two or more keys, largest first
+        """
+        parent = {key: key for key in self.signatures}
+
+        def find(key: str) -> str:
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for first, second, _ in self.near_duplicates(threshold):
+            root_first, root_second = find(first), find(second)
+            if root_first != root_second:
+                parent[max(root_first, root_second)] = min(root_first, root_second)
+
+        clusters: Dict[str, List[str]] = {}
+        for key in self.signatures:
+            clusters.setdefault(find(key), []).append(key)
+        return sorted((sorted(members) for members in clusters.values() if len(members) > 1),
+                      key=lambda members: (-len(members), members[0]))
+
+    def save(self, path: str) -> None:
+        """
+        Write the index to a binary file (replaced atomically).
+
+        Layout: magic, header <num_perm bands shingle_size count seed keys_size>,
+        marshal-encoded keys, then count * num_perm little-endian uint64 signature values.
+        """
+        keys = list(self.signatures)
+        encoded_keys = marshal.dumps(keys)
+        values = array("Q")
+        for key in keys:
+            values.extend(self.signatures[key])
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(INDEX_MAGIC)
+            f.write(_HEADER.pack(self.hasher.num_perm, self.bands, self.shingle_size,
+                                 len(keys), self.hasher.seed, len(encoded_keys)))
+            f.write(encoded_keys)
+            if sys.byteorder == "big":
+                values.byteswap()
+            values.tofile(f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityIndex":
+        """Read an index written by save()."""
+        with open(path, "rb") as f:
+            if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError(f"{path} is not a workflow similarity index")
+            num_perm, bands, shingle_size, count, seed, keys_size = _HEADER.unpack(f.read(_HEADER.size))
+            keys = marshal.loads(f.read(keys_size))
+            values = array("Q")
+            values.fromfile(f, count * num_perm)
+        if sys.byteorder == "big":
+            values.byteswap()
+        index = cls(num_perm, bands, shingle_size, seed)
+        for position, key in enumerate(keys):
+            index.add_signature(key, tuple(values[position * num_perm:(position + 1) * num_perm]))
+        return index
@@ -0,0 +1,304 @@
+"""
+Character state simulation for execution plans.
+Applies plan items produced by CodeGenerator to a character state, following
+the same rules as the Character runtime emitted with executable code:
+angle 0 faces +x, left turns are counter-clockwise, and picked objects are
+appended to the inventory.
+
+Call items are applied through their subroutine's memoized SubroutineEffect
+when it has one. For seeking or baking a plan with calls, expand it first with
+evaluator.resolve_plan.
+"""
+
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+import math
+
+
+# Maximum nesting of subroutine calls while simulating a plan (guards recursion)
+MAX_CALL_DEPTH = 100
+
+# Plan item fields that must be numbers for the item to be simulated
+_NUMERIC_FIELDS = ("distance", "degrees", "height", "duration")
+
+
+class CharacterState:
+    """
+    Simulated character position, heading, inventory and elapsed plan time.
+    The clock is logical: it advances by each item's duration, never by sleeping.
+    
+    The inventory is stored as a persistent linked list of (object_name, previous)
+    pairs, so picking an object and copying a state are both O(1) no matter
+    how many objects have been collected.
+    """
+    __slots__ = ("x", "y", "z", "angle", "clock", "_inventory", "inventory_size")
+
+    def __init__(self, x: float = 0.0, y: float = 0.0, angle: float = 0.0,
+                 inventory: Iterable[str] = (), clock: float = 0.0, z: float = 0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.angle = angle
+        self.clock = clock
+        self._inventory: Optional[Tuple[str, Any]] = None
+        self.inventory_size = 0
+        for object_name in inventory:
+            self.add_item(object_name)
+
+    def copy(self) -> "CharacterState":
+        """Return an independent copy of this state."""
+        state = CharacterState(self.x, self.y, self.angle, (), self.clock, self.z)
+        state._inventory = self._inventory
+        state.inventory_size = self.inventory_size
+        return state
+
+    def __reduce__(self):
+        # Pickle the inventory flat; the linked list would recurse once per item
+        return (CharacterState, (self.x, self.y, self.angle, self.inventory, self.clock, self.z))
+
+    def add_item(self, object_name: str) -> None:
+        """Add a picked object to the inventory."""
+        self._inventory = (object_name, self._inventory)
+        self.inventory_size += 1
+
+    def has_item(self, object_name: str) -> bool:
+        """Check whether an object has been picked."""
+        node = self._inventory
+        while node is not None:
+            if node[0] == object_name:
+                return True
+            node = node[1]
+        return False
+
+    @property
+    def inventory(self) -> Tuple[str, ...]:
+        """Picked objects in the order they were collected."""
+        items = []
+        node = self._inventory
+        while node is not None:
+            items.append(node[0])
+            node = node[1]
+        items.reverse()
+        return tuple(items)
+
+    @property
+    def position(self) -> Tuple[float, float, float]:
+        """Current (x, y, z) position."""
+        return (self.x, self.y, self.z)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the state to a JSON-friendly dictionary."""
+        return {
+            "position": [self.x, self.y, self.z],
+            "heading": self.angle,
+            "inventory": list(self.inventory),
+            "time": self.clock
+        }
+
+    def __repr__(self) -> str:
+        return (f"CharacterState(x={self.x:.2f}, y={self.y:.2f}, angle={self.angle:.1f}, "
+                f"inventory={list(self.inventory)}, clock={self.clock:.2f})")
+
+
+class VirtualClock:
+    """
+    Stand-in for the time module: sleep() advances a logical clock instantly.
+    Used when running generated programs so wait blocks cost no wall time.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+
+class SubroutineEffect:
+    """
+    Net effect of running a subroutine body, in the caller's local frame:
+    `forward` and `left` are displacements relative to the heading at the call,
+    so a memoized effect applies in O(1) whatever the caller's position and heading.
+    """
+    __slots__ = ("forward", "left", "rotation", "items", "duration")
+
+    def __init__(self, forward: float, left: float, rotation: float,
+                 items: Tuple[str, ...], duration: float):
+        self.forward = forward
+        self.left = left
+        self.rotation = rotation
+        self.items = items
+        self.duration = duration
+
+    def apply(self, state: CharacterState) -> None:
+        """Apply the effect to a state in place."""
+        radians = math.radians(state.angle)
+        cos, sin = math.cos(radians), math.sin(radians)
+        state.x += self.forward * cos - self.left * sin
+        state.y += self.forward * sin + self.left * cos
+        state.angle = (state.angle + self.rotation) % 360
+        for object_name in self.items:
+            state.add_item(object_name)
+        state.clock += self.duration
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the effect to a JSON-friendly dictionary."""
+        return {
+            "forward": self.forward,
+            "left": self.left,
+            "rotation": self.rotation,
+            "items": list(self.items),
+            "duration": self.duration
+        }
+
+
+def compute_subroutine_effect(body_plan: List[Dict[str, Any]]) -> Optional[SubroutineEffect]:
+    """
+    Compute the net effect of a subroutine body plan.
+
+    Args:
+        body_plan: Plan of a function body
+
+    Returns:
+        The effect, or None if the body depends on runtime state (it contains a
+        conditional, calls a subroutine without a known effect, or uses a
+        parameter as a distance, angle or height)
+    """
+    state = CharacterState()
+    for item in body_plan:
+        action = item.get("action")
+        if action == "conditional":
+            return None
+        if action == "call" and item["subroutine"].get("effect") is None:
+            return None
+        if not is_static_item(item):
+            return None
+        apply_plan_item(state, item)
+    return SubroutineEffect(state.x, state.y, state.angle, state.inventory, state.clock)
+
+
+def is_static_item(item: Dict[str, Any]) -> bool:
+    """Check whether every magnitude of a plan item is a number (not a parameter name)."""
+    return all(isinstance(item[field], (int, float)) for field in _NUMERIC_FIELDS if field in item)
+
+
+def _number(item: Dict[str, Any], field: str, default: float) -> float:
+    value = item.get(field, default)
+    if not isinstance(value, (int, float)):
+        raise ValueError(f"step {item.get('step')}: {field} {value!r} is not a number")
+    return value
+
+
+def _check_call_depth(item: Dict[str, Any], depth: int) -> None:
+    if depth >= MAX_CALL_DEPTH:
+        raise ValueError(f"calls to {item.get('name')!r} nest deeper than {MAX_CALL_DEPTH}")
+
+
+def _call_duration(item: Dict[str, Any], depth: int) -> float:
+    effect = item["subroutine"].get("effect")
+    if effect is not None:
+        return effect.duration
+    _check_call_depth(item, depth)
+    return _plan_duration(item["subroutine"]["body_plan"], depth + 1)
+
+
+def item_duration(item: Dict[str, Any]) -> float:
+    """Get the animation duration of a plan item (0 for structural items)."""
+    return float(_number(item, "duration", 0.0))
+
+
+def interpolate_plan_item(state: CharacterState, item: Dict[str, Any], fraction: float) -> None:
+    """
+    Advance a state part of the way through a plan item.
+    Instant effects (picking objects) only happen once the item completes.
+
+    Args:
+        state: State before the item; updated in place
+        item: Execution plan item
+        fraction: Progress through the item, from 0.0 to 1.0
+
+    Raises:
+        ValueError: If a magnitude is not a number, or calls nest deeper than MAX_CALL_DEPTH
+    """
+    action = item.get("action")
+    if action == "call":
+        # Calls take no time of their own; only complete calls are applied
+        if fraction >= 1.0:
+            _apply_call(state, item, 0)
+        return
+    if action == "move":
+        distance = _number(item, "distance", 1) * fraction
+        if item.get("direction") == "backward":
+            distance = -distance
+        radians = math.radians(state.angle)
+        state.x += distance * math.cos(radians)
+        state.y += distance * math.sin(radians)
+    elif action == "rotate":
+        degrees = _number(item, "degrees", 90) * fraction
+        if item.get("direction") == "right":
+            degrees = -degrees
+        state.angle = (state.angle + degrees) % 360
+    elif action == "jump":
+        # Parabolic arc that lands back on the ground
+        state.z = 4 * _number(item, "height", 1) * fraction * (1 - fraction)
+    elif action == "pick_object" and fraction >= 1.0:
+        state.add_item(item.get("object_name", "item"))
+    state.clock += item_duration(item) * fraction
+
+
+def plan_duration(plan: List[Dict[str, Any]]) -> float:
+    """
+    Get the total virtual duration of a flat execution plan.
+    Wait items count their full duration without anything sleeping.
+
+    Raises:
+        ValueError: If calls nest deeper than MAX_CALL_DEPTH
+    """
+    return _plan_duration(plan, 0)
+
+
+def _plan_duration(plan: List[Dict[str, Any]], depth: int) -> float:
+    return sum(_call_duration(item, depth) if item.get("action") == "call" else item_duration(item)
+               for item in plan)
+
+
+def _apply_call(state: CharacterState, item: Dict[str, Any], depth: int) -> None:
+    effect = item["subroutine"].get("effect")
+    if effect is not None:
+        effect.apply(state)
+        return
+    _check_call_depth(item, depth)
+    for body_item in item["subroutine"]["body_plan"]:
+        if body_item.get("action") == "call":
+            _apply_call(state, body_item, depth + 1)
+        else:
+            apply_plan_item(state, body_item)
+
+
+def apply_plan_item(state: CharacterState, item: Dict[str, Any]) -> None:
+    """Apply a complete plan item to a state in place."""
+    interpolate_plan_item(state, item, 1.0)
+
+
+def simulate_plan(plan: List[Dict[str, Any]], state: Optional[CharacterState] = None) -> CharacterState:
+    """
+    Apply every item of a flat execution plan.
+
+    Args:
+        plan: Execution plan items
+        state: Starting state (defaults to the origin, facing +x)
+
+    Returns:
+        Final character state
+    """
+    state = state.copy() if state is not None else CharacterState()
+    for item in plan:
+        apply_plan_item(state, item)
+    return state
@@ -0,0 +1,6 @@
+"""Modules in lib/code_generation import each other as scripts, so tests run with it on the path."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
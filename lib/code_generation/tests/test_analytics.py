@@ -0,0 +1,48 @@
+import pytest
+
+from analytics import WorkflowAnalytics
+from dsl import compile_program
+
+
+def test_parameter_degrees_are_not_full_turns():
+    analytics = WorkflowAnalytics()
+    analytics.add_workflow(compile_program("def f(d) { left d }\nright 360"))
+    assert analytics.workflows == 1
+    assert analytics.mistakes["full_turn"] == 1
+
+
+def test_invalid_workflow_records_nothing():
+    analytics = WorkflowAnalytics()
+    with pytest.raises(ValueError):
+        analytics.add_workflow([{"type": "move_forward", "params": {}}, "move"])
+    assert analytics.workflows == 0
+    assert analytics.blocks == 0
+
+
+def test_merge_matches_single_pass():
+    programs = [compile_program(source) for source in (
+        "move 1; move 1; left 90", "repeat 1 { move 2 }", "left 90; left 90; left 90", "move 1; move_back 1")]
+    single = WorkflowAnalytics().add_workflows(programs)
+    merged = WorkflowAnalytics().add_workflows(programs[:2])
+    merged.merge(WorkflowAnalytics().add_workflows(programs[2:]))
+    assert merged.report() == single.report()
+
+
+def test_deeply_nested_workflow_is_ingested():
+    blocks = [{"type": "move_forward", "params": {"distance": 1}}]
+    for _ in range(10000):
+        blocks = [{"type": "loop", "params": {"iterations": 2, "body": blocks}},
+                  {"type": "turn_left", "params": {"degrees": 90}}]
+    analytics = WorkflowAnalytics()
+    analytics.add_workflow(blocks)
+    assert analytics.blocks == 20001
+    assert analytics.ngrams[2].estimate("loop > turn_left") == 10000
+
+
+def test_nested_sequences_are_counted_separately():
+    analytics = WorkflowAnalytics()
+    analytics.add_workflow(compile_program("left 90\nif at_goal { left 90; left 90 } else { move 1 }\nleft 90"))
+    assert analytics.mistakes["three_turns_instead_of_one"] == 0
+    assert analytics.mistakes["cancelled_turn"] == 0
+    assert analytics.ngrams[2].estimate("turn_left > turn_left") == 1
+    assert analytics.ngrams[3].estimate("turn_left > conditional > turn_left") == 1
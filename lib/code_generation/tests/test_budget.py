@@ -0,0 +1,34 @@
+import time
+
+import pytest
+
+from budget import BudgetExceededError, CompilationBudget, compile_with_budget
+from code_generator import CodeGenerator
+from dsl import compile_program
+
+
+def test_within_budget_matches_generator():
+    blocks = compile_program("repeat 3 { move 1; left 90 }")
+    assert compile_with_budget(blocks) == CodeGenerator().generate_from_blocks(blocks)
+
+
+@pytest.mark.parametrize("source, budget, limit", [
+    ("repeat 1000 { repeat 1000 { repeat 1000 { move 1 } } }", CompilationBudget(), "plan_steps"),
+    ("move 1; move 1; move 1", CompilationBudget(max_blocks=2), "blocks"),
+    ("repeat 1 { repeat 1 { repeat 1 { move 1 } } }", CompilationBudget(max_depth=2), "depth"),
+])
+def test_rejects_before_generating(source, budget, limit):
+    with pytest.raises(BudgetExceededError) as info:
+        compile_with_budget(compile_program(source), budget)
+    assert info.value.limit == limit
+    assert info.value.to_dict()["error"] == "budget_exceeded"
+
+
+def test_loop_around_empty_body_is_not_iterated():
+    blocks = compile_program("repeat 100000000 { repeat 0 { move 1 } }")
+    budget = CompilationBudget(max_seconds=0.5)
+    started = time.perf_counter()
+    code, plan = compile_with_budget(blocks, budget)
+    assert plan == []
+    assert "range(100000000)" in code
+    assert time.perf_counter() - started < 0.5
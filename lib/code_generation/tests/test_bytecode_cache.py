@@ -0,0 +1,76 @@
+import marshal
+import os
+
+from bytecode_cache import SIGNATURE_SIZE, BytecodeCache
+
+
+SOURCE = "result = 6 * 7"
+
+
+def run(code):
+    namespace = {}
+    exec(code, namespace)
+    return namespace["result"]
+
+
+def entry_path(cache, source=SOURCE):
+    return cache._path(cache.key(source, "<generated>"))
+
+
+def test_memory_hits_and_misses():
+    cache = BytecodeCache(max_entries=1)
+    first = cache.compile(SOURCE)
+    assert cache.compile(SOURCE) is first
+    cache.compile("result = 1")
+    cache.compile(SOURCE)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+    assert len(cache) == 1
+
+
+def test_disk_entries_are_reused_with_the_same_secret(tmp_path):
+    BytecodeCache(cache_dir=str(tmp_path), secret=b"s" * 32).compile(SOURCE)
+    cache = BytecodeCache(cache_dir=str(tmp_path), secret=b"s" * 32)
+    assert run(cache.compile(SOURCE)) == 42
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_key_changes_with_source_and_filename():
+    assert BytecodeCache.key(SOURCE) != BytecodeCache.key(SOURCE + " ")
+    assert BytecodeCache.key(SOURCE, "a") != BytecodeCache.key(SOURCE, "b")
+
+
+def test_entries_from_another_secret_are_ignored(tmp_path):
+    BytecodeCache(cache_dir=str(tmp_path)).compile(SOURCE)
+    cache = BytecodeCache(cache_dir=str(tmp_path))
+    assert run(cache.compile(SOURCE)) == 42
+    assert cache.stats()["disk_hits"] == 0 and cache.stats()["misses"] == 1
+
+
+def test_tampered_entry_is_not_run(tmp_path):
+    cache = BytecodeCache(cache_dir=str(tmp_path), secret=b"s" * 32)
+    cache.compile(SOURCE)
+    path = entry_path(cache)
+    with open(path, "rb") as f:
+        signature = f.read(SIGNATURE_SIZE)
+    # A valid-looking entry for other code, reusing the real signature
+    with open(path, "wb") as f:
+        f.write(signature + marshal.dumps(compile("result = 666", "<generated>", "exec")))
+
+    fresh = BytecodeCache(cache_dir=str(tmp_path), secret=b"s" * 32)
+    assert run(fresh.compile(SOURCE)) == 42
+    assert fresh.stats()["disk_hits"] == 0
+
+
+def test_corrupt_and_truncated_entries_are_recompiled(tmp_path):
+    cache = BytecodeCache(cache_dir=str(tmp_path), secret=b"s" * 32)
+    cache.compile(SOURCE)
+    path = entry_path(cache)
+    for contents in (b"", b"garbage", open(path, "rb").read()[:-5]):
+        with open(path, "wb") as f:
+            f.write(contents)
+        fresh = BytecodeCache(cache_dir=str(tmp_path), secret=b"s" * 32)
+        assert run(fresh.compile(SOURCE)) == 42
+        assert fresh.stats()["misses"] == 1
+    # The recompiled entry was written back and verifies again
+    assert os.path.getsize(path) > SIGNATURE_SIZE
+    assert BytecodeCache(cache_dir=str(tmp_path), secret=b"s" * 32)._load(cache.key(SOURCE)) is not None
@@ -0,0 +1,40 @@
+from code_generator import CodeGenerator
+from corpus import CorpusReader, CorpusWriter
+from dsl import compile_program
+
+
+PROGRAMS = [
+    "move 2; left 90; pick coin",
+    'repeat 3 { move 1.5; if has("key") { jump 2 } else { print "" } }',
+    "def step(a, b) { move 1; right 45 }\ncall step(1, \"x\")\nlet speed = 2.5",
+    "",
+]
+
+
+def test_round_trip(tmp_path):
+    workflows = [compile_program(source) for source in PROGRAMS]
+    with CorpusWriter(str(tmp_path / "corpus")) as writer:
+        for blocks in workflows:
+            writer.add_workflow(blocks)
+    with CorpusReader(str(tmp_path / "corpus")) as reader:
+        assert len(reader) == len(workflows)
+        assert [view.to_list() for view in reader] == workflows
+
+
+def test_views_generate_the_same_code(tmp_path):
+    blocks = compile_program(PROGRAMS[1])
+    with CorpusWriter(str(tmp_path / "corpus")) as writer:
+        writer.add_workflow(blocks)
+    with CorpusReader(str(tmp_path / "corpus")) as reader:
+        code, _ = CodeGenerator().generate_from_blocks(reader[0])
+    assert code == CodeGenerator().generate_from_blocks(blocks)[0]
+
+
+def test_reopening_appends(tmp_path):
+    path = str(tmp_path / "corpus")
+    with CorpusWriter(path) as writer:
+        writer.add_workflow(compile_program(PROGRAMS[0]))
+    with CorpusWriter(path) as writer:
+        writer.add_workflow(compile_program(PROGRAMS[2]))
+    with CorpusReader(path) as reader:
+        assert [view.to_list() for view in reader] == [compile_program(PROGRAMS[0]), compile_program(PROGRAMS[2])]
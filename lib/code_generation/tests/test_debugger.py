@@ -0,0 +1,43 @@
+from code_generator import CodeGenerator, VisualWorkflow
+from debugger import StepDebugger, generate_with_source_map
+from dsl import compile_program
+
+
+PROGRAM = "move 1\nrepeat 2 { left 90; move 2 }\nif has(\"key\") { jump 1 } else { right 90 }"
+
+
+def test_source_map_leaves_code_unchanged():
+    blocks = compile_program(PROGRAM)
+    code, plan, source_map = generate_with_source_map(blocks)
+    assert code == CodeGenerator().generate_from_blocks(blocks)[0]
+    lines = code.split("\n")
+    for path in [(0,), (1,), (1, "body", 1), (2, "else", 0)]:
+        entry = source_map.entry_for_path(path)
+        assert entry is not None
+        assert source_map.entry_for_line(entry.line_end).path[:len(path)] == path
+    assert "turn right" in "\n".join(lines[entry.line_start - 1:entry.line_end])
+
+
+def test_step_forward_and_back():
+    workflow = VisualWorkflow()
+    for block in compile_program(PROGRAM):
+        workflow.add_command(block)
+    debugger = StepDebugger(workflow)
+    paths = []
+    while True:
+        current = debugger.step()
+        if current is None:
+            break
+        paths.append(current["path"])
+    assert paths == [(0,), (1, "body", 0), (1, "body", 1), (1, "body", 0), (1, "body", 1), (2, "else", 0)]
+    assert debugger.finished
+    assert debugger.step_back()["path"] == (1, "body", 1)
+    assert workflow.current_index == 1
+
+
+def test_breakpoints():
+    debugger = StepDebugger(compile_program(PROGRAM))
+    debugger.add_breakpoint(path=(1, "body", 1))
+    assert debugger.continue_()["index"] == 2
+    assert debugger.continue_()["index"] == 4
+    assert debugger.continue_() is None
@@ -0,0 +1,78 @@
+import pytest
+
+from code_generator import CodeGenerator
+from dsl import MAX_NESTING, DSLSyntaxError, compile_program
+
+
+def error_position(source):
+    with pytest.raises(DSLSyntaxError) as info:
+        compile_program(source)
+    return info.value.line, info.value.column
+
+
+def test_compiles_nested_blocks():
+    blocks = compile_program("repeat 2 times {\n  move 3; right 45\n}\nif has(\"key\") { jump 2 } else { left 90 }")
+    loop, conditional = blocks
+    assert loop["params"]["iterations"] == 2
+    assert loop["params"]["body"] == [
+        {"type": "move_forward", "params": {"distance": 3}},
+        {"type": "turn_right", "params": {"degrees": 45}},
+    ]
+    assert conditional["params"]["condition"] == 'has_item("key")'
+    assert conditional["params"]["else_body"] == [{"type": "turn_left", "params": {"degrees": 90}}]
+
+
+def test_literals():
+    blocks = compile_program('move 2.5\nlet x = "a\\tb"\ncall f(1, "two", y)\nprint "say \\"hi\\""')
+    assert blocks[0]["params"]["distance"] == 2.5
+    assert blocks[1]["params"]["value"] == "a\tb"
+    assert blocks[2]["params"]["arguments"] == [1, "two", "y"]
+    assert blocks[3]["params"]["message"] == 'say "hi"'
+
+
+def test_text_parameters_take_rest_of_statement():
+    assert compile_program("print Hello, world!")[0]["params"]["message"] == "Hello, world!"
+    assert compile_program("pick golden-key")[0]["params"]["object_name"] == "golden-key"
+    body = compile_program("repeat 2 { print a, b; move 1 }")[0]["params"]["body"]
+    assert body[0]["params"]["message"] == "a, b"
+    assert body[1]["type"] == "move_forward"
+
+
+@pytest.mark.parametrize("source, position", [
+    ("move 1\nfly 2", (2, 1)),
+    ("move 1 !", (1, 8)),
+    ("repeat 2.5 { move }", (1, 8)),
+    ("if has(key) { move }", (1, 8)),
+    ("move 1 }", (1, 8)),
+    ("repeat 3 {\n  move 1\n", (3, 1)),
+    ('print "\\x"', (1, 7)),
+    ('if has("\\N{nope}") { move }', (1, 8)),
+])
+def test_error_positions(source, position):
+    assert error_position(source) == position
+
+
+def test_generated_program_runs_dsl_conditions(capsys):
+    source = ('if has("key") or at_goal { left 90 } else { right 90 }\n'
+              'if not facing_wall and not at_goal { jump 1 }')
+    code = CodeGenerator().generate_from_blocks(compile_program(source), include_implementations=True)[0]
+    exec(compile(code, "<program>", "exec"), {})
+    output = capsys.readouterr().out
+    assert "turn right" in output and "turn left" not in output
+    assert "Jumped 1 units high" in output
+
+
+@pytest.mark.parametrize("source", [
+    "repeat 1 {" * 5000,
+    "if " + "not " * 5000 + "true { move 1 }",
+    "if " + "(" * 3000 + "true" + ")" * 3000 + " { move 1 }",
+    "if true { move 1 }" + " else if true { move 1 }" * 5000,
+])
+def test_deep_nesting_is_a_syntax_error(source):
+    with pytest.raises(DSLSyntaxError, match="nesting too deep"):
+        compile_program(source)
+
+
+def test_nesting_up_to_the_limit_compiles():
+    source = "repeat 1 {" * MAX_NESTING + " move 1 " + "}" * MAX_NESTING
+    assert compile_program(source)[0]["type"] == "loop"
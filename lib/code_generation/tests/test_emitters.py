@@ -0,0 +1,62 @@
+import pytest
+
+from code_generator import CodeGenerator
+from dsl import compile_program
+from emitters import generate_all_targets, js_condition
+
+
+SOURCE = """def square(size) { repeat 4 { move size; right 90 } }
+if has("key") and not facing_wall { call square(2) } else { left 90; wait 1 }
+pick coin"""
+
+
+def test_targets_match_separate_generation():
+    blocks = compile_program(SOURCE)
+    targets = generate_all_targets(blocks)
+    assert targets["template"] == CodeGenerator().generate_from_blocks(blocks)[0]
+    assert targets["executable"] == CodeGenerator().generate_from_blocks(blocks, include_implementations=True)[0]
+    assert len(targets["plan"]) == len(CodeGenerator().generate_from_blocks(blocks)[1])
+
+
+def test_javascript_structure():
+    lines = generate_all_targets(compile_program(SOURCE))["javascript"].splitlines()
+    assert lines[2:] == [
+        "function square(size) {",
+        "  for (let i = 0; i < 4; i++) {",
+        "    moveForward(size);",
+        "    turnRight(90);",
+        "  }",
+        "}",
+        "if ((hasItem(\"key\") && !(facingWall()))) {",
+        "  square(2);",
+        "} else {",
+        "  turnLeft(90);",
+        "  wait(1);",
+        "}",
+        "pickObject(\"coin\");",
+    ]
+
+
+def test_generator_listeners_are_restored():
+    generator = CodeGenerator()
+    generate_all_targets(compile_program("move 1"), generator)
+    assert generator.listeners == []
+
+
+@pytest.mark.parametrize("condition, expected", [
+    ("True", "true"),
+    (False, "false"),
+    ("at_goal or 1 // 2 >= 0", "(atGoal() || Math.floor(1 / 2) >= 0)"),
+    ("1 < 2 < 3", "(1 < 2 && 2 < 3)"),
+    ("x in 'ab'", "false /* untranslated: x in 'ab' */"),
+    ("1 +", "false /* untranslated: 1 + */"),
+    ("1 in 2 */", "false /* untranslated: 1 in 2 * / */"),
+])
+def test_js_conditions(condition, expected):
+    assert js_condition(condition) == expected
+
+
+def test_parameter_names_are_only_identifiers_inside_their_function():
+    javascript = generate_all_targets(compile_program("def f(d) { left d }\nleft d\nlet d = 3"))["javascript"]
+    assert "  turnLeft(d);" in javascript.splitlines()
+    assert "turnLeft(\"d\");" in javascript
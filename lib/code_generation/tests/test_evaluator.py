@@ -0,0 +1,44 @@
+import pytest
+
+from code_generator import CodeGenerator
+from dsl import compile_program
+from evaluator import (CONDITION_CACHE_SIZE, ConditionError, LevelState, PlanEvaluator, _compile_text,
+                       evaluate_condition)
+from simulation import CharacterState
+
+
+def test_conditions_against_state():
+    level = LevelState(goal=(0, 0), walls=[(1, 0)])
+    state = CharacterState(inventory=["key"])
+    assert evaluate_condition('has_item("key") and at_goal', state, level)
+    assert evaluate_condition("facing_wall", state, level)
+    assert not evaluate_condition("not facing_wall or 1 > 2", state, level)
+    with pytest.raises(ConditionError):
+        evaluate_condition("x > 3", state, level)
+
+
+def test_only_taken_branches_run():
+    _, plan = CodeGenerator().generate_from_blocks(
+        compile_program('pick key\nif has("key") { move 2 } else { move 5 }\nif facing_wall { left 90 }'))
+    evaluator = PlanEvaluator(LevelState(walls=[(3, 0)]))
+    steps, state = evaluator.run(plan)
+    assert [step["action"] for step in steps] == ["pick_object", "move", "rotate"]
+    assert [decision["taken"] for decision in evaluator.decisions] == [True, True]
+    assert (state.x, state.angle) == (2.0, 90.0)
+
+
+@pytest.mark.parametrize("condition", [
+    "not " * 100000 + "at_goal",
+    "(" * 1000 + "at_goal" + ")" * 1000,
+    " and ".join(["at_goal"] * 2) + " and " + "(not " * 5000 + "at_goal" + ")" * 5000,
+    "at_goal\0",
+])
+def test_pathological_conditions_raise_condition_error(condition):
+    with pytest.raises(ConditionError):
+        evaluate_condition(condition, CharacterState())
+
+
+def test_condition_cache_is_bounded():
+    for number in range(CONDITION_CACHE_SIZE + 10):
+        evaluate_condition(f"{number} > 0 or at_goal", CharacterState())
+    assert _compile_text.cache_info().currsize == CONDITION_CACHE_SIZE
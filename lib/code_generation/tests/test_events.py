@@ -0,0 +1,65 @@
+import logging
+
+from code_generator import GameplaySession
+from dsl import compile_program
+from events import BufferedLoggingSink, ConsoleEventSink, EventSink, SessionEvent, SessionEventType
+
+
+class RecordingSink(EventSink):
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+
+def test_lazy_field_is_computed_once_on_read():
+    calls = []
+    event = SessionEvent(SessionEventType.CODE_UPDATED, {"index": 1},
+                         {"code": lambda: calls.append(1) or "print()"})
+    assert event.to_dict() == {"event": "code_updated", "index": 1}
+    assert calls == []
+    assert event["code"] == "print()" and event.get("code") == "print()"
+    assert calls == [1]
+    assert event.get("missing", "default") == "default"
+
+
+def test_added_command_reports_its_code():
+    sink = RecordingSink()
+    session = GameplaySession(event_sink=sink)
+    result = session.add_command_from_palette("turn_left", {"degrees": 45})
+    assert result["success"] and result["command_id"] == "turn_left"
+    assert result["single_command_code"] == "print(f\"{'turn left'}\")"
+    assert result["single_command_code"] == session.get_single_command_code(0)
+    assert [event.type for event in sink.events][:1] == [SessionEventType.COMMAND_ADDED]
+    assert sink.events[0]["single_command_code"] == result["single_command_code"]
+
+
+def test_snippets_do_not_reset_the_session_generator():
+    session = GameplaySession()
+    session.add_block(compile_program("call f")[0])
+    generator = session.generator
+    generator.reset()
+    generator.compile_block(compile_program("def f { move 1 }")[0], 0)
+    assert session.get_single_command_code(0).endswith("f()")
+    # compile_block callers keep the functions they registered
+    assert generator.functions["f"]["defined"]
+
+
+def test_console_sink_prints_added_commands(capsys):
+    session = GameplaySession(event_sink=ConsoleEventSink())
+    session.add_command_from_palette("jump")
+    output = capsys.readouterr().out
+    assert "Generated code for" in output
+    assert "jump(" in output
+
+
+def test_buffered_sink_writes_in_batches(caplog):
+    sink = BufferedLoggingSink(capacity=2, log=logging.getLogger("session-test"))
+    session = GameplaySession(event_sink=sink)
+    with caplog.at_level(logging.DEBUG, logger="session-test"):
+        session.add_command_from_palette("move")
+        flushed = len(caplog.records)
+        sink.close()
+    assert flushed == 2 and not sink.buffer
+    assert all(record.getMessage().startswith("session event:") for record in caplog.records)
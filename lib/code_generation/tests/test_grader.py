@@ -0,0 +1,39 @@
+import grader
+from dsl import compile_program
+from evaluator import LevelState
+
+
+LEVEL = LevelState(goal=(2, 0), walls=[(1, 1)], bounds=(0, 0, 3, 3), objects={(1, 0): "coin"})
+
+
+def grade(source, **case_options):
+    case = grader.TestCase("case", LEVEL, **case_options)
+    return grader.grade_workflow(compile_program(source), [case]).results[0]
+
+
+def test_passing_case():
+    result = grade("move 1; pick coin; move 1", required_items=["coin"])
+    assert result.passed
+    assert result.steps_executed == 3
+
+
+def test_stops_at_first_failure():
+    result = grade("move 1; left 90; move 1; move 1")
+    assert not result.passed
+    assert result.reason == "hit_wall"
+    assert result.step_index == 2
+    assert result.steps_executed == 3
+    assert grade("left 90; move 5").reason == "out_of_bounds"
+
+
+def test_wrong_object_and_recursion():
+    assert grade("move 1; pick key; move 1").reason == "wrong_object"
+    assert grade("def f { call f }\ncall f").reason == "invalid_plan"
+
+
+def test_processes_give_same_report():
+    cases = [grader.TestCase(f"case {n}", LEVEL, max_steps=n) for n in range(1, 5)]
+    blocks = compile_program("move 1; pick coin; move 1")
+    serial = grader.grade_workflow(blocks, cases).to_dict()
+    assert grader.grade_workflow(blocks, cases, processes=2).to_dict() == serial
+    assert grader.WorkflowGrader(blocks).grade(cases, processes=2, shared=True).to_dict() == serial
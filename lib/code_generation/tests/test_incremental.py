@@ -0,0 +1,73 @@
+import random
+
+from code_generator import CodeGenerator, VisualWorkflow
+from evaluator import LevelState, PlanEvaluator
+from incremental import IncrementalSimulator
+
+
+def random_block(rng, depth=0):
+    kinds = ["move_forward", "turn_left", "turn_right"]
+    if depth < 2 and rng.random() < 0.3:
+        kinds += ["pick_object", "loop", "conditional", "call", "function"]
+    kind = rng.choice(kinds)
+    if kind == "loop":
+        return {"type": "loop", "params": {"iterations": rng.randint(0, 3),
+                                           "body": [random_block(rng, depth + 1) for _ in range(2)]}}
+    if kind == "conditional":
+        return {"type": "conditional", "params": {
+            "condition": rng.choice(["at_goal", "not at_goal", "has_item('coin')"]),
+            "if_body": [random_block(rng, depth + 1)], "else_body": [random_block(rng, depth + 1)]}}
+    if kind == "call":
+        return {"type": "call", "params": {"name": rng.choice("fg")}}
+    if kind == "function":
+        return {"type": "function", "params": {"name": rng.choice("fg"), "body": [
+            {"type": "move_forward", "params": {}}, {"type": "turn_left", "params": {}}]}}
+    if kind == "pick_object":
+        return {"type": "pick_object", "params": {"object_name": "coin"}}
+    return {"type": kind, "params": {}}
+
+
+def full_run(workflow, level):
+    _, plan = CodeGenerator().generate_from_blocks(workflow.sequence)
+    return PlanEvaluator(level).run(plan)[1]
+
+
+def test_preview_matches_full_generation_after_random_edits():
+    rng = random.Random(7)
+    level = LevelState(goal=(2, 0))
+    workflow = VisualWorkflow()
+    simulator = IncrementalSimulator(workflow, level)
+    for _ in range(400):
+        size = len(workflow.sequence)
+        operation = rng.choice("aaiurm" if size else "a")
+        if operation == "a":
+            workflow.add_command(random_block(rng))
+        elif operation == "i":
+            workflow.insert_command(rng.randint(0, size), random_block(rng))
+        elif operation == "u":
+            workflow.update_command(rng.randrange(size), random_block(rng))
+        elif operation == "r":
+            workflow.remove_command(rng.randrange(size))
+        else:
+            workflow.move_command(rng.randrange(size), rng.randrange(size))
+        assert simulator.preview().to_dict() == full_run(workflow, level).to_dict()
+
+
+def test_edit_resimulates_only_the_suffix():
+    workflow = VisualWorkflow()
+    for _ in range(200):
+        workflow.add_command({"type": "move_forward", "params": {}})
+    simulator = IncrementalSimulator(workflow)
+    simulator.preview()
+    before = simulator.blocks_simulated
+    workflow.update_command(190, {"type": "turn_left", "params": {}})
+    state = simulator.preview()
+    assert simulator.blocks_simulated - before == 10
+    assert state.to_dict() == full_run(workflow, LevelState()).to_dict()
+
+
+def test_close_stops_following():
+    workflow = VisualWorkflow()
+    simulator = IncrementalSimulator(workflow)
+    simulator.close()
+    assert simulator not in workflow.listeners
@@ -0,0 +1,52 @@
+import pytest
+
+from code_generator import CodeGenerator
+from dsl import compile_program
+from evaluator import LevelState, PlanEvaluator
+from ir import CALL, HALT, RETURN, STEP, TEST, lower_plan
+
+
+def plan_for(source):
+    return CodeGenerator().generate_from_blocks(compile_program(source))[1]
+
+
+def test_subroutine_body_is_laid_out_once():
+    program = lower_plan(plan_for("def f { move 1; left 90 }\ncall f\ncall f\ncall f"))
+    opcodes = [opcode for opcode, _, _ in program.instructions()]
+    assert opcodes == [CALL, CALL, CALL, HALT, STEP, STEP, RETURN]
+    entries = {b for opcode, _, b in program.instructions() if opcode == CALL}
+    assert entries == {4}
+
+
+def test_conditional_jumps():
+    program = lower_plan(plan_for('if has("key") { move 1 } else { left 90 }\njump 1'))
+    instructions = program.instructions()
+    assert instructions[0][0] == TEST
+    else_pc = instructions[0][2]
+    assert program.items[instructions[else_pc][1]]["action"] == "rotate"
+
+
+def test_deeply_nested_plan_lowers_without_recursion():
+    plan = [{"step": 0, "action": "move", "distance": 1, "duration": 1.0}]
+    for depth in range(5000):
+        plan = [{"step": depth, "action": "conditional", "condition": "True",
+                 "branches": plan, "if_branch": plan, "else_branch": []}]
+    steps, state = PlanEvaluator().run(lower_plan(plan))
+    assert len(steps) == 1 and state.x == 1.0
+
+
+def test_program_evaluates_like_plan_across_runs():
+    plan = plan_for('def f { move 1; if facing_wall { left 90 } }\nrepeat 3 { call f }\npick coin')
+    program = lower_plan(plan)
+    level = LevelState(walls=[(2, 0)])
+    expected = PlanEvaluator(level).run(plan)
+    for _ in range(2):
+        steps, state = PlanEvaluator(level).run(program)
+        assert steps == expected[0]
+        assert state.to_dict() == expected[1].to_dict()
+
+
+def test_old_conditional_fails_when_reached():
+    plan = [{"step": 0, "action": "conditional", "condition": "True", "branches": []}]
+    with pytest.raises(ValueError, match="regenerate"):
+        PlanEvaluator().run(lower_plan(plan))
@@ -0,0 +1,41 @@
+from code_generator import CodeGenerator
+from dsl import compile_program
+from keyframes import EVENT_CODES, BakedAnimation, KeyframeBaker
+
+
+def bake(source, fps=30.0):
+    _, plan = CodeGenerator().generate_from_blocks(compile_program(source))
+    return KeyframeBaker(fps).bake(plan)
+
+
+def assert_same(loaded, baked):
+    assert loaded.fps == baked.fps
+    for name in ("x", "y", "z", "heading", "event_frames", "event_codes", "event_args"):
+        assert getattr(loaded, name) == getattr(baked, name), name
+    assert loaded.strings == baked.strings
+
+
+def test_round_trip():
+    baked = bake("move 2; jump 1; pick coin; right 90; print done")
+    assert baked.strings == ["coin", "done"]
+    assert list(baked.event_codes) == [EVENT_CODES[name] for name in ("move", "jump", "pick_object", "rotate", "print")]
+    assert_same(BakedAnimation.from_bytes(baked.to_bytes()), baked)
+
+
+def test_round_trip_keeps_empty_strings():
+    baked = bake('print "a"; pick ""; print "é"; print ""')
+    assert baked.strings == ["a", "", "é"]
+    loaded = BakedAnimation.from_bytes(baked.to_bytes())
+    assert_same(loaded, baked)
+    assert max(loaded.event_args) < len(loaded.strings)
+
+    trailing = BakedAnimation(60.0)
+    trailing.strings = ["x\0y", "", ""]
+    assert BakedAnimation.from_bytes(trailing.to_bytes()).strings == ["x\0y", "", ""]
+
+
+def test_frame_count_follows_duration():
+    baked = bake("move 1", fps=10.0)
+    _, plan = CodeGenerator().generate_from_blocks(compile_program("move 1"))
+    assert baked.frame_count == int(plan[0]["duration"] * 10.0) + 1
+    assert baked.x[-1] == 1.0
@@ -0,0 +1,60 @@
+import io
+import json
+import sys
+
+import pytest
+
+from code_generator import CodeGenerator
+from dsl import compile_program
+from main import main, render_script_output, script_mode
+
+
+def duration_of(source):
+    code, plan = CodeGenerator().generate_from_blocks(compile_program(source))
+    return json.loads(render_script_output("test", code, plan, "json"))["duration"]
+
+
+def test_duration_counts_taken_branches_and_calls():
+    assert duration_of("def f { wait 2 }\nif true { wait 5 }\ncall f\ncall f") == 9.0
+    assert duration_of("if false { wait 5 } else { wait 1 }") == 1.0
+
+
+def test_duration_unknown_for_unbounded_recursion():
+    assert duration_of("def f { move 1; call f }\ncall f") is None
+
+
+def run_script_mode(argv, stdin_text=""):
+    stdout = io.StringIO()
+    code = script_mode(argv, io.StringIO(stdin_text), stdout)
+    return code, stdout.getvalue()
+
+
+def test_duration_unknown_for_huge_magnitudes():
+    assert duration_of("wait " + "9" * 400) is None
+
+
+def test_reports_errors_and_continues(tmp_path, capsys):
+    binary = tmp_path / "binary.txt"
+    binary.write_bytes(b"\xff\xfe\x00")
+    good = tmp_path / "good.txt"
+    good.write_text("move 1\n")
+    code, output = run_script_mode([str(binary), str(tmp_path / "missing.txt"), str(good), "-f", "json"])
+    assert code == 1
+    assert json.loads(output)["script"] == str(good)
+    errors = capsys.readouterr().err
+    assert errors.count("Error reading") == 2
+
+
+def test_stdin_can_only_be_read_once(capsys):
+    with pytest.raises(SystemExit) as info:
+        run_script_mode(["-", "-"], "move 1\n")
+    assert info.value.code == 2
+    assert "only be given once" in capsys.readouterr().err
+
+
+def test_help_lists_every_script_flag(capsys, monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["main.py", "--help"])
+    main()
+    usage = capsys.readouterr().out
+    for flag in ("-e", "-O", "--virtual-time", "-o OUT", "-f text|json"):
+        assert flag in usage
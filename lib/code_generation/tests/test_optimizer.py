@@ -0,0 +1,70 @@
+import pytest
+
+from code_generator import CodeGenerator
+from optimizer import BlockOptimizer, evaluate_constant_condition
+
+
+@pytest.mark.parametrize("condition, expected", [
+    ("True", True),
+    ("1 > 2", False),
+    ("not False and True", True),
+    ("2 * 3 == 6", True),
+    ("'ab' * 2 == 'abab'", True),
+    ("at_goal", None),
+    ("facing_wall or False", None),
+    ("facing_wall or True", True),
+    ("1 / 0", None),
+])
+def test_constant_conditions(condition, expected):
+    assert evaluate_constant_condition(condition) == expected
+
+
+@pytest.mark.parametrize("condition", [
+    "'a' * 1000000000",
+    "1000000000 * 'a' == ''",
+    "(0,) * 1000000000",
+    "-'a'",
+    "'%s' % 1",
+])
+def test_refuses_large_or_non_numeric_folds(condition):
+    assert evaluate_constant_condition(condition) is None
+
+
+def test_optimizing_generator_keeps_unknown_condition():
+    blocks = [{"type": "conditional", "params": {
+        "condition": "'a' * 1000000000 == 'b'",
+        "if_body": [{"type": "move_forward", "params": {"distance": 1}}],
+        "else_body": []}}]
+    code, plan = CodeGenerator().generate_from_blocks(blocks, optimize=True)
+    assert plan[0]["action"] == "conditional"
+
+
+def test_dead_branch_removed():
+    blocks = [{"type": "conditional", "params": {
+        "condition": "1 > 2",
+        "if_body": [{"type": "move_forward", "params": {"distance": 1}}],
+        "else_body": [{"type": "turn_left", "params": {"degrees": 90}}]}}]
+    assert BlockOptimizer().optimize(blocks) == [{"type": "turn_left", "params": {"degrees": 90}}]
+
+
+@pytest.mark.parametrize("condition", [
+    "(" * 1000 + "True" + ")" * 1000,
+    "not " * 100000 + "True",
+    "True\0",
+])
+def test_unparseable_conditions_are_not_constant(condition):
+    assert evaluate_constant_condition(condition) is None
+
+
+def function(name, *calls):
+    return {"type": "function", "params": {"name": name, "parameters": [], "body": [
+        {"type": "call", "params": {"name": called, "arguments": []}} for called in calls]}}
+
+
+def test_functions_only_reached_from_unused_functions_are_dropped():
+    blocks = [function("a", "b"), function("b", "a", "c"), function("c"), function("d", "e"),
+              function("e"), {"type": "call", "params": {"name": "d", "arguments": []}}]
+    optimizer = BlockOptimizer()
+    names = [block["params"]["name"] for block in optimizer.optimize(blocks) if block["type"] == "function"]
+    assert names == ["d", "e"]
+    assert optimizer.stats["dropped_functions"] == 3
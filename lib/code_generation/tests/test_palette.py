@@ -0,0 +1,17 @@
+import json
+
+from code_generator import PALETTE, GameplaySession
+
+
+def test_session_palette_is_json_serializable():
+    session = GameplaySession()
+    categories = session.get_palette_commands_by_category()
+    data = json.loads(json.dumps(categories))
+    assert data == categories
+    assert any(command["id"] == "move" for command in data["movement"])
+
+
+def test_session_palette_copy_does_not_touch_shared_index():
+    categories = GameplaySession().get_palette_commands_by_category()
+    categories["movement"].clear()
+    assert PALETTE.get_commands_by_category()["movement"]
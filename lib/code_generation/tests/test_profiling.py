@@ -0,0 +1,46 @@
+import logging
+
+from code_generator import CodeGenerator
+from dsl import compile_program
+from profiling import GenerationMetrics, MetricsLogger
+
+
+def test_generation_records_handlers_loops_and_plan():
+    metrics = GenerationMetrics()
+    generator = CodeGenerator(metrics=metrics)
+    code, plan = generator.generate_from_blocks(compile_program("repeat 3 { move 1; left 90 }\njump 1"))
+    snapshot = metrics.snapshot()
+    assert snapshot["handlers"]["loop"]["calls"] == 1
+    assert snapshot["handlers"]["move_forward"]["calls"] == 1
+    assert snapshot["loops"] == {"count": 1, "items_before_expansion": 2, "items_after_expansion": 6,
+                                 "avg_expansion_factor": 3.0, "max_iterations": 3}
+    assert snapshot["generation"]["count"] == 1
+    assert snapshot["generation"]["plan_items"] == len(plan) == 7
+    assert snapshot["generation"]["lines_emitted"] == code.count("\n") + 1
+    assert snapshot["max_depth"] == 1
+
+
+def test_metrics_do_not_change_output():
+    blocks = compile_program("if at_goal { move 1 } else { repeat 2 { right 90 } }")
+    assert CodeGenerator(metrics=GenerationMetrics()).generate_from_blocks(blocks) == \
+        CodeGenerator().generate_from_blocks(blocks)
+
+
+def test_cache_counters_and_reset():
+    metrics = GenerationMetrics()
+    for hit in (True, True, False):
+        metrics.record_cache("bytecode", hit)
+    assert metrics.snapshot()["caches"]["bytecode"] == {"hits": 2, "misses": 1, "hit_rate": 2 / 3}
+    metrics.reset()
+    snapshot = metrics.snapshot()
+    assert snapshot["caches"] == {} and snapshot["handlers"] == {} and snapshot["generation"]["count"] == 0
+
+
+def test_logger_writes_final_snapshot(caplog):
+    metrics = GenerationMetrics()
+    metrics.record_generation(10, 4, 0.01)
+    with caplog.at_level(logging.INFO, logger="metrics-test"):
+        with MetricsLogger(metrics, interval=3600, log=logging.getLogger("metrics-test")):
+            pass
+    assert len(caplog.records) == 1
+    assert "'lines_emitted': 10" in caplog.records[0].getMessage()
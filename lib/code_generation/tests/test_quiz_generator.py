@@ -0,0 +1,15 @@
+from dsl import compile_program
+from quiz_generator import simulate_outcome
+
+
+def test_coins_count_only_coin_pickups():
+    outcome = simulate_outcome(compile_program('pick "key"; pick "shell"; pick coin; pick "gold coin"'))
+    assert outcome["coins"] == 2
+    assert outcome["steps"] == 4
+
+
+def test_outcome_follows_taken_branch():
+    outcome = simulate_outcome(compile_program("move 2\nif false { move 5 } else { left 90; move 1 }"))
+    assert outcome["cell"] == (2, 1)
+    assert outcome["heading"] == 90
+    assert outcome["forward_moves"] == 2
@@ -0,0 +1,67 @@
+import sys
+
+import pytest
+
+from code_generator import CodeGenerator
+from dsl import compile_program
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="sandbox pool needs fork and resource")
+
+from sandbox_pool import SandboxPool, forbidden_access  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with SandboxPool(processes=2, cpu_seconds=1, memory_bytes=256 * 1024 * 1024,
+                     wall_timeout=10, max_output=1000) as pool:
+        yield pool
+
+
+def test_runs_generated_program(pool):
+    code = CodeGenerator().generate_from_blocks(compile_program("move 2; left 90"), include_implementations=True)[0]
+    result = pool.run(code, with_runtime=False)
+    assert result["ok"], result["error"]
+    assert "turn left" in result["stdout"]
+
+
+def test_runtime_is_predefined(pool):
+    result = pool.run("move_forward(3)\npick_object('key')")
+    assert result["character"]["x"] == 3.0 and result["character"]["inventory"] == ["key"]
+
+
+@pytest.mark.parametrize("code, status", [
+    ("while True:\n    pass", "cpu_limit"),
+    ("while True:\n    print('x' * 100)", "output_limit"),
+    ("data = 'x' * (1024 * 1024 * 1024)", "memory_limit"),
+    ("import os", "error"),
+    ("open('/tmp/x', 'w')", "error"),
+    ("x = (", "error"),
+])
+def test_limits(pool, code, status):
+    result = pool.run(code)
+    assert result["status"] == status, result["error"]
+    assert not result["ok"]
+
+
+def test_worker_survives_a_failed_job(pool):
+    results = pool.run_many(["while True:\n    pass", "print('still here')"])
+    assert [result["status"] for result in results] == ["cpu_limit", "ok"]
+    assert results[1]["stdout"] == "still here\n"
+
+
+@pytest.mark.parametrize("code", [
+    "print(().__class__.__base__.__subclasses__())",
+    "g = (x for x in [1])\nprint(g.gi_frame.f_back.f_globals)",
+    "print(f'{character._secret}')",
+])
+def test_introspection_is_rejected(pool, code):
+    assert forbidden_access(code) is not None
+    result = pool.run(code)
+    assert result["status"] == "rejected"
+
+
+def test_repeated_programs_use_the_parent_cache(tmp_path):
+    with SandboxPool(processes=1, bytecode_cache_dir=str(tmp_path)) as pool:
+        results = pool.run_many(["print(6 * 7)"] * 3)
+        assert [result["stdout"] for result in results] == ["42\n"] * 3
+        assert pool.bytecode_cache.stats()["misses"] == 1
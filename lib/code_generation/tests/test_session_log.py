@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from code_generator import VisualWorkflow
+from session_log import SessionLogger, SessionReplay
+
+
+def edit_randomly(workflow, rng, count):
+    history = [list(workflow.sequence)]
+    for number in range(count):
+        size = len(workflow.sequence)
+        operation = rng.choice("aaiurmc" if size else "a")
+        block = {"type": "move_forward", "params": {"distance": number}}
+        if operation == "a":
+            workflow.add_command(block)
+        elif operation == "i":
+            workflow.insert_command(rng.randint(0, size), block)
+        elif operation == "u":
+            workflow.update_command(rng.randrange(size), block)
+        elif operation == "r":
+            workflow.remove_command(rng.randrange(size))
+        elif operation == "m":
+            workflow.move_command(rng.randrange(size), rng.randrange(size))
+        else:
+            workflow.clear()
+        history.append([dict(command) for command in workflow.sequence])
+    return history
+
+
+def test_replay_matches_history_at_every_event(tmp_path):
+    workflow = VisualWorkflow()
+    workflow.add_command({"type": "turn_left", "params": {"degrees": 90}})
+    path = str(tmp_path / "session.log")
+    with SessionLogger(workflow, path, snapshot_interval=7):
+        history = edit_randomly(workflow, random.Random(3), 120)
+
+    replay = SessionReplay(path)
+    assert len(replay) == 120
+    for event_index, sequence in enumerate(history):
+        assert replay.state_at(event_index) == sequence
+    assert replay.event(0)["operation"] in ("add", "insert", "update", "remove", "move", "clear")
+
+
+def test_restore_session(tmp_path):
+    workflow = VisualWorkflow()
+    path = str(tmp_path / "session.log")
+    with SessionLogger(workflow, path):
+        workflow.add_command({"type": "move_forward", "params": {"distance": 1}})
+        workflow.add_command({"type": "turn_right", "params": {"degrees": 90}})
+    session = SessionReplay(path).restore_session(1)
+    assert session.workflow.get_sequence() == [{"type": "move_forward", "params": {"distance": 1}}]
+
+
+def test_out_of_range_event(tmp_path):
+    path = str(tmp_path / "session.log")
+    SessionLogger(VisualWorkflow(), path).close()
+    with pytest.raises(IndexError):
+        SessionReplay(path).state_at(1)
+
+
+def test_payloads_are_json(tmp_path):
+    workflow = VisualWorkflow()
+    path = str(tmp_path / "session.log")
+    with SessionLogger(workflow, path):
+        workflow.add_command({"type": "print", "params": {"message": "héllo", "values": [1, 2.5, None, True]}})
+    data = open(path, "rb").read()
+    assert '{"type":"print","params":{"message":"héllo","values":[1,2.5,null,true]}}'.encode() in data
+    assert SessionReplay(path).state_at()[0]["params"]["message"] == "héllo"
+
+
+def test_rejects_marshal_logs(tmp_path):
+    path = tmp_path / "session.log"
+    path.write_bytes(b"VWLOG\x00\x01\x00")
+    with pytest.raises(ValueError):
+        SessionReplay(str(path))
@@ -0,0 +1,24 @@
+from code_generator import CodeGenerator
+from dsl import compile_program
+from evaluator import LevelState, PlanEvaluator
+from shared_plans import PlanView, SharedPlan, attach_plan, pack_plan
+
+
+def plan_for(source):
+    return CodeGenerator().generate_from_blocks(compile_program(source))[1]
+
+
+def test_packed_plan_round_trips():
+    plan = plan_for('move 2.5; jump 1; pick "gold coin"; print ""; let x = 3\nrepeat 2 { right 30 }')
+    assert PlanView(pack_plan(plan)).to_list() == plan
+
+
+def test_view_runs_like_the_plan():
+    plan = plan_for('def f { move 1; left 90 }\ncall f\nif at_goal { jump 1 } else { call f; move 2 }')
+    level = LevelState(goal=(1, 1))
+    expected = PlanEvaluator(level).run(plan)[1].to_dict()
+    with SharedPlan(plan) as shared:
+        attached = attach_plan(shared.descriptor)
+        assert PlanEvaluator(level).run(attached)[1].to_dict() == expected
+        assert PlanEvaluator(level).run(shared.view())[1].to_dict() == expected
+        attached.close()
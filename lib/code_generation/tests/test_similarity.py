@@ -0,0 +1,32 @@
+from dsl import compile_program
+from similarity import SimilarityIndex, workflow_tokens
+
+
+def test_short_loops_unroll_to_the_same_tokens():
+    assert workflow_tokens(compile_program("repeat 3 { move 1 }")) == workflow_tokens(compile_program("move 1; move 1; move 1"))
+    assert workflow_tokens(compile_program("repeat 100 { move 1 }"))[0] == "loop(100)["
+
+
+def test_query_finds_near_duplicates():
+    index = SimilarityIndex()
+    base = "move 1; left 90; move 2; pick coin; right 90; move 3; jump 1; move 1; left 90; move 2"
+    index.add("original", compile_program(base))
+    index.add("copy", compile_program(base + "; move 4"))
+    index.add("other", compile_program("repeat 20 { jump 2; wait 1 }; print done"))
+    keys = [key for key, _ in index.query(compile_program(base), threshold=0.7)]
+    assert keys[0] == "original"
+    assert "copy" in keys and "other" not in keys
+    assert index.groups(threshold=0.7) == [["copy", "original"]]
+
+
+def test_save_and_load(tmp_path):
+    index = SimilarityIndex(num_perm=64, bands=16)
+    for number in range(5):
+        index.add(f"w{number}", compile_program(f"move {number}; left 90; move 1"))
+    path = str(tmp_path / "index.bin")
+    index.save(path)
+    loaded = SimilarityIndex.load(path)
+    assert loaded.signatures == index.signatures
+    assert loaded.query(compile_program("move 2; left 90; move 1")) == index.query(compile_program("move 2; left 90; move 1"))
+    index.remove("w0")
+    assert "w0" not in index and len(index) == 4
@@ -0,0 +1,56 @@
+import pytest
+
+from code_generator import CodeGenerator
+from debugger import generate_with_source_map
+from dsl import compile_program
+from evaluator import PlanEvaluator
+from simulation import MAX_CALL_DEPTH, plan_duration, simulate_plan
+
+
+def generate(source):
+    return CodeGenerator().generate_from_blocks(compile_program(source))
+
+
+def test_call_applies_memoized_effect():
+    code, plan = generate("def step { move 2; left 90 }\ncall step\ncall step")
+    state = simulate_plan(plan)
+    assert (round(state.x, 6), round(state.y, 6), state.angle) == (2.0, 2.0, 180.0)
+    assert plan[1]["subroutine"]["effect"] is not None
+
+
+def test_function_using_parameter_generates_without_effect():
+    code, plan = generate("def f(a) { move a }\ncall f(3)")
+    assert "def f(a):" in code
+    assert plan[0]["name"] == "f"
+    assert plan[1]["subroutine"]["effect"] is None
+    assert plan_duration(plan) == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        simulate_plan(plan)
+
+
+def test_recursive_function_is_bounded():
+    code, plan = generate("def f { move 1; call f }\ncall f")
+    assert plan[1]["subroutine"]["effect"] is None
+    with pytest.raises(ValueError, match=str(MAX_CALL_DEPTH)):
+        plan_duration(plan)
+    with pytest.raises(ValueError, match=str(MAX_CALL_DEPTH)):
+        simulate_plan(plan)
+    with pytest.raises(ValueError, match=str(MAX_CALL_DEPTH)):
+        PlanEvaluator().run(plan)
+
+
+def test_call_before_definition_runs(capsys):
+    blocks = compile_program("call greet\nleft 90\ndef greet { jump 2 }")
+    code, plan = CodeGenerator().generate_from_blocks(blocks, include_implementations=True)
+    assert code.index("def greet") < code.index("greet()")
+    exec(compile(code, "<program>", "exec"), {})
+    assert "Jumped 2 units high" in capsys.readouterr().out
+    assert [item["action"] for item in PlanEvaluator().run(plan)[0]] == ["jump", "rotate"]
+
+
+def test_source_map_follows_hoisted_definitions():
+    code, plan, source_map = generate_with_source_map(compile_program("call greet\nleft 90\ndef greet { jump 2 }"))
+    lines = code.splitlines()
+    definition = source_map.entry_for_path((2,))
+    assert lines[definition.line_start - 1] == "# Define function greet"
+    assert "turn left" in lines[source_map.entry_for_path((1,)).line_end - 1]
@@ -0,0 +1,44 @@
+import pytest
+
+from code_generator import CodeGenerator
+from dsl import compile_program
+from simulation import simulate_plan
+from timeline import PlanTimeline
+
+
+def timeline_for(source, checkpoint_interval=32):
+    _, plan = CodeGenerator().generate_from_blocks(compile_program(source))
+    return PlanTimeline(plan, checkpoint_interval), plan
+
+
+def test_seek_before_start_is_start_state():
+    timeline, _ = timeline_for("move 5")
+    frame = timeline.seek(-1)
+    assert frame["time"] == 0.0
+    assert frame["position"] == [0.0, 0.0, 0.0]
+    assert frame["step_index"] == 0
+
+
+def test_seek_after_end_is_final_state():
+    timeline, plan = timeline_for("move 5; left 90")
+    frame = timeline.seek(timeline.total_duration + 10)
+    assert frame["time"] == timeline.total_duration
+    assert frame["action"] is None
+    assert frame["heading"] == simulate_plan(plan).angle
+
+
+def test_seek_interpolates_within_item():
+    timeline, plan = timeline_for("move 4")
+    state = timeline.state_at(plan[0]["duration"] / 2)
+    assert state.x == pytest.approx(2.0)
+
+
+def test_state_at_matches_replay_across_checkpoints():
+    timeline, plan = timeline_for("repeat 10 { move 1; right 30; pick coin }", checkpoint_interval=3)
+    elapsed = 0.0
+    for index, item in enumerate(plan):
+        elapsed += item.get("duration", 0.0)
+        expected = simulate_plan(plan[:index + 1])
+        state = timeline.state_at(elapsed)
+        assert (state.x, state.y, state.angle) == pytest.approx((expected.x, expected.y, expected.angle))
+        assert state.inventory == expected.inventory
@@ -0,0 +1,117 @@
+"""
+Time-indexed execution plans for animation seeking.
+Stores prefix sums of plan item durations plus a character state checkpoint
+every `checkpoint_interval` items, so the state at any time can be found with
+a binary search and at most `checkpoint_interval` item replays.
+"""
+
+from typing import Dict, List, Any, Optional
+from array import array
+from bisect import bisect_right
+
+from simulation import CharacterState, apply_plan_item, interpolate_plan_item, item_duration
+
+
+class PlanTimeline:
+    """
+    Seekable index over a flat execution plan.
+    Items without a duration (e.g. conditional markers) take zero time.
+    """
+
+    def __init__(self, plan: List[Dict[str, Any]], checkpoint_interval: int = 32,
+                 start_state: Optional[CharacterState] = None):
+        """
+        Build the index in a single pass over the plan.
+
+        Args:
+            plan: Execution plan items from CodeGenerator.generate_from_blocks
+            checkpoint_interval: Number of items between state checkpoints
+            start_state: State at time 0 (defaults to the origin, facing +x)
+        """
+        if checkpoint_interval < 1:
+            raise ValueError("checkpoint_interval must be at least 1")
+        self.plan = plan
+        self.checkpoint_interval = checkpoint_interval
+        self.start_state = start_state.copy() if start_state is not None else CharacterState()
+
+        # end_times[i] is the time at which item i finishes
+        self.end_times = array("d")
+        self.checkpoints: List[CharacterState] = []
+
+        state = self.start_state.copy()
+        elapsed = 0.0
+        for index, item in enumerate(plan):
+            if index % checkpoint_interval == 0:
+                self.checkpoints.append(state.copy())
+            elapsed += item_duration(item)
+            self.end_times.append(elapsed)
+            apply_plan_item(state, item)
+        self.final_state = state
+
+    @property
+    def total_duration(self) -> float:
+        """Total duration of the plan in seconds."""
+        return self.end_times[-1] if self.end_times else 0.0
+
+    def index_at(self, t: float) -> int:
+        """
+        Get the index of the plan item playing at time t.
+
+        Returns:
+            Item index, or len(plan) once the plan has finished
+        """
+        return bisect_right(self.end_times, t)
+
+    def _clamp(self, t: float) -> float:
+        return min(max(t, 0.0), self.total_duration)
+
+    def state_at(self, t: float) -> CharacterState:
+        """
+        Get the interpolated character state at time t.
+
+        Args:
+            t: Time in seconds from the start of the plan (clamped to the plan length)
+
+        Returns:
+            A new CharacterState
+        """
+        t = self._clamp(t)
+        index = self.index_at(t)
+        if index >= len(self.plan):
+            return self.final_state.copy()
+
+        checkpoint = index // self.checkpoint_interval
+        state = self.checkpoints[checkpoint].copy()
+        for item in self.plan[checkpoint * self.checkpoint_interval:index]:
+            apply_plan_item(state, item)
+
+        item = self.plan[index]
+        duration = item_duration(item)
+        if duration > 0:
+            start = self.end_times[index] - duration
+            interpolate_plan_item(state, item, (t - start) / duration)
+        return state
+
+    def seek(self, t: float) -> Dict[str, Any]:
+        """
+        Seek to time t for timeline scrubbing.
+
+        Args:
+            t: Time in seconds from the start of the plan
+
+        Returns:
+            Dictionary with position, heading, inventory, and the active plan step
+        """
+        t = self._clamp(t)
+        state = self.state_at(t)
+        index = self.index_at(t)
+        active = self.plan[index] if index < len(self.plan) else None
+        return {
+            "time": t,
+            "position": [state.x, state.y, state.z],
+            "heading": state.angle,
+            "inventory": list(state.inventory),
+            "step_index": index,
+            "step": active.get("step") if active else None,
+            "action": active.get("action") if active else None
+        }